@@ -6,13 +6,15 @@
 """
 import tkinter as tk
 import cmath as c
-from random import randint
-from math import radians
 
 if __name__ == '__main__':
     from design_helpers import *
+    from design_index import C4HSpatialIndex
+    from design_model import C4HCoursePlan, C4HFence
 else:
     from .design_helpers import *
+    from .design_index import C4HSpatialIndex
+    from .design_model import C4HCoursePlan, C4HFence
 i = c.sqrt(-1)
 
 COLORS = {
@@ -22,19 +24,26 @@ COLORS = {
     'shrub': ('dark green', 'light green')
 }
 
+class C4HPlan(tk.Canvas):
+    '''Draws a C4HCoursePlan and edits it with the mouse and keys.
 
+    Every edit is made to the plan and the canvas items of the fences that
+    changed are then moved to where the plan has them, so the plan is the
+    only copy of where the fences are.
 
-STRIDE = 370 #stride length in cm
-
-class C4HPlan(tk.Canvas):
+    Attributes:
+        plan (C4HCoursePlan): the fences, in cm
+        sprites (list of C4HSprite): the canvas items of each fence
+        index (C4HSpatialIndex): the canvas items as drawn from the plan
+    '''
     def __init__(self, parent, **kwargs):
         super().__init__(parent, **kwargs)
         self.scale = 40 #x such that scale is 1:x in pixels
+        self.plan = C4HCoursePlan()
         self.sprites = []
+        self.index = C4HSpatialIndex(self.scale) #finds sprites by canvas id and position, 1 m cells
         self.motion_ref = complex(0, 0) #keeps track of motion when draging item
-        self.focus_sprites = [] #items which have focus in the canvas
-        self.class_height = 100 #class height in cm
-        self.open = True # 3.5 stride approach, False -> 2.5 stride approach
+        self.focus_sprites = C4HFocus(self.plan_update) #items which have focus in the canvas
 
         # all the event bindings
         self.bind('<Enter>', lambda event: self.focus_set()) #sets focus to canvas
@@ -90,58 +99,110 @@ class C4HPlan(tk.Canvas):
         """
         self.set_motion_ref(event)
         d = self.scale * 1
-        #find the closes then determine if it is close enough
-        if self.find_overlapping (event.x+d, event.y+d, event.x-d, event.y-d):
-            #clicked close enough to item so find closest
-            id = self.find_closest(event.x, event.y)[0]
-            sprite = self.find_by_id(id)
+        #find the closest sprite if it is close enough
+        sprite = self.index.nearest(event.x, event.y, d)
+        if sprite is not None:
             self.set_focus(sprite)
             
     def clear_focus(self):
         self.focus_sprites.clear()
-        self.plan_update()
 
     def set_focus(self, sprite):
         """Set focus to sprite.
         """
-        if not sprite in self.focus_sprites:
-            self.focus_sprites.append(sprite)
-        self.plan_update()
-
-    def plan_update(self):
-        """Updates the colors based on focus status."""
-        for sprite in self.sprites:
-            for c in sprite.components:
-                self.itemconfigure(
-                    c.id, 
-                    fill=COLORS.get(c.type)[sprite in self.focus_sprites]
-                )
-                
+        self.focus_sprites.add(sprite)
+
+    def plan_update(self, sprites: list = None):
+        """Updates the colors of sprites, all of them if None, based on focus status.
+
+        Called by focus_sprites with the sprites whose focus changed. Their
+        items are tagged 'focus' or not and then recoloured by tag, one call
+        for each type and focus state however many sprites changed.
+        """
+        target = ''
+        if sprites is not None:
+            for sprite in sprites:
+                if not sprite.components:
+                    continue
+                tag = sprite_tag(sprite)
+                if sprite in self.focus_sprites:
+                    self.addtag_withtag('focus', tag)
+                else:
+                    self.dtag(tag, 'focus')
+                self.addtag_withtag('repaint', tag)
+            target = 'repaint&&'
+        for type, colors in COLORS.items():
+            self.itemconfigure(f'{target}{type}&&!focus', fill=colors[0])
+            self.itemconfigure(f'{target}{type}&&focus', fill=colors[1])
+        if sprites is not None:
+            self.dtag('repaint', 'repaint')
+
     def find_by_id(self, id: int) -> C4HSprite:
         """Finds an element by its canvas id.
         """
-        for s in self.sprites:
-            for c in s.components:
-                if id == c.id:                    
-                    return s
+        return self.index.sprite(id)
+
+    def add_component(self, sprite: C4HSprite, id: int, type: str, coords: list) -> None:
+        """Adds the canvas item id, drawn at coords, to sprite and the index.
+        """
+        sprite.components.append(C4HComponent(id, type))
+        self.itemconfigure(id, tags=(type, sprite_tag(sprite)), fill=COLORS.get(type)[0])
+        self.index.insert(id, sprite, coords, closed=(type == 'shrub'))
+
+    def move_components(self, coords: dict) -> None:
+        """Moves the canvas items to their new coords in one Tcl call and
+        keeps the index in step.
+
+        Args:
+            coords (dict): canvas id: its new canvas coords
+        """
+        self.tk.eval('\n'.join(
+            f'{self._w} coords {id} ' + ' '.join(map(str, xy))
+            for id, xy in coords.items()
+            ))
+        for id, xy in coords.items():
+            self.index.move(id, xy)
+
+    def focus_fences(self) -> list:
+        """Returns the fences of the focus sprites.
+        """
+        return [sprite.fence for sprite in self.focus_sprites]
+
+    @property
+    def class_height(self) -> int:
+        """class height in cm"""
+        return self.plan.class_height
 
-        return None
+    @class_height.setter
+    def class_height(self, class_height: int) -> None:
+        self.plan.class_height = class_height
+
+    @property
+    def open(self) -> bool:
+        """3.5 stride approach, False -> 2.5 stride approach"""
+        return self.plan.open
+
+    @open.setter
+    def open(self, open: bool) -> None:
+        self.plan.open = open
 
     def new_sprite(self, event):
         z = complex(event.x, -event.y)
         sprite = self.build_jump(z)
         self.sprites.append(sprite)
-        self.plan_update()
 
     def delete_sprite(self, sprite):
         for component in sprite.components:
             self.delete(component.id)
+            self.index.remove(component.id)
         self.sprites.remove(sprite)
+        self.plan.remove(sprite.fence)
         
     def delete_focus_sprites(self):
-        for sprite in self.focus_sprites:
-            self.delete_sprite(sprite)
+        sprites = list(self.focus_sprites)
         self.focus_sprites.clear()
+        for sprite in sprites:
+            self.delete_sprite(sprite)
         
     def key_press(self, event):
         """Responds to a keypress by performing action on all focus sprites.
@@ -154,114 +215,84 @@ class C4HPlan(tk.Canvas):
                 print('Exception: ', e)
 
 
+    def to_cm(self, z: complex) -> complex:
+        """Converts a point on the canvas to cm on the plan.
+        """
+        return z*100/self.scale
+
+    def to_pixels(self, z: complex) -> complex:
+        """Converts a point in cm on the plan to the canvas.
+        """
+        return z*self.scale/100
+
+    def draw(self, fence: C4HFence) -> C4HSprite:
+        """Draws fence and returns its sprite.
+        """
+        sprite = C4HSprite(fence=fence)
+        line_width = self.scale*0.2
+        parts = self.plan.outline(fence)
+        for (type, _), coords in zip(parts, self.plan.coords([fence], self.scale/100)[0]):
+            if type == 'shrub':
+                id = self.create_polygon(coords)
+            elif type == 'arrow':
+                id = self.create_line(coords, width=line_width/2, arrow='first')
+            else:
+                id = self.create_line(coords, width=line_width)
+            self.add_component(sprite, id, type, coords)
+        return sprite
+
+    def redraw(self, sprites: list) -> None:
+        """Moves the canvas items of sprites to where the plan has their fences.
+        """
+        coords = {}
+        parts = self.plan.coords([sprite.fence for sprite in sprites], self.scale/100)
+        for sprite, sprite_coords in zip(sprites, parts):
+            for component, xy in zip(sprite.components, sprite_coords):
+                coords[component.id] = xy
+        self.move_components(coords)
+
     def build_jump(self, pivot: complex, toprails: int = 1) -> C4HSprite:
-        """Buid a new jump and appends it to the sprite list
+        """Buid a new jump on the plan and draws it
         Args:
-            r_width (int): the width of the rails in cm
-            w_width (int): the width of the wings in cm
-            angle (float): the rotation angle clockwise in degrees
+            pivot (complex): the middle of the front rail on the canvas
+            toprails (int): 1 for a vertical, 2 for a double, 3 for a triple
         """
-        j = C4HSprite()
-        distance = 3.5*STRIDE*self.scale/100
-        if not self.open:
-            distance = 2.5*STRIDE*self.scale/100
-        
-        j.path_controls['approach_control'][0] = j.path_controls['landing_control'][0] = 4 * distance
-        j.path_controls['approach'][0] = j.path_controls['landing'][0] = distance
+        return self.draw(self.plan.new_jump(self.to_cm(pivot), rails=toprails))
 
-        line_width = self.scale*0.2
-        width = j.rail_width*self.scale/100 #convert width to pixels
-        phi = radians(j.angle) #convert angle to radians TODO calculate this!
-        j.spread = rail_spread = 0
-        if toprails > 1:
-            j.spread = (self.class_height+10*(toprails-1))*self.scale/100 #spread in pixels
-            rail_spread = j.spread/(toprails-1)-line_width
-
-        # make rails
-        _pivot = pivot
-        for toprail in range(toprails):
-            rail_l = _pivot - (width/2)*c.exp(i*phi)
-            rail_r = _pivot + (width/2)*c.exp(i*phi)
-            rail_id = self.create_line(
-                complex_to_cartesian([rail_l,rail_r]),
-                width=line_width,
-                )
-            rail = C4HComponent(rail_id, 'rail')
-            j.components.append(rail)
-            _pivot = _pivot + rail_spread*c.exp(i*(phi-c.pi/2))
-
-        #make arrow
-        # reset the pivot
-        arrow_tip = pivot - (width/3)*c.exp(i*(phi-c.pi/2))
-        arrow_tail = pivot + (j.spread+width/6)*c.exp(i*(phi-c.pi/2))
-        arrow_id = self.create_line(
-            complex_to_cartesian([arrow_tip,arrow_tail]),
-            width=line_width/2,
-            arrow='first'
-            )
-        arrow = C4HComponent(arrow_id, 'arrow')
-        j.components.append(arrow)
-
-        return j
-
-    def build_shrub(self, pivot: complex, radius=100, angle=0) -> None:
-        """Buid a new vertical jump and appends it to the sprite list
+    def build_shrub(self, pivot: complex, radius=100, angle=0) -> C4HSprite:
+        """Buid a new shrub on the plan and draws it
         Args:
             radius (int): the radius of the shrub in cm
-            angle (float): the rotation angle clockwise in degrees
+            angle (float): the rotation angle anticlockwise in degrees
 
         """
-        shrub = C4HSprite()
-        radius = int(self.scale*radius/100)
-        phi = radians(angle)
-        zs = []
-        for n in range(16):
-            zs.append(pivot + randint(int(radius/2),radius)*c.exp(i*n*c.tau/16))
-        shrub_id = self.create_polygon(
-            complex_to_cartesian(zs),
-            fill=COLORS.get('shrub')[0]
-            )
-        shrub.components.append(C4HComponent(shrub_id, 'shrub'))
-        return shrub
+        return self.draw(self.plan.new_shrub(self.to_cm(pivot), radius, angle))
 
-    def replace_w_vertical(self):
-        for i, sprite in enumerate(self.focus_sprites):
-            pivot = get_pivot(self.coords(sprite.components[0].id))
-            self.focus_sprites[i] = self.build_jump(pivot, toprails=1)
-            self.sprites.append(self.focus_sprites[i])
+    def replace_focus_sprites(self, build):
+        """Replaces each focus sprite with build(pivot), which keeps the focus.
+        """
+        for sprite in self.focus_sprites:
+            new_sprite = build(self.to_pixels(sprite.fence.pivot))
+            self.sprites.append(new_sprite)
             self.delete_sprite(sprite)
-        self.plan_update()
+            self.focus_sprites.replace(sprite, new_sprite)
+
+    def replace_w_vertical(self):
+        self.replace_focus_sprites(lambda pivot: self.build_jump(pivot, toprails=1))
 
     def replace_w_double(self):
-        for i, sprite in enumerate(self.focus_sprites):
-            pivot = get_pivot(self.coords(sprite.components[0].id))
-            self.focus_sprites[i] = self.build_jump(pivot, toprails=2)
-            self.sprites.append(self.focus_sprites[i])
-            self.delete_sprite(sprite)
-        self.plan_update()
+        self.replace_focus_sprites(lambda pivot: self.build_jump(pivot, toprails=2))
 
     def replace_w_triple(self):
-        for i, sprite in enumerate(self.focus_sprites):
-            pivot = get_pivot(self.coords(sprite.components[0].id))
-            self.focus_sprites[i] = self.build_jump(pivot, toprails=3)
-            self.sprites.append(self.focus_sprites[i])
-            self.delete_sprite(sprite)
-        self.plan_update()
+        self.replace_focus_sprites(lambda pivot: self.build_jump(pivot, toprails=3))
 
     def replace_w_shrub(self):
-        for i, sprite in enumerate(self.focus_sprites):
-            pivot = get_pivot(self.coords(sprite.components[0].id))
-            self.focus_sprites[i] = self.build_shrub(pivot)
-            self.sprites.append(self.focus_sprites[i])
-            self.delete_sprite(sprite)
-        self.plan_update()
+        self.replace_focus_sprites(self.build_shrub)
 
     def mouse_rotate(self, event):
         event_z = complex(event.x, -event.y)
         if self.focus_sprites:
-            pivot = get_pivot(
-                self.coords(self.focus_sprites[0].components[0].id)
-                )
+            pivot = self.to_pixels(self.focus_sprites[0].fence.pivot)
 
             delta_phi = c.phase(event_z-pivot)-c.phase(self.motion_ref-pivot)
             self.rotate(delta_phi)
@@ -270,17 +301,9 @@ class C4HPlan(tk.Canvas):
 
     def rotate(self, phi):
         if self.focus_sprites:
-            pivot = get_pivot(
-                self.coords(self.focus_sprites[0].components[0].id)
-                )
-
-            for components in [sprite.components for sprite in self.focus_sprites]:
-                for component in components:
-                    new_zs = [
-                        pivot+(z-pivot)*c.exp(i*phi) 
-                        for z in cartesian_to_complex(self.coords(component.id))
-                        ]
-                    self.coords(component.id, complex_to_cartesian(new_zs))
+            sprites = list(self.focus_sprites)
+            self.plan.rotate(self.focus_fences(), phi, sprites[0].fence.pivot)
+            self.redraw(sprites)
         
     def mouse_translate(self, event):
         event_z = complex(event.x, -event.y)
@@ -291,48 +314,16 @@ class C4HPlan(tk.Canvas):
 
     def translate(self, delta_z):
         if self.focus_sprites:
-            # self.motion_ref = event_z
-            for components in [sprite.components for sprite in self.focus_sprites]:
-                for component in components:
-                    new_zs = [
-                        z + delta_z 
-                        for z in cartesian_to_complex(self.coords(component.id))
-                        ]
-                    self.coords(component.id, complex_to_cartesian(new_zs))
+            self.plan.move(self.focus_fences(), self.to_cm(delta_z))
+            self.redraw(list(self.focus_sprites))
         
 
     def add_path(self):
-        path_zs = []
-        last_pivot = complex(0,0)
-        last_phi = 0
-
-        if self.open:
-            approach = STRIDE*2.5*self.scale/100
-        else:
-            approach = STRIDE*1.5*self.scale/100
-
-        for id, sprite in enumerate(self.focus_sprites):
-            arrow_zs = cartesian_to_complex(self.coords(sprite.get_arrow()))
-            this_pivot = get_pivot(self.coords(sprite.get_rails()[0]))
-            this_phi = c.phase(arrow_zs[0]-arrow_zs[1])
-            if id: #skip for the first point
-                #add points of curve between last point and next point
-                delta_phi = c.pi - (this_phi - last_phi)
-                ac, a, l, lc = sprite.path_controls.values()
-                p1 = last_pivot + l[0]*c.exp(i*last_phi)
-                p2 = last_pivot + lc[0]*c.exp(i*(last_phi-delta_phi/8))
-                p3 = this_pivot - ac[0]*c.exp(i*(this_phi+delta_phi/8))
-                p4 = this_pivot - a[0]*c.exp(i*this_phi)
-                path_zs += bezier([p1, p2, p3, p4])
-            path_zs.append(this_pivot)
-            last_pivot, last_phi = this_pivot, this_phi
-            
+        fences = self.focus_fences()
+        path_zs = [self.to_pixels(z) for z in self.plan.path(fences)]
         self.create_line(complex_to_cartesian(path_zs), smooth=True, dash=(5,5))
         self.create_line(complex_to_cartesian(path_zs), fill='red', dash=(5,5))
-        path_len = 0
-        for id, z in enumerate(path_zs):
-            if id: path_len += abs(z-path_zs[id-1]) #ignore id 0
-        print(f'path length: {path_len/self.scale} m')
+        print(f'path length: {self.plan.path_length(fences)} m')
 
     ### Input and Output ###
     def output(self):
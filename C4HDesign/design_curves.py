@@ -0,0 +1,146 @@
+""" design_curves.py - Bezier curves for the paths on a plan.
+
+These are called by C4HCoursePlan.
+They should be considered private and only accessed through C4HCoursePlan methods
+
+A Bezier curve sampled at fixed values of t is its control points times a
+matrix of Bernstein polynomials that depends only on the order and the
+number of samples. bernstein tabulates each matrix once, so sampling any
+number of curves of the same order is a single matrix product.
+
+A fixed number of samples cuts the corners off tight turns and wastes
+points on the straights, so adaptive_bezier splits a curve in half, by de
+Casteljau's construction, until each piece is within tolerance of a
+straight line and returns the ends of the pieces. The pieces of many
+curves are tested and split together as arrays, a level at a time.
+"""
+import math
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
+
+TOLERANCE = 5 # cm a piece of a curve can be off a straight line
+MAX_DEPTH = 10 # halvings, so at most 1024 pieces a curve
+
+
+@lru_cache(maxsize=None)
+def bernstein(order: int, samples: int) -> np.ndarray:
+    """Returns the (samples, order + 1) Bernstein basis at samples evenly
+    spaced values of t from 0 to 1. Cached, so it is read only."""
+    t = np.linspace(0, 1, samples)[:, None]
+    k = np.arange(order + 1)[None, :]
+    coeffs = np.array([math.comb(order, j) for j in range(order + 1)], dtype=float)
+    basis = coeffs*t**k*(1 - t)**(order - k)
+    basis.setflags(write=False)
+    return basis
+
+
+def bezier_curves(control_points, samples: int = 8) -> np.ndarray:
+    """Samples many curves of the same order at once.
+
+    Args:
+        control_points: (curves, order + 1) complex control points
+        samples: points on each curve, including its ends
+
+    Returns:
+        np.ndarray: (curves, samples) complex points
+    """
+    control_points = np.asarray(control_points, dtype=complex)
+    basis = bernstein(control_points.shape[-1] - 1, samples)
+    return control_points @ basis.T
+
+
+def bezier(control_points: Sequence[complex], num_points: int = 8) -> List[complex]:
+    """Created a bezier curve from complex points.
+
+    args:
+        control_points: list[complex]
+        num_points: int the number of points defining the curve
+
+    returns:
+        list[complex].
+    """
+    return bezier_curves([control_points], num_points)[0].tolist()
+
+
+def _flatness(pieces: np.ndarray) -> np.ndarray:
+    """How far the inner control points of each piece are from the segment
+    joining its ends."""
+    start, end = pieces[:, :1], pieces[:, -1:]
+    chord = end - start
+    inner = pieces[:, 1:-1] - start
+    length = np.abs(chord)**2
+    t = np.divide(
+        (inner*chord.conj()).real, length,
+        out=np.zeros(inner.shape), where=length > 0
+        )
+    return np.abs(inner - np.clip(t, 0, 1)*chord).max(axis=1)
+
+
+def _split(pieces: np.ndarray) -> tuple:
+    """Splits each piece at t = 1/2 into the control points of its halves."""
+    left, right = [pieces[:, 0]], [pieces[:, -1]]
+    while pieces.shape[1] > 1:
+        pieces = (pieces[:, :-1] + pieces[:, 1:])/2
+        left.append(pieces[:, 0])
+        right.append(pieces[:, -1])
+    return np.stack(left, axis=1), np.stack(right[::-1], axis=1)
+
+
+def adaptive_bezier_curves(control_points, tolerance: float = TOLERANCE,
+        max_depth: int = MAX_DEPTH) -> List[List[complex]]:
+    """Samples many curves densely where they turn and sparsely where they
+    don't.
+
+    The pieces of all the curves are split together a level at a time.
+
+    Args:
+        control_points: (curves, order + 1) complex control points
+
+    Returns:
+        list: for each curve, points along it, including its ends, no more
+            than tolerance from it between them
+    """
+    pieces = np.asarray(control_points, dtype=complex)
+    curves = len(pieces)
+    if not curves:
+        return []
+    ends = [] # (curve, where each piece starts along it in t, its last point)
+    curve = np.arange(curves)
+    start = np.zeros(curves)
+    for depth in range(max_depth + 1):
+        if not len(pieces):
+            break
+        done = _flatness(pieces) <= tolerance if depth < max_depth else np.ones(len(pieces), bool)
+        ends.append((curve[done], start[done], pieces[done, -1]))
+        todo = ~done
+        left, right = _split(pieces[todo])
+        half = 0.5**(depth + 1)
+        pieces = np.concatenate([left, right])
+        curve = np.concatenate([curve[todo], curve[todo]])
+        start = np.concatenate([start[todo], start[todo] + half])
+
+    curve = np.concatenate([c for c, _, _ in ends])
+    start = np.concatenate([s for _, s, _ in ends])
+    points = np.concatenate([z for _, _, z in ends])
+    order = np.lexsort((start, curve))
+    counts = np.bincount(curve, minlength=curves)
+    firsts = np.asarray(control_points, dtype=complex)[:, 0]
+    result = []
+    at = 0
+    for n in range(curves):
+        result.append([complex(firsts[n])] + points[order[at:at + counts[n]]].tolist())
+        at += counts[n]
+    return result
+
+
+def adaptive_bezier(control_points: Sequence[complex], tolerance: float = TOLERANCE,
+        max_depth: int = MAX_DEPTH) -> List[complex]:
+    """Samples a curve densely where it turns and sparsely where it doesn't.
+
+    Returns:
+        list[complex]: points along the curve, including its ends, no more
+            than tolerance from it between them
+    """
+    return adaptive_bezier_curves([control_points], tolerance, max_depth)[0]
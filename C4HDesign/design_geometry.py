@@ -0,0 +1,120 @@
+""" design_geometry.py - the vertices of every fence on a plan in one array.
+
+These are called by C4HCoursePlan.
+They should be considered private and only accessed through C4HCoursePlan methods
+
+A C4HGeometry holds the vertices of the outlines of all the fences as
+complex numbers, x + iy with y up like the rest of C4HDesign, in one numpy
+array. Each fence has a slice of it, so moving or rotating a whole
+selection is one numpy expression over the selection's vertices rather than
+a Python loop per point, and the canvas coords of the selection come out of
+the array together to be written back to the canvas in one go.
+
+Removed fences leave a gap which is closed up once the gaps take up more of
+the array than the fences.
+"""
+import numpy as np
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+CAPACITY = 256 # vertices before the array first grows
+
+
+class C4HGeometry(object):
+    """The vertices of the fences of a plan, by key."""
+
+    def __init__(self):
+        self._zs = np.empty(CAPACITY, dtype=complex)
+        self._used = 0 # vertices up to the end of the last fence
+        self._gaps = 0 # vertices of removed fences
+        self._slices: Dict[Hashable, Tuple[int, int]] = {} # key: (start, stop)
+        self._selection = None # (keys, vertex indices) of the last selection
+
+    def __len__(self) -> int:
+        return len(self._slices)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._slices
+
+    def add(self, key: Hashable, zs: Sequence[complex]) -> None:
+        """Adds the vertices zs under key."""
+        zs = np.asarray(zs, dtype=complex)
+        if self._used + len(zs) > len(self._zs):
+            self._grow(len(zs))
+        start = self._used
+        self._zs[start:start + len(zs)] = zs
+        self._slices[key] = (start, start + len(zs))
+        self._used += len(zs)
+        self._selection = None
+
+    def remove(self, key: Hashable) -> None:
+        """Forgets the vertices under key, if there are any."""
+        if key not in self._slices:
+            return
+        start, stop = self._slices.pop(key)
+        self._gaps += stop - start
+        self._selection = None
+        if self._gaps > self._used - self._gaps:
+            self._compact()
+
+    def _grow(self, needed: int) -> None:
+        zs = np.empty(max(2*len(self._zs), self._used + needed), dtype=complex)
+        zs[:self._used] = self._zs[:self._used]
+        self._zs = zs
+
+    def _compact(self) -> None:
+        slices = sorted(self._slices.items(), key=lambda item: item[1])
+        zs = np.empty(max(CAPACITY, 2*(self._used - self._gaps)), dtype=complex)
+        used = 0
+        for key, (start, stop) in slices:
+            zs[used:used + stop - start] = self._zs[start:stop]
+            self._slices[key] = (used, used + stop - start)
+            used += stop - start
+        self._zs, self._used, self._gaps = zs, used, 0
+
+    def zs(self, key: Hashable) -> np.ndarray:
+        """Returns the vertices under key, a view of the array."""
+        start, stop = self._slices[key]
+        return self._zs[start:stop]
+
+    def _indices(self, keys: Sequence[Hashable]) -> np.ndarray:
+        keys = tuple(keys)
+        if self._selection is None or self._selection[0] != keys:
+            slices = [self._slices[key] for key in keys]
+            indices = np.concatenate(
+                [np.arange(start, stop) for start, stop in slices]
+                ) if slices else np.empty(0, dtype=int)
+            self._selection = (keys, indices)
+        return self._selection[1]
+
+    def transform(self, keys: Sequence[Hashable], rotation: complex = 1,
+            delta: complex = 0, pivot: complex = 0) -> None:
+        """Rotates the vertices under keys about pivot then moves them by delta.
+
+        Args:
+            keys: the fences to transform
+            rotation: multiplies the vertices about the pivot, exp(i*phi)
+                rotates them by phi
+            delta: added to the vertices
+        """
+        indices = self._indices(keys)
+        zs = self._zs[indices]
+        if rotation != 1:
+            zs = pivot + (zs - pivot)*rotation
+        if delta:
+            zs = zs + delta
+        self._zs[indices] = zs
+
+    def coords(self, keys: Sequence[Hashable], scale: float = 1) -> Dict[Hashable, List[float]]:
+        """Returns the vertices under each key as flat canvas coords, x and
+        -y, times scale.
+        """
+        zs = self._zs[self._indices(keys)]*scale
+        flat = np.column_stack((zs.real, -zs.imag)).ravel().tolist()
+        coords = {}
+        start = 0
+        for key in keys:
+            first, stop = self._slices[key]
+            end = start + 2*(stop - first)
+            coords[key] = flat[start:end]
+            start = end
+        return coords
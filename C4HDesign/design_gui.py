@@ -15,7 +15,8 @@ from tkinter import ttk#, filedialog, messagebox, Canvas, Frame
 # from datetime import date
 
 # makes dpi aware so tkinter text isnt blurry
-ctypes.windll.shcore.SetProcessDpiAwareness(1)
+if hasattr(ctypes, 'windll'): # windows only
+    ctypes.windll.shcore.SetProcessDpiAwareness(1)
 
 class C4HDesignGUI(ttk.Notebook):
     ''' Big container for the rest of the stuff.
@@ -32,36 +32,19 @@ def get_pivot(coords: list) -> complex:
     zs = cartesian_to_complex(coords)
     return sum(zs)/len(zs)
 
+def sprite_tag(sprite) -> str:
+    """returns the canvas tag of all the components of sprite
+
+    named for its first component, which it keeps.
+    """
+    return f'sprite{sprite.components[0].id}'
+
 def binomial_coeffs(order: int) -> list:
     coeffs = [1]
     for k in range(order):
         coeffs.append(int((coeffs[k]*(order-k))/(k+1)))
     return coeffs
 
-def bezier(control_points: list, num_points: int = 8) -> list:
-    """Created a bezier curve from complex points.
-
-    Bezier curve is a series of complex 
-
-    args:
-        control_points: list[complex]
-        num_points: int the number of points defining the curve
-
-    returns:
-        list[complex].
-    """
-    curve_zs = []
-    order = len(control_points) - 1 #power of the binomial
-    coeffs = binomial_coeffs(order)
-    
-    for p in range(num_points):
-        t = p/(num_points-1)
-        z = complex(0,0)
-        for ind, cp in enumerate(control_points):
-            z += coeffs[ind] * cp * (1-t)**(order-ind) * t**ind
-        curve_zs.append(z)
-    return curve_zs
-
 def get_intersect_from_zs(pair1, pair2):
     """ Find the intersect of 2 lines given 2 pairs of complex points.
 
@@ -80,20 +63,61 @@ def get_intersect_from_zs(pair1, pair2):
 
 
 
-def _bezier(control_points: list, num_points: int = 8) -> list:
-    """Created a cubic bezier curve from four complex points.
+class C4HFocus(object):
+    """The sprites with focus, in the order they were given it.
 
-    returns a list of complex point.
+    on_change is called with the sprites that gained or lost focus, so only
+    they need repainting. Sprites are kept by identity as the dataclasses
+    aren't hashable.
     """
-    curve_zs = []
-    coeffs = binomial_coeffs(len(control_points))
-    p1, p2, p3, p4 = control_points
-    for p in range(num_points):
-        t = p/(num_points-1)
-        curve_zs.append(
-            p1*(1-t)**3 + 3*p2*(1-t)**2*(t)+3*p3*(1-t)*t**2+p4*t**3
-            )
-    return curve_zs
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self._sprites = {} # id(sprite): sprite
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def __iter__(self):
+        return iter(list(self._sprites.values()))
+
+    def __contains__(self, sprite):
+        return id(sprite) in self._sprites
+
+    def __getitem__(self, index):
+        if index == 0 and self._sprites:
+            return next(iter(self._sprites.values()))
+        return list(self._sprites.values())[index]
+
+    def _changed(self, sprites):
+        if sprites and self.on_change is not None:
+            self.on_change(sprites)
+
+    def add(self, sprite):
+        if id(sprite) not in self._sprites:
+            self._sprites[id(sprite)] = sprite
+            self._changed([sprite])
+
+    def discard(self, sprite):
+        if self._sprites.pop(id(sprite), None) is not None:
+            self._changed([sprite])
+
+    def clear(self):
+        sprites = list(self._sprites.values())
+        self._sprites.clear()
+        self._changed(sprites)
+
+    def replace(self, old, new):
+        """Puts new in the place of old, which loses focus."""
+        if new is old:
+            return
+        if id(old) not in self._sprites:
+            self.add(new)
+            return
+        self._sprites = {
+            (id(new) if key == id(old) else key): (new if key == id(old) else sprite)
+            for key, sprite in self._sprites.items()
+            }
+        self._changed([old, new])
 
 class Config:
     """This defines the configuration for all the dataclasses.
@@ -115,21 +139,14 @@ class C4HComponent(object):
 class C4HSprite(object):
     """A obstacle consisting of C4HComponents.
     
-    may be a jump, island or even start finish lines"""
-
-    number: str = ''
-    rail_width: int = 360 #rail width or radius in cm
-    wing_width: int = 70 #wing width in cm
-    spread: int = 0 # spread in cm
-    #TODO calculate the angle as we go
-    angle: int = 0 # angle from N in degrees
+    may be a jump, island or even start finish lines
+
+    The components are the canvas items drawing fence, a C4HFence of the
+    plan, see design_model.py. Where the fence is and what it looks like
+    are only kept on the fence."""
+
     components: List[C4HComponent] = dataclasses.field(default_factory=lambda: [])
-    path_controls = { #modify bezier paths
-        'approach_control': [0,0],
-        'approach': [0],
-        'landing': [0],
-        'landing_control': [0,0]
-    }
+    fence: Any = None
 
     def get_arrow(self) -> C4HComponent:
         """Returns the id of the arrow components.
@@ -0,0 +1,142 @@
+""" design_index.py - finds the sprites on a plan without asking the canvas.
+
+These are called by the main class C4HPlan.
+They should be considered private and only accessed through C4HPlan methods
+
+A C4HSpatialIndex keeps the canvas coords of every component, which sprite
+it belongs to and which cells of a uniform grid its bounding box covers. A
+click then only looks at the components in the few cells around it, and
+finding a sprite from a canvas id is a dict lookup, however many sprites
+are on the plan.
+
+The cells are the size of the pick radius, a metre on the plan, so a pick
+only looks in the 3 by 3 cells around the click. A rail, 3.6 m or 144
+pixels at the default scale, is then in about four cells along its length.
+"""
+import math
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+CELL = 40 # pixels, the 1 m pick radius at the default scale of 1:40
+
+Cell = Tuple[int, int]
+
+
+def _segment_distance(x: float, y: float, x0: float, y0: float, x1: float, y1: float) -> float:
+    """Distance from (x, y) to the segment (x0, y0) (x1, y1)."""
+    dx, dy = x1 - x0, y1 - y0
+    length = dx*dx + dy*dy
+    if length:
+        t = max(0.0, min(1.0, ((x - x0)*dx + (y - y0)*dy)/length))
+        x0, y0 = x0 + t*dx, y0 + t*dy
+    return math.hypot(x - x0, y - y0)
+
+
+def distance(x: float, y: float, coords: List[float], closed: bool = False) -> float:
+    """Distance from (x, y) to the line through the canvas coords, 0 inside
+    them if they are a closed polygon."""
+    points = list(zip(coords[0::2], coords[1::2]))
+    if len(points) == 1:
+        return math.hypot(x - points[0][0], y - points[0][1])
+    segments = list(zip(points, points[1:]))
+    if closed:
+        segments.append((points[-1], points[0]))
+        inside = False
+        for (x0, y0), (x1, y1) in segments:
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0)*(x1 - x0)/(y1 - y0):
+                inside = not inside
+        if inside:
+            return 0.0
+    return min(_segment_distance(x, y, x0, y0, x1, y1) for (x0, y0), (x1, y1) in segments)
+
+
+class C4HSpatialIndex(object):
+    '''The components of the sprites on a plan, by canvas id and grid cell.
+
+    Attributes:
+        cell (float): the size of a grid cell in pixels
+    '''
+
+    def __init__(self, cell: float = CELL):
+        self.cell = cell
+        self._sprites: Dict[int, Any] = {} # canvas id: C4HSprite
+        self._coords: Dict[int, List[float]] = {}
+        self._closed: Dict[int, bool] = {}
+        self._cells: Dict[int, List[Cell]] = {} # canvas id: the cells it covers
+        self._grid: Dict[Cell, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._sprites
+
+    def _cells_for(self, x0: float, y0: float, x1: float, y1: float) -> List[Cell]:
+        cell = self.cell
+        return [
+            (col, row)
+            for col in range(math.floor(x0/cell), math.floor(x1/cell) + 1)
+            for row in range(math.floor(y0/cell), math.floor(y1/cell) + 1)
+            ]
+
+    def insert(self, id: int, sprite: Any, coords: List[float], closed: bool = False) -> None:
+        """Adds the component with canvas id and coords to sprite."""
+        self._sprites[id] = sprite
+        self._closed[id] = closed
+        self.move(id, coords)
+
+    def move(self, id: int, coords: List[float]) -> None:
+        """Sets the canvas coords of component id."""
+        xs, ys = coords[0::2], coords[1::2]
+        cells = self._cells_for(min(xs), min(ys), max(xs), max(ys))
+        old = self._cells.get(id)
+        if old != cells:
+            if old:
+                for key in old:
+                    ids = self._grid[key]
+                    ids.discard(id)
+                    if not ids:
+                        del self._grid[key]
+            for key in cells:
+                self._grid.setdefault(key, set()).add(id)
+            self._cells[id] = cells
+        self._coords[id] = list(coords)
+
+    def remove(self, id: int) -> None:
+        """Forgets component id, if it is indexed."""
+        if self._sprites.pop(id, None) is None:
+            return
+        for key in self._cells.pop(id):
+            ids = self._grid[key]
+            ids.discard(id)
+            if not ids:
+                del self._grid[key]
+        del self._coords[id]
+        del self._closed[id]
+
+    def sprite(self, id: int) -> Optional[Any]:
+        """Returns the sprite of canvas id, None if it isn't a component."""
+        return self._sprites.get(id)
+
+    def coords(self, id: int) -> List[float]:
+        """Returns the canvas coords of component id as they were indexed."""
+        return self._coords[id]
+
+    def near(self, x: float, y: float, radius: float) -> Iterator[int]:
+        """Yields the ids of the components whose bounding boxes may be
+        within radius of (x, y)."""
+        seen = set()
+        for key in self._cells_for(x - radius, y - radius, x + radius, y + radius):
+            for id in self._grid.get(key, ()):
+                if id not in seen:
+                    seen.add(id)
+                    yield id
+
+    def nearest(self, x: float, y: float, radius: float) -> Optional[Any]:
+        """Returns the sprite with the component closest to (x, y) if it is
+        within radius, otherwise None."""
+        best, best_distance = None, radius
+        for id in self.near(x, y, radius):
+            d = distance(x, y, self._coords[id], self._closed[id])
+            if d <= best_distance:
+                best, best_distance = id, d
+        return None if best is None else self._sprites[best]
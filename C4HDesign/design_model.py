@@ -0,0 +1,290 @@
+""" design_model.py - a course plan without a canvas.
+
+C4HCoursePlan holds the fences of a course in centimetres, as complex
+numbers x + iy with y up, and works out everything about them: the points
+of their rails, arrows and shrubs, the path a horse rides between them and
+how long it is. C4HPlan draws a C4HCoursePlan on a canvas and passes the
+edits made on the canvas back to it, but nothing here needs tk, so plans
+can be analysed, exported and batch processed headless, in worker
+processes too, see analyse_plans.
+
+The plan keeps the outline of every fence in a C4HGeometry, so moving or
+rotating a selection transforms the fences and their outlines together in
+one numpy expression and C4HPlan only has to read the new coords back out.
+Change a fence through the plan, or call set_fence, so its outline follows.
+"""
+import cmath as c
+import dataclasses
+import random
+from concurrent.futures import ProcessPoolExecutor
+from math import degrees, radians
+from typing import Dict, List, Sequence
+
+from pydantic.dataclasses import dataclass
+
+try:
+    from .design_curves import TOLERANCE, adaptive_bezier_curves, bezier_curves
+    from .design_geometry import C4HGeometry
+    from .design_helpers import Config
+except ImportError: # imported by design.py run as a script
+    from design_curves import TOLERANCE, adaptive_bezier_curves, bezier_curves
+    from design_geometry import C4HGeometry
+    from design_helpers import Config
+
+STRIDE = 370 #stride length in cm
+LINE_WIDTH = 20 #width of a rail in cm
+SHRUB_POINTS = 16
+
+JUMP = 'jump'
+SHRUB = 'shrub'
+
+
+@dataclass(config=Config)
+class C4HFence(object):
+    """A jump or shrub on a course plan.
+
+    pivot is the middle of the front rail, or of the shrub, in cm.
+    angle is the rotation in degrees anticlockwise, 0 jumps to the north.
+    spread is from the front rail to the back rail in cm.
+    shape is how far out each point of a shrub is, as a share of its radius.
+    """
+    pivot: complex
+    kind: str = JUMP
+    angle: float = 0
+    rails: int = 1
+    spread: float = 0
+    rail_width: int = 360 #rail width in cm
+    radius: int = 100 #shrub radius in cm
+    number: str = ''
+    shape: List[float] = dataclasses.field(default_factory=lambda: [])
+
+    @property
+    def facing(self) -> complex:
+        """A unit vector in the direction the fence is jumped."""
+        return c.exp(1j*(radians(self.angle) + c.pi/2))
+
+
+class C4HCoursePlan(object):
+    '''The fences of a course.
+
+    Attributes:
+        fences (list of C4HFence):
+        class_height (int): in cm, sets the spread of doubles and triples
+        open (bool): 3.5 stride approach, False -> 2.5 stride approach
+    '''
+
+    def __init__(self, class_height: int = 100, open: bool = True):
+        self.fences: List[C4HFence] = []
+        self.class_height = class_height
+        self.open = open
+        self._geometry = C4HGeometry() # the outline of every fence, by id(fence)
+        self._parts: Dict[int, List[tuple]] = {} # id(fence): [(type, number of points)]
+
+    def __getstate__(self) -> Dict:
+        # the outlines are keyed on id(fence), which a copy doesn't keep
+        state = dict(vars(self))
+        del state['_geometry'], state['_parts']
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        fences = state.pop('fences')
+        self.__init__()
+        vars(self).update(state)
+        for fence in fences:
+            self._add(fence)
+
+    # Fences
+    # -----------------------------------------------------------------
+    def new_jump(self, pivot: complex, rails: int = 1, angle: float = 0) -> C4HFence:
+        spread = 0
+        if rails > 1:
+            spread = self.class_height + 10*(rails - 1)
+        return self._add(C4HFence(pivot=pivot, kind=JUMP, angle=angle, rails=rails, spread=spread))
+
+    def new_shrub(self, pivot: complex, radius: int = 100, angle: float = 0) -> C4HFence:
+        shape = [random.uniform(0.5, 1) for _ in range(SHRUB_POINTS)]
+        return self._add(C4HFence(pivot=pivot, kind=SHRUB, angle=angle, radius=radius, shape=shape))
+
+    def _add(self, fence: C4HFence) -> C4HFence:
+        self.fences.append(fence)
+        self._draw(fence)
+        return fence
+
+    def _draw(self, fence: C4HFence) -> None:
+        parts = self._outline(fence)
+        self._geometry.add(id(fence), [z for _, zs in parts for z in zs])
+        self._parts[id(fence)] = [(type, len(zs)) for type, zs in parts]
+
+    def remove(self, fence: C4HFence) -> None:
+        self.fences = [f for f in self.fences if f is not fence]
+        self._geometry.remove(id(fence))
+        self._parts.pop(id(fence), None)
+
+    def set_fence(self, fence: C4HFence, **fields) -> None:
+        """Sets fields of fence, eg. its rails or radius, and works out its
+        outline again."""
+        for key, val in fields.items():
+            setattr(fence, key, val)
+        self._geometry.remove(id(fence))
+        self._draw(fence)
+
+    def move(self, fences: Sequence[C4HFence], delta: complex) -> None:
+        for fence in fences:
+            fence.pivot = fence.pivot + delta
+        self._geometry.transform([id(fence) for fence in fences], delta=delta)
+
+    def rotate(self, fences: Sequence[C4HFence], phi: float, pivot: complex) -> None:
+        """Rotates fences by phi radians anticlockwise about pivot."""
+        turn = c.exp(1j*phi)
+        for fence in fences:
+            fence.pivot = pivot + (fence.pivot - pivot)*turn
+            fence.angle = (fence.angle + degrees(phi)) % 360
+        self._geometry.transform([id(fence) for fence in fences], rotation=turn, pivot=pivot)
+
+    # Geometry
+    # -----------------------------------------------------------------
+    def outline(self, fence: C4HFence) -> List[tuple]:
+        """Returns the parts of fence as (type, list of complex points in cm),
+        in the order C4HPlan draws them."""
+        zs = self._geometry.zs(id(fence)).tolist()
+        parts = []
+        start = 0
+        for type, count in self._parts[id(fence)]:
+            parts.append((type, zs[start:start + count]))
+            start += count
+        return parts
+
+    def coords(self, fences: Sequence[C4HFence], scale: float = 1) -> List[List[List[float]]]:
+        """Returns, for each fence, the flat canvas coords of each of its
+        parts, x and -y times scale eg. pixels per cm. All the fences are
+        read out of the geometry together."""
+        flat = self._geometry.coords([id(fence) for fence in fences], scale)
+        coords = []
+        for fence in fences:
+            xy = flat[id(fence)]
+            parts = []
+            start = 0
+            for _, count in self._parts[id(fence)]:
+                parts.append(xy[start:start + 2*count])
+                start += 2*count
+            coords.append(parts)
+        return coords
+
+    def _outline(self, fence: C4HFence) -> List[tuple]:
+        if fence.kind == SHRUB:
+            return [(SHRUB, [
+                fence.pivot + fence.radius*share*c.exp(1j*(n*c.tau/SHRUB_POINTS + radians(fence.angle)))
+                for n, share in enumerate(fence.shape)
+                ])]
+
+        along = c.exp(1j*radians(fence.angle))
+        back = -fence.facing
+        gap = fence.spread/(fence.rails - 1) - LINE_WIDTH if fence.rails > 1 else 0
+        parts = []
+        for rail in range(fence.rails):
+            middle = fence.pivot + rail*gap*back
+            parts.append(('rail', [
+                middle - (fence.rail_width/2)*along, middle + (fence.rail_width/2)*along
+                ]))
+        parts.append(('arrow', [
+            fence.pivot - (fence.rail_width/3)*back,
+            fence.pivot + (fence.spread + fence.rail_width/6)*back,
+            ]))
+        return parts
+
+    def approach(self) -> float:
+        """The distance in cm a horse rides straight to and from a fence."""
+        return (3.5 if self.open else 2.5)*STRIDE
+
+    def legs(self, fences: Sequence[C4HFence] = None) -> List[List[complex]]:
+        """Returns the control points in cm of the cubic Bezier curve from
+        landing over each fence to the approach to the next."""
+        if fences is None:
+            fences = self.fences
+        approach = self.approach()
+        control = 4*approach
+        legs = []
+        for last, fence in zip(fences, fences[1:]):
+            last_phi, this_phi = c.phase(last.facing), c.phase(fence.facing)
+            delta_phi = c.pi - (this_phi - last_phi)
+            legs.append([
+                last.pivot + approach*c.exp(1j*last_phi),
+                last.pivot + control*c.exp(1j*(last_phi - delta_phi/8)),
+                fence.pivot - control*c.exp(1j*(this_phi + delta_phi/8)),
+                fence.pivot - approach*c.exp(1j*this_phi),
+                ])
+        return legs
+
+    def path(self, fences: Sequence[C4HFence] = None, num_points: int = None,
+            tolerance: float = TOLERANCE) -> List[complex]:
+        """Returns the points in cm of the path jumping fences in order,
+        all of them if None.
+
+        Each leg between fences is sampled at num_points, all legs in one
+        go, or if num_points is None only as densely as it takes to be
+        within tolerance cm of the curve.
+        """
+        if fences is None:
+            fences = self.fences
+        if not fences:
+            return []
+        legs = self.legs(fences)
+        if not legs:
+            curves = []
+        elif num_points is None:
+            curves = adaptive_bezier_curves(legs, tolerance)
+        else:
+            curves = bezier_curves(legs, num_points).tolist()
+        path_zs = [fences[0].pivot]
+        for curve, fence in zip(curves, fences[1:]):
+            path_zs += curve
+            path_zs.append(fence.pivot)
+        return path_zs
+
+    def path_length(self, fences: Sequence[C4HFence] = None) -> float:
+        """Returns the length in m of the path jumping fences in order."""
+        zs = self.path(fences)
+        return sum(abs(z - zs[n - 1]) for n, z in enumerate(zs) if n)/100
+
+    def distances(self) -> List[float]:
+        """Returns the distance in m between each fence and the next along
+        the path."""
+        return [
+            self.path_length([fence, next_fence])
+            for fence, next_fence in zip(self.fences, self.fences[1:])
+            ]
+
+    # Export
+    # -----------------------------------------------------------------
+    def to_dict(self) -> Dict:
+        """Returns the plan as plain types, eg. to write as yaml."""
+        fences = []
+        for fence in self.fences:
+            fields = dataclasses.asdict(fence)
+            fields['pivot'] = [fence.pivot.real, fence.pivot.imag]
+            fences.append(fields)
+        return {'class_height': self.class_height, 'open': self.open, 'fences': fences}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'C4HCoursePlan':
+        plan = cls(data.get('class_height', 100), data.get('open', True))
+        for fields in data.get('fences', []):
+            fields = dict(fields, pivot=complex(*fields['pivot']))
+            plan._add(C4HFence(**fields))
+        return plan
+
+
+def plan_summary(plan: C4HCoursePlan) -> Dict:
+    """Returns the number of fences, the path length and the distances
+    between fences in m."""
+    return {
+        'fences': len(plan.fences),
+        'length': plan.path_length(),
+        'distances': plan.distances(),
+        }
+
+
+def analyse_plans(plans: Sequence[C4HCoursePlan], workers: int = None) -> List[Dict]:
+    """Returns plan_summary for each plan, worked out in worker processes."""
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(plan_summary, plans))
@@ -3,14 +3,42 @@
     Defines the main class C4HEvent which stores all the helper dataclasses.
 """
 
-from typing import List, Any
+from typing import Any, Iterable, List, NamedTuple, Tuple
+import os
 import yaml
-import copy
 
 from pathlib import Path
 from datetime import date, datetime, timezone
 from .score_helpers import *
-from pydantic import BaseModel
+from .score_index import C4HIndex, C4HView, COLLECTIONS
+from .score_journal import (
+    C4HJournal, COMPACT_RECORDS, UNJOURNALED, journal_path, read_journal, replay
+    )
+from . import score_snapshot
+from .score_tables import event_tables, field_defaults, load_tables, renew_shared_IDs
+from .score_import import C4HImportError, import_nominate
+from .score_placings import RESULTS, C4HPlacings
+from .score_latency import C4HLatency
+from .score_rules import C4HRulesError, article_rules
+from .score_faults import C4HFaults, C4HFaultsError, parse_faults
+from pydantic import BaseModel, PrivateAttr, validate_model
+
+# the yaml exports only hold plain types so use libyaml if it is there
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+class C4HBatch(NamedTuple):
+    '''What the C4HEvent batch constructors made.
+
+    Attributes:
+        objects (list): the new objects, in the order of their records
+        errors (list[tuple[int, Exception]]): (position in the records,
+            why it couldn't be made) for each record that was skipped
+    '''
+    objects: List[Any]
+    errors: List[Tuple[int, Exception]]
+
 
 class C4HEvent(BaseModel):
     '''Equestrian Event.
@@ -29,6 +57,8 @@ class C4HEvent(BaseModel):
         last_save (datetime): UTC date & time the event was last saved
         last_change (datetime): UTC date and time of last change in any data
         filename (Path): the name of the event file. None for unsaved events
+        journaled (bool): if True changes are appended to a journal next to
+            the event file as they are made, see score_journal.py
     '''
     name: str
     details:  str = ''
@@ -43,11 +73,144 @@ class C4HEvent(BaseModel):
     last_save: datetime = datetime(1984,4,4, 13, tzinfo=timezone.utc)
     last_change: datetime = datetime.now(timezone.utc)
     filename: Path = None
+    journaled: bool = False
+
+    # secondary indexes over the lists, see score_index.py
+    _index: C4HIndex = PrivateAttr(default_factory=C4HIndex)
+    # journal of changes since the last snapshot, None if not journaling
+    _journal: C4HJournal = PrivateAttr(default=None)
+    # placings for each jumpclass key, made by get_placings, see score_placings.py
+    _placings: dict = PrivateAttr(default_factory=dict)
+    # latency histograms for timer results, see score_latency.py
+    _latency: C4HLatency = PrivateAttr(default=None)
+    # when the timer result being set was read, while timer_event is setting it
+    _timer_received: float = PrivateAttr(default=None)
 
     class Config:
         validate_assignment = True
         arbitrary_types_allowed = True        
 
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._reindex()
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name not in self.__fields__:
+            return
+        # replacing a whole list means its indexes need rebuilding
+        if name in COLLECTIONS.values():
+            self._index.rebuild(name, getattr(self, name))
+            self._placings.clear()
+            if self._journal:
+                self._journal.record_list(name, getattr(self, name))
+        elif self._journal and name not in UNJOURNALED:
+            self._journal.record_event({name: getattr(self, name)})
+
+    def __getstate__(self):
+        # the indexes and journal hold no event data so aren't saved or copied
+        state = super().__getstate__()
+        state['__fields_set__'] = set(state['__fields_set__'])
+        state['__private_attribute_values__'] = {}
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._init_private_attributes()
+        # a deep copy or unpickle may not have finished the objects yet
+        self._index.rebuild_later(
+            {collection: getattr(self, collection) for collection in COLLECTIONS.values()}
+            )
+
+    def _reindex(self):
+        """Rebuilds the indexes for all the lists of objects."""
+        for collection in COLLECTIONS.values():
+            self._index.rebuild(collection, getattr(self, collection))
+
+    def _add_object(self, obj: object) -> object:
+        """Appends obj to the list for its type and indexes it."""
+        collection = COLLECTIONS[type(obj)]
+        getattr(self, collection).append(obj)
+        self._index.add(collection, obj)
+        if self._journal:
+            self._journal.record_new(collection, obj)
+        if self._placings and collection == 'rounds':
+            self._round_changed(obj)
+        self.update()
+
+        return obj
+
+    def _add_objects(self, collection: str, objects: List[Any]) -> None:
+        """Appends objects to collection and indexes them without calling update."""
+        getattr(self, collection).extend(objects)
+        for obj in objects:
+            self._index.add(collection, obj)
+            if self._journal:
+                self._journal.record_new(collection, obj)
+        if self._placings and collection == 'rounds':
+            for obj in objects:
+                self._round_changed(obj)
+
+    def round_faults(self, round_: C4HRound) -> C4HFaults:
+        """Returns the parsed faults of round_, cached on the faults string.
+
+        Raises:
+            C4HFaultsError: if the faults can't be parsed
+        """
+        jumpclass = round_.jumpclass
+        return parse_faults(round_.faults, jumpclass.fences if jumpclass else 0)
+
+    def _round_penalties(self, round_: C4HRound) -> dict:
+        """Returns the round attributes that come from its faults."""
+        faults = self.round_faults(round_)
+        return {
+            'jump_pens': faults.jump_pens, 'eliminated': faults.eliminated,
+            'time_added': faults.time_added,
+            }
+
+    def timer_event(self, round_: C4HRound, timer_event: Any) -> bool:
+        """Sets the result in a packet from a timing console on round_.
+
+        Args:
+            round_ (C4HRound): the round being jumped
+            timer_event (C4HTimerEvent): see C4HTiming/timing_farmtek.py,
+                a 'time' sets the round time and 'faults' its time penalties.
+                Running times aren't results and are ignored.
+
+        Returns:
+            bool: True if round_ was changed
+        """
+        value = timer_event.value
+        if timer_event.kind == 'time':
+            kwargs = {'time': value}
+        elif timer_event.kind == 'faults':
+            kwargs = {'time_pens': int(value) if value.is_integer() else value}
+        else:
+            return False
+        if self._latency is not None:
+            self._timer_received = timer_event.received
+        try:
+            return self.set_object(round_, **kwargs)
+        finally:
+            self._timer_received = None
+
+    def set_latency(self, latency: C4HLatency = None) -> None:
+        """Marks the 'round' and 'placings' stages of every timer result
+        in latency, None to stop. See score_latency.py."""
+        self._latency = latency
+
+    def _round_changed(self, round_: C4HRound) -> None:
+        """Moves the combo of round_ in the placings that have been made."""
+        for placings in self._placings.values():
+            placings.update(round_)
+
+    def _collection_of_list(self, list_of_obj: List[Any]) -> str:
+        """Returns the name of the event list list_of_obj is, None if it isn't one."""
+        for collection in COLLECTIONS.values():
+            if getattr(self, collection) is list_of_obj:
+                return collection
+        return None
+
     def update(self):
         self.last_change = datetime.now(timezone.utc)
         return self.last_change
@@ -66,8 +229,32 @@ class C4HEvent(BaseModel):
             this_event.set_object(arena1, name='Main Arena')
         """
 
-        for key, val in kwargs.items():
-            setattr(obj, key, val)
+        try:
+            for key, val in kwargs.items():
+                setattr(obj, key, val)
+            if 'faults' in kwargs and isinstance(obj, C4HRound):
+                penalties = self._round_penalties(obj)
+                for key, val in penalties.items():
+                    setattr(obj, key, val)
+                kwargs = {**kwargs, **penalties}
+            if (isinstance(obj, C4HRound) and 'judged' not in kwargs
+                    and not RESULTS.isdisjoint(kwargs)):
+                obj.judged = True
+                kwargs = {**kwargs, 'judged': True}
+        finally:
+            collection = self._index.reindex(obj)
+        if collection and self._journal:
+            self._journal.record_set(collection, obj, kwargs)
+        received = self._timer_received
+        if received is not None:
+            self._latency.mark('round', received)
+        if self._placings and collection == 'rounds':
+            self._round_changed(obj)
+            if received is not None:
+                self._latency.mark('placings', received)
+        elif collection == 'jumpclasses' and 'article' in kwargs:
+            # placed under the old article, they are made again when asked for
+            self._placings.pop(self._index.position(obj), None)
 
         self.update() #this probably isnt necessary
         return True
@@ -90,34 +277,70 @@ class C4HEvent(BaseModel):
             this_event.exists_object(this_event.arenas[0], name='Main Arena')
         """
 
-        attr_lists = [val for key, val in vars(self).items() if type(val) is list]
-        attr_list = [l for l in attr_lists if l and type(l[0]) is type(obj)]
+        objects = getattr(self, COLLECTIONS[type(obj)])
         if kwargs:
-            # get all the list type attributes
-            return (self.get_objects(attr_list[0], **kwargs))
+            return self.get_objects(objects, **kwargs)
         else:
             # TODO check if there is a use case for this
-            return [o for o in attr_list[0] if o == obj]
+            return [o for o in objects if o == obj]
 
 
-    def get_objects(self, list_of_obj: List[Any], **kwargs) -> List[Any]:
+    def get_objects(self, list_of_obj: List[Any], **kwargs) -> C4HView:
         """Find objects in a list with attributes matching kwargs.
 
-        If no kwargs are given a deep copy of the list is returned.
+        Nothing is copied, a read-only view over the live objects is returned.
+        Use the view's snapshot() method when a copy is really needed.
+        When list_of_obj is one of the event's lists the search starts from
+        the indexes on id, ea_number, name and (surname, forename) rather than
+        scanning the list.
 
         Args:
             list_of_obj (list[C4HScore datacless objects]): The objects to check
             kwargs: Can be any attribute of the obj.
         
         Returns:
-            list_of_obj (list[C4HScore datacless objects]):
+            C4HView: all the objects if no kwargs are given
         """
 
-        objects = copy.deepcopy(list_of_obj)
-        for key, val in kwargs.items():
-            objects = [o for o in objects if getattr(o, key) == val]
+        collection = self._collection_of_list(list_of_obj)
+        if collection:
+            return self.query(collection, **kwargs)
+
+        return C4HView(list_of_obj, kwargs)
+
+    def query(self, collection: str, **kwargs) -> C4HView:
+        """Find objects in one of the event's lists with attributes matching kwargs.
+
+        Args:
+            collection (str): name of the list eg. 'riders'
+            kwargs: Can be any attribute of the objects in the list.
+
+        Returns:
+            C4HView: a lazy read-only view of the matching objects
+
+        Example:
+            for rider in this_event.query('riders', surname='Gravity'): ...
+        """
+
+        return C4HView(getattr(self, collection), kwargs, self._index, collection)
+
+    def key_of(self, obj: object) -> int:
+        """Returns the key of obj, its position in its event list.
+
+        Keys are dense and never change so can be used to index arrays
+        holding something for every object in a list, see score_index.py.
 
-        return objects
+        Raises:
+            ValueError: if obj isn't in the event
+        """
+        key = self._index.position(obj)
+        if key is None:
+            raise ValueError(f'{type(obj).__name__} is not in the event')
+        return key
+
+    def get_by_ID(self, ID: uuid.UUID) -> Any:
+        """Returns the object in any of the event lists with the uuid ID, or None."""
+        return self._index.by_uuid(ID)
 
     def merge_objects(self, obj1, obj2):
         # TODO
@@ -136,8 +359,7 @@ class C4HEvent(BaseModel):
         """
         a = C4HArena(event=self)
         self.set_object(a, **kwargs)
-        self.arenas.append(a)
-        self.update()
+        self._add_object(a)
 
         return a
     
@@ -158,8 +380,7 @@ class C4HEvent(BaseModel):
 
         r = C4HRider(self)
         self.set_object(r, **kwargs)
-        self.riders.append(r)
-        self.update()
+        self._add_object(r)
 
         return r
     
@@ -178,8 +399,7 @@ class C4HEvent(BaseModel):
         '''
         h = C4HHorse(self)
         self.set_object(h, **kwargs)
-        self.horses.append(h)
-        self.update()
+        self._add_object(h)
 
         return h
 
@@ -198,11 +418,108 @@ class C4HEvent(BaseModel):
         '''
         c = C4HCombo(self)
         self.set_object(c, **kwargs)
-        self.combos.append(c)
-        self.update()
+        self._add_object(c)
 
         return c
     
+    def _new_objects(self, obj_type: type, records: Iterable[dict]) -> C4HBatch:
+        """Creates an object of obj_type from each record and adds them all.
+
+        Each object is validated once, as it is created, and update is only
+        called once for the whole batch. The IDs for the batch are reserved
+        in one go. A record that isn't valid is skipped
+        and reported in the errors rather than stopping the batch.
+        """
+        records = list(records)
+        IDs = next_ID.take(len(records))
+        objects = []
+        errors = []
+        takes_event = 'event' in obj_type.__dataclass_fields__
+        for n, (record, ID) in enumerate(zip(records, IDs)):
+            record = {'ID': ID, **record}
+            try:
+                if takes_event:
+                    obj = obj_type(self, **record)
+                else:
+                    obj = obj_type(**record)
+            except (TypeError, ValueError) as e:
+                errors.append((n, e))
+                continue
+            objects.append(obj)
+
+        if objects:
+            self._add_objects(COLLECTIONS[obj_type], objects)
+            self.update()
+        return C4HBatch(objects, errors)
+
+    def new_riders(self, records: Iterable[dict]) -> C4HBatch:
+        """creates a rider for each record and appends them to the rider list.
+
+        Much quicker than calling new_rider for each one.
+
+        Args:
+            records (iterable[dict]): the kwargs new_rider would be given
+
+        Returns:
+            C4HBatch: the new riders and the records that weren't valid
+
+        Example:
+            this_event.new_riders([{'surname': 'Gravity', 'forename': 'Andi'}, ...])
+        """
+        return self._new_objects(C4HRider, records)
+
+    def new_horses(self, records: Iterable[dict]) -> C4HBatch:
+        """creates a horse for each record and appends them to the horses list.
+
+        Much quicker than calling new_horse for each one.
+
+        Args:
+            records (iterable[dict]): the kwargs new_horse would be given
+
+        Returns:
+            C4HBatch: the new horses and the records that weren't valid
+        """
+        return self._new_objects(C4HHorse, records)
+
+    def new_combos(self, records: Iterable[dict]) -> C4HBatch:
+        """creates a combo for each record and appends them to the combo list.
+
+        Much quicker than calling new_combo for each one. Records without an
+        id are given the next free numbers, reserved for the whole batch at
+        once.
+
+        Args:
+            records (iterable[dict]): the kwargs new_combo would be given
+
+        Returns:
+            C4HBatch: the new combos and the records that weren't valid
+        """
+        records = list(records)
+        taken = {c.id for c in self.combos}
+        taken.update(r['id'] for r in records if r.get('id'))
+        ids = self._reserve_ids(taken, sum(1 for r in records if not r.get('id')))
+        records = [r if r.get('id') else {**r, 'id': next(ids)} for r in records]
+
+        return self._new_objects(C4HCombo, records)
+
+    @staticmethod
+    def _reserve_ids(taken: set, count: int) -> Iterable[str]:
+        """Returns an iterator over count numerical ids that aren't in taken,
+        counting up from the highest numerical id in taken.
+
+        Older files and imports can have ints as ids, they are taken as the
+        same id as their string.
+        """
+        taken = {str(i) for i in taken}
+        start = max((int(i) for i in taken if i.isdigit()), default=0) + 1
+        ids = []
+        n = start
+        while len(ids) < count:
+            if str(n) not in taken:
+                ids.append(str(n))
+            n += 1
+        return iter(ids)
+
     def new_official(self, **kwargs) -> C4HOfficial:
         '''creates a new official and appends it to the list.
         All attributes can bet set at initiation using kwargs.
@@ -217,8 +534,7 @@ class C4HEvent(BaseModel):
 
         o = C4HOfficial()
         self.set_object(o, **kwargs)
-        self.officials.append(o)
-        self.update()
+        self._add_object(o)
 
         return o
 
@@ -229,85 +545,339 @@ class C4HEvent(BaseModel):
         Args:
             id (str): an integer that may have a character appended eg. 8c 
             name (str):
-            arena (_C4HArena):
+            arena (C4HArena):
             ID (uuid): unique identifier
             description (str):
-            article (EAArticle):
+            article (str): the article number eg. '238.2.2'
             height (int): the height in cm
             judge (str): judges name
             cd (str): course designer name
             places (int): the number of places awarded prizes
-            rounds (list[_C4HRound]): rounds entered in this arenas
 
         Returns:
-            C4HOfficial
+            C4HJumpClass
         '''
-        j = C4HJumpClass()
+        j = C4HJumpClass(self)
         self.set_object(j, **kwargs)
-        self.jumpclasses.append(j)
-        self.update()
+        self._add_object(j)
 
+        return j
 
-    def get_jumpclasses(self):
-        pass
-    #     '''Find jumpclass matching kwargs.
-
-    #     keyword args:
-    #         arena (_C4HArena):
-    #         article (C4HArticle):
-    #         cd (C4Hcd):
-    #         description (str):
-    #         height (str):
-    #         id (str):
-    #         judge (C4HJudge):
-    #         name (str):
-    #         places(int):
-    #         rounds(int):
-    #         jumpoffs (int):
-
-    #     Returns:
-    #         list[_C4HJumpClass] list empty if no matches.
-    #     '''
-    #     # jclasses = self.jumpclasses
-    #     # for key, val in kwargs.items():
-    #     #     jclasses = [jc for jc in jclasses if getattr(jc, key) == val]
-    #     jclasses = []
-    #     jclasses.extend([a.get_jumpclasses(**kwargs) for a in self.arenas])
-    #     return jclasses
-
-    def new_round(self):
-        pass
+    def get_jumpclasses(self, **kwargs) -> C4HView:
+        '''Find jumpclasses matching kwargs.
 
-    def get_rounds(self):
-        pass
+        keyword args:
+            Can be any attribute of C4HJumpClass eg. id, arena
+
+        Returns:
+            C4HView: all jumpclasses if no kwargs are given.
+        '''
+        return self.query('jumpclasses', **kwargs)
+
+    def new_round(self, **kwargs) -> C4HRound:
+        '''creates a new round and appends it to the rounds list.
+        All attributes can bet set at initiation using kwargs.
+
+        Args:
+            jumpclass (C4HJumpClass):
+            round_type (str): r1, r2, jo1, jo2 etc
+            combo (C4HCombo):
+            faults (str): eg. '3r 7dr'
+            jump_pens (int):
+            time (float):
+            time_pens (int):
+            notes (str):
+
+        Returns:
+            C4HRound
+        '''
+        r = C4HRound(self)
+        self.set_object(r, **kwargs)
+        self._add_object(r)
+
+        return r
+
+    def get_rounds(self, **kwargs) -> C4HView:
+        '''Find rounds matching kwargs.
+
+        keyword args:
+            Can be any attribute of C4HRound eg. jumpclass, combo
+
+        Returns:
+            C4HView: all rounds if no kwargs are given.
+        '''
+        return self.query('rounds', **kwargs)
+
+    def get_placings(self, jumpclass: C4HJumpClass) -> C4HPlacings:
+        """Returns the placings for jumpclass.
+
+        They are worked out from the rounds the first time and are then kept
+        up to date as rounds are added or changed through the event.
+        Changes made by assigning to round attributes directly are missed.
+        Rounds are placed by the rules of the jumpclass article, see
+        score_rules.py.
+
+        Raises:
+            C4HRulesError: if the jumpclass article isn't in the article library
+
+        Example:
+            for place, combo, round in this_event.get_placings(jumpclass).placings(): ...
+        """
+        key = self.key_of(jumpclass)
+        placings = self._placings.get(key)
+        if placings is None:
+            rules = article_rules(jumpclass.article)
+            placings = C4HPlacings(
+                jumpclass, self.key_of, key=rules.key, penalties=rules.penalties,
+                jumpoffs=bool(rules.jumpoffs)
+                )
+            for r in self.rounds:
+                if r.jumpclass is jumpclass:
+                    placings.update(r)
+            self._placings[key] = placings
+        return placings
 
     def event_save(self):
-        """Dumps the event to a yaml like file."""
+        """Saves the event to a binary snapshot file.
+
+        A journaled event has already appended its changes to the journal so
+        saving just makes sure the journal is on disk. Once the journal has
+        COMPACT_RECORDS records it is compacted into the event file: the
+        snapshot is taken here, so it holds exactly the records journaled so
+        far, and only written in the background. No snapshot is taken while
+        the last one is still being written, the next save compacts instead. A full snapshot is only
+        written the first time, after a change the journal couldn't record
+        or when the filename changes.
+        """
         # timestamp first so timestamp gets saved
         self.last_save = datetime.now(timezone.utc)
 
-        with open(self.filename, 'w') as out_file:
-            out_file.write(f'--- # {self.name} C4HScore\n')
-            yaml.dump(self, out_file)
-        
+        journal = self._journal
+        if (self.journaled and journal
+                and journal.path == journal_path(self.filename)
+                and not journal.needs_snapshot):
+            journal.sync()
+            # a snapshot taken while one is still being written would be thrown away
+            if journal.count >= COMPACT_RECORDS and not journal.compacting:
+                fn = self.filename
+                data = score_snapshot.dumps(self, self._saved_fields())
+                journal.compact(lambda: self._write(fn, data))
+            return
+
+        if journal:
+            journal.close()
+            self._journal = None
+        self._dump(self.filename)
+        if self.journaled:
+            # the snapshot holds everything so start with an empty journal
+            self._journal = C4HJournal(self.filename, self._index)
+        elif journal_path(self.filename).exists():
+            os.remove(journal_path(self.filename))
+
+    def _saved_fields(self) -> List[str]:
+        """Returns the event attributes that are saved, other than the lists."""
+        return [
+            f for f in self.__fields__
+            if f not in COLLECTIONS.values() and f != 'filename'
+            ]
+
+    def _dump(self, fn):
+        """Writes a snapshot of the whole event to fn, replacing it in one step."""
+        self._write(fn, score_snapshot.dumps(self, self._saved_fields()))
+
+    @staticmethod
+    def _write(fn, data: bytes):
+        """Writes the bytes of a snapshot to fn, replacing it in one step."""
+        tmp = Path(f'{fn}.tmp')
+        with open(tmp, 'wb') as out_file:
+            out_file.write(data)
+        os.replace(tmp, fn)
 
     def event_save_as(self, fn):       
         self.filename = fn
         self.event_save()
 
-    def event_open(self, fn):
-        ''' Creates an event from a c4hs yaml file.
+    def event_export_yaml(self, fn):
+        """Dumps the event to a yaml file.
+
+        The yaml is much slower to read and write than the event file
+        but can be read by people and other programs. Each list is written
+        as a table with the objects in it referring to each other by their
+        position, see score_tables.py, so only plain yaml types are used.
+        """
+        tables = event_tables(self, self._saved_fields())
+        with open(fn, 'w') as out_file:
+            out_file.write(f'--- # {self.name} C4HScore\n')
+            yaml.dump(tables, out_file, Dumper=YAML_DUMPER, sort_keys=False)
+
+    def event_open(self, fn, trusted: bool = True):
+        ''' Creates an event from a c4hs file.
+
+        The file can be a binary snapshot or a yaml export. If there is a
+        journal next to the file its changes are replayed on top of the file.
+
+        Args:
+            fn (str or Path): the file name
+            trusted (bool): build the objects in a binary snapshot without
+                validating them, they were valid when they were saved. Use
+                event_validate to check them. Yaml exports can be edited by
+                hand so are always validated.
         
         Returns:
             C4HEvent
         '''
-        with open(fn, 'r') as in_file:
-            new_event = yaml.load(in_file, Loader=yaml.FullLoader)
+        with open(fn, 'rb') as in_file:
+            data = in_file.read()
+
+        if data.startswith(score_snapshot.MAGIC):
+            new_event = score_snapshot.loads(data, C4HEvent, trusted)
+        else:
+            text = data.decode('utf-8')
+            try:
+                tables = yaml.load(text, Loader=YAML_LOADER)
+            except yaml.constructor.ConstructorError:
+                # exported before the lists were written as tables
+                new_event = C4HLoader.load_event(text)
+            else:
+                new_event = load_tables(C4HEvent, tables)
 
         # user may have changed the filename so...
         new_event.filename = fn
+
+        if journal_path(fn).exists():
+            count = replay(new_event, read_journal(fn))
+            new_event._journal = C4HJournal(fn, new_event._index, count)
+        elif new_event.journaled:
+            new_event._journal = C4HJournal(fn, new_event._index)
+
+        # everything is on disk
+        new_event.last_save = new_event.last_change
         return new_event
 
+    def event_import_nominate(self, fn) -> dict:
+        """Imports the entries in a Nominate csv export, see score_import.py.
+
+        Args:
+            fn (str or Path): the csv file with ID, Class, Rider and Horse
+                columns and optionally Rider EA and Horse EA columns
+
+        Returns:
+            dict: collection: the number of objects added to it
+
+        Raises:
+            C4HImportError: listing the problems found, nothing is imported
+        """
+        with open(fn, newline='', encoding='utf-8-sig') as in_file:
+            return import_nominate(self, in_file)
+
+    def event_validate(self):
+        """Validates the event attributes and every object in its lists.
+
+        Objects are only validated as they are created and changed, this
+        checks everything, eg. after opening a trusted snapshot. Values are
+        converted to their field types as they would be on creation.
+
+        Raises:
+            ValidationError: for the first invalid object
+        """
+        values, _, error = validate_model(type(self), self.__dict__)
+        if error:
+            raise error
+        # keep the lists themselves, only their objects are checked below
+        self.__dict__.update(
+            (k, v) for k, v in values.items() if k not in COLLECTIONS.values()
+            )
+        for collection in COLLECTIONS.values():
+            for obj in getattr(self, collection):
+                values, _, error = validate_model(
+                    obj.__pydantic_model__, obj.__dict__, cls=type(obj)
+                    )
+                if error:
+                    raise error
+                obj.__dict__.update(values)
+        self._reindex()
+
+    def event_close(self):
+        """Closes the journal, waiting for any compaction to finish."""
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+
+class C4HLoader(yaml.FullLoader):
+    '''Loader for c4hs files exported as python objects by older versions.
+
+    FullLoader won't construct python objects so this adds constructors for
+    the C4HScore classes, uuid.UUID and pathlib paths only. Fields added
+    since the file was written are given their defaults.
+    '''
+
+    classes = {
+        cls.__name__: cls for cls in [C4HEvent, *COLLECTIONS, uuid.UUID]
+        }
+
+    def find_c4h_class(self, suffix, node):
+        module, _, name = suffix.rpartition('.')
+        cls = self.classes.get(name)
+        # the package may have been imported under a different name
+        if cls is None or module.rpartition('.')[2] != cls.__module__.rpartition('.')[2]:
+            raise yaml.constructor.ConstructorError(
+                'while constructing a C4HScore object', node.start_mark,
+                f'{suffix} is not a C4HScore class', node.start_mark
+                )
+        return cls
+
+    def construct_c4h_object(self, suffix, node):
+        cls = self.find_c4h_class(suffix, node)
+        instance = cls.__new__(cls)
+        yield instance
+        deep = hasattr(instance, '__setstate__')
+        state = self.construct_mapping(node, deep=deep)
+        if deep:
+            if issubclass(cls, BaseModel):
+                state['__dict__'] = {
+                    **{name: field.get_default() for name, field in cls.__fields__.items()
+                        if not field.required},
+                    **state['__dict__'],
+                    }
+            instance.__setstate__(state)
+        else:
+            if hasattr(cls, '__dataclass_fields__'):
+                values, factories = field_defaults(cls)
+                values = dict(values)
+                values.update(
+                    (name, factory()) for name, factory in factories.items()
+                    if name not in state
+                    )
+                instance.__dict__.update(values)
+            instance.__dict__.update(state)
+
+    def construct_path(self, suffix, node):
+        if suffix not in ('pathlib.Path', 'pathlib.PosixPath', 'pathlib.WindowsPath'):
+            raise yaml.constructor.ConstructorError(
+                'while constructing a path', node.start_mark,
+                f'{suffix} is not a pathlib path', node.start_mark
+                )
+        return Path(*self.construct_sequence(node))
+
+    @classmethod
+    def load_event(cls, text: str) -> C4HEvent:
+        """Creates an event from the text of a python object c4hs file."""
+        event = yaml.load(text, Loader=cls)
+        # older versions wrote True in place of the event the objects are in
+        for collection in COLLECTIONS.values():
+            for obj in getattr(event, collection):
+                if 'event' in getattr(type(obj), '__dataclass_fields__', ()):
+                    obj.__dict__['event'] = event
+        if renew_shared_IDs(event):
+            event._reindex()
+        return event
+
+C4HLoader.add_multi_constructor(
+    'tag:yaml.org,2002:python/object:', C4HLoader.construct_c4h_object)
+C4HLoader.add_multi_constructor(
+    'tag:yaml.org,2002:python/object/apply:', C4HLoader.construct_path)
+
 
 
 # class Config:
@@ -0,0 +1,126 @@
+""" score_clock.py - the running clock shown on the scoreboard.
+
+In continuous mode a Farmtek sends the running time as often as 9600 baud
+lets it, with a few milliseconds of jitter in when each packet is read.
+Redrawing on every packet floods tk and the time shown stutters, so a
+C4HRunningClock locks onto the packets and the scoreboard asks it for the
+time at its own frame rate:
+
+    running: the packet's value, plus the time since it was received
+        scaled by the device clock's skew. Small errors are slewed out so
+        the time shown doesn't jitter, a big one (a new round, a missed
+        stop) snaps straight to the packet. The time never goes backwards
+        and never goes behind the last packet.
+    held: the console sent the same running time again, it has stopped
+    final: a 'time' packet eg. '  61.27 (M)', shown exactly until the next
+        round starts
+
+If the packets stop coming the time is only carried on for HOLD seconds.
+The events are duck typed C4HTimerEvents, see C4HTiming/timing_farmtek.py.
+"""
+
+import math
+import time
+
+from typing import Any, Optional
+
+# states
+STOPPED = 'stopped'
+RUNNING = 'running'
+HELD = 'held'
+FINAL = 'final'
+
+SNAP = 0.25 # seconds out before the clock snaps to a packet rather than slewing
+GAIN = 0.1 # share of a small error slewed out by each packet
+HOLD = 0.5 # seconds carried on after the last packet
+FRAME_RATE = 25 # frames a second the scoreboard asks for the time
+
+
+class C4HRunningClock(object):
+    '''Interpolates the running time between timer packets.
+
+    Attributes:
+        state (str): STOPPED, RUNNING, HELD or FINAL
+        skew (float): how much faster the host clock runs than the device's,
+            eg. from the driver's C4HClockSync
+        snaps (int): times the clock has snapped to a packet
+    '''
+
+    def __init__(self, skew: float = 0.0):
+        self.state = STOPPED
+        self.skew = skew
+        self.snaps = 0
+        self._start = None # host time the running time was 0
+        self._last_value = 0.0 # the last packet's time
+        self._last_received = 0.0
+        self._shown = 0.0 # the time last returned while running
+
+    def feed(self, timer_event: Any) -> bool:
+        """Locks onto a timer event.
+
+        Returns:
+            bool: True if the clock started, stopped or snapped, so the
+                scoreboard should be drawn straight away
+        """
+        kind, value, received = timer_event.kind, timer_event.value, timer_event.received
+        if kind == 'time':
+            changed = self.state != FINAL or value != self._last_value
+            self.state = FINAL
+            self._last_value = value
+            return changed
+        if kind != 'running':
+            return False
+
+        if self.state in (RUNNING, HELD) and value == self._last_value:
+            changed = self.state != HELD
+            self.state = HELD
+            self._last_received = received
+            return changed
+
+        start = received - value*(1 + self.skew)
+        if self.state == FINAL and value > self._last_value - SNAP:
+            # the stopped console's running time, not a new round
+            return False
+        snapped = (
+            self.state != RUNNING or value < self._last_value
+            or abs(start - self._start) > SNAP
+            )
+        if snapped:
+            self._start = start
+            self._shown = value
+            self.snaps += 1
+        else:
+            self._start += GAIN*(start - self._start)
+        self.state = RUNNING
+        self._last_value = value
+        self._last_received = received
+        return snapped
+
+    def reading(self, now: float = None) -> Optional[float]:
+        """Returns the time to show at time.monotonic() now, None if STOPPED."""
+        if self.state == STOPPED:
+            return None
+        if self.state != RUNNING:
+            return self._last_value
+        if now is None:
+            now = time.monotonic()
+        now = min(now, self._last_received + HOLD)
+        shown = max((now - self._start)/(1 + self.skew), self._last_value, self._shown)
+        self._shown = shown
+        return shown
+
+    def text(self, now: float = None) -> str:
+        """Returns the time to show, tenths while running and hundredths
+        once it has stopped."""
+        reading = self.reading(now)
+        if reading is None:
+            return ''
+        if self.state == RUNNING:
+            return f'{math.floor(reading*10 + 1e-9)/10:.1f}'
+        return f'{reading:.2f}'
+
+    def reset(self) -> None:
+        self.state = STOPPED
+        self._start = None
+        self._last_value = 0.0
+        self._shown = 0.0
@@ -0,0 +1,172 @@
+""" score_faults.py - parses the faults judges type for a C4HRound.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+The faults are jump numbers, with a, b or c for the elements of a
+combination, each followed by one or more fault letters:
+    r: rail, a knockdown
+    d: disobedience
+    k: knockdown or displacement while disobeying, adds correction time
+    f: fall
+    e: elimination
+eg. '3r 7dr 9bd'. Jumps can be separated by spaces or commas and case is
+ignored.
+
+Parsing is a single pass of a compiled regular expression and the results
+are cached on the string, so redrawing a scoreboard costs a dict lookup per
+round. A changed string is simply a different key.
+"""
+
+import re
+
+from typing import Dict, NamedTuple, Tuple
+
+# penalties for each fault, rules can be changed by making a C4HFaultParser
+PENALTIES = {'r': 4, 'd': 4, 'k': 0, 'f': 0, 'e': 0}
+TIME_ADDED = {'k': 6.0} # seconds of correction time
+ELIMINATING = 'fe' # faults that eliminate straight away
+DISOBEDIENCE_LIMIT = 2 # disobediences that eliminate
+
+CACHE_SIZE = 65536 # parsed strings kept, a few MB at most
+
+_SCANNER = re.compile(
+    r'(?P<jump>\d+)(?P<element>[abc]?)(?P<faults>[rdkfe]+)'
+    r'|(?P<bare>\d+[abc]?)'
+    r'|(?P<sep>[\s,]+)'
+    r'|(?P<bad>.)',
+    re.IGNORECASE | re.DOTALL
+    )
+
+
+class C4HFaultsError(ValueError):
+    '''Raised when a faults string can't be parsed.
+
+    Attributes:
+        faults (str): the string
+        position (int): where the problem is in faults
+    '''
+
+    def __init__(self, message: str, faults: str, position: int):
+        self.faults = faults
+        self.position = position
+        super().__init__(f'{message} at position {position} of {faults!r}')
+
+
+class C4HFaults(NamedTuple):
+    '''The penalties in a round.
+
+    Attributes:
+        jump_pens (int): penalties for the faults
+        rails (int):
+        disobediences (int):
+        knockdowns (int): displacements while disobeying
+        falls (int):
+        eliminated (bool):
+        time_added (float): correction time in seconds
+        jumps (tuple[str]): the jumps with faults in the order they were typed
+    '''
+    jump_pens: int = 0
+    rails: int = 0
+    disobediences: int = 0
+    knockdowns: int = 0
+    falls: int = 0
+    eliminated: bool = False
+    time_added: float = 0.0
+    jumps: Tuple[str, ...] = ()
+
+
+CLEAR = C4HFaults()
+
+
+class C4HFaultParser(object):
+    '''Parses faults strings into C4HFaults using one set of rules.
+
+    Attributes:
+        penalties (dict): fault letter: penalties
+        time_added (dict): fault letter: correction time
+        eliminating (str): fault letters that eliminate
+        disobedience_limit (int): the number of disobediences that eliminate
+    '''
+
+    def __init__(self, penalties: Dict[str, int] = PENALTIES,
+            time_added: Dict[str, float] = TIME_ADDED,
+            eliminating: str = ELIMINATING,
+            disobedience_limit: int = DISOBEDIENCE_LIMIT):
+        self.penalties = dict(penalties)
+        self.time_added = dict(time_added)
+        self.eliminating = eliminating
+        self.disobedience_limit = disobedience_limit
+        self._cache: Dict[Tuple[str, int], C4HFaults] = {}
+
+    def parse(self, faults: str, fences: int = 0) -> C4HFaults:
+        """Returns the penalties in faults.
+
+        Args:
+            faults (str): eg. '3r 7dr'
+            fences (int): the number of jumps in the course, jump numbers
+                above it are an error. 0 if it isn't known.
+
+        Raises:
+            C4HFaultsError: if faults can't be parsed or has a jump number
+                that isn't on the course
+        """
+        key = (faults, fences)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._parse(faults, fences)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = result
+        return result
+
+    def _parse(self, faults: str, fences: int) -> C4HFaults:
+        if not faults or faults.isspace():
+            return CLEAR
+
+        counts = dict.fromkeys('rdkfe', 0)
+        jumps = []
+        for match in _SCANNER.finditer(faults):
+            jump = match.group('jump')
+            if jump is None:
+                if match.group('bare') is not None:
+                    raise C4HFaultsError(
+                        f'No faults for jump {match.group("bare")}', faults, match.start()
+                        )
+                if match.group('bad') is not None:
+                    raise C4HFaultsError(
+                        f'Unexpected {match.group("bad")!r}', faults, match.start()
+                        )
+                continue
+            number = int(jump)
+            if number < 1 or (fences and number > fences):
+                raise C4HFaultsError(
+                    f'There is no jump {number}', faults, match.start()
+                    )
+            jumps.append(jump + match.group('element').lower())
+            for letter in match.group('faults').lower():
+                counts[letter] += 1
+
+        if not jumps:
+            return CLEAR
+
+        penalties = self.penalties
+        eliminated = (
+            any(counts[letter] for letter in self.eliminating)
+            or counts['d'] >= self.disobedience_limit
+            )
+        time_added = self.time_added
+        return C4HFaults(
+            jump_pens=sum(penalties.get(letter, 0)*n for letter, n in counts.items()),
+            rails=counts['r'],
+            disobediences=counts['d'],
+            knockdowns=counts['k'],
+            falls=counts['f'],
+            eliminated=eliminated,
+            time_added=sum(time_added.get(letter, 0)*n for letter, n in counts.items()),
+            jumps=tuple(jumps),
+            )
+
+
+# parser for the default rules
+parse_faults = C4HFaultParser().parse
@@ -5,24 +5,58 @@ import tkinter as tk
 import tkcalendar as cal
 import ctypes
 
-from .score import C4HEvent
+from .score import C4HEvent, C4HImportError
+from .score_latency import C4HLatency
+from .score_clock import FRAME_RATE, RUNNING, C4HRunningClock
 from tkinter import ttk, filedialog, messagebox
 from datetime import date
 
+try:
+    from ..C4HTiming.timing_drivers import C4HTimingRegistry, C4HTimingThread, new_driver
+    from ..C4HTiming.timing_farmtek import CONTINUOUS
+except ImportError: # C4HScore is the top level package when run from score_main.py
+    from C4HTiming.timing_drivers import C4HTimingRegistry, C4HTimingThread, new_driver
+    from C4HTiming.timing_farmtek import CONTINUOUS
+
+# the timers C4HTimingDialog offers: (new_driver kind, its keyword args)
+TIMERS = {
+    'Farmtek': ('farmtek', {}),
+    'Farmtek continuous': ('farmtek', {'mode': CONTINUOUS}),
+    'Timy': ('timy', {}),
+    'Replay': ('replay', {}),
+}
+
 # makes dpi aware so tkinter text isnt blurry
-ctypes.windll.shcore.SetProcessDpiAwareness(1)
+if hasattr(ctypes, 'windll'): # windows only
+    ctypes.windll.shcore.SetProcessDpiAwareness(1)
 
 class C4HScoreGUI(ttk.Notebook):
     ''' Big container for the rest of the stuff.
 
     Attributes:
         event (C4HEvent): The big kahuna, or None before initialisation
+        timing (C4HTimingThread): reads the arena timers, or None
+        timers (dict): arena ID: (TIMERS name, port or file) picked for it
+        jumping (dict): arena ID: the C4HRound being jumped in it
+        latency (C4HLatency): how long timer results take to get here
+        clocks (dict): arena ID: the C4HRunningClock locked onto its timer
+        clock_views (dict): arena ID: the C4HScoreClocks drawing its clock
     '''
+    TIMER_POLL_MS = 20 # how often the timer results are picked up while timing
+
     def __init__(self, master):
         ''' creates the master window and sets the main menubar.
         '''
         super().__init__(master)
         self.event = None
+        self.timing = None
+        self.timers = {}
+        self.jumping = {}
+        self.latency = C4HLatency()
+        self.clocks = {}
+        self.clock_views = {}
+        self._timer_poll = None # the after id of the next timer_poll
+        self._stopping = [] # C4HTimingThreads told to stop that are closing their drivers
 
         # set up the gui
         self.title = 'Courses4Horses Score'
@@ -45,6 +79,8 @@ class C4HScoreGUI(ttk.Notebook):
         self.eventmenu.add_command(label="Edit", command=self.event_edit)
         self.eventmenu.add_command(label="Save", command=self.event_save)
         self.eventmenu.add_command(label="Save As", command=self.event_save_as)
+        self.eventmenu.add_command(label="Export YAML", command=self.event_export_yaml)
+        self.eventmenu.add_command(label="Import Nominate", command=self.event_import_nominate)
         self.eventmenu.add_separator()
         self.eventmenu.add_command(label="Print", command=self.event_print)
         self.eventmenu.add_separator()
@@ -58,6 +94,16 @@ class C4HScoreGUI(ttk.Notebook):
         self.jumpclassmenu.add_command(label="Edit", command=self.jumpclass_edit)
         self.menubar.add_cascade(label="Class", menu=self.jumpclassmenu)
 
+        # the timing menu
+        self.timingmenu = tk.Menu(self.menubar, tearoff=0)
+        self.timingmenu.add_command(label="Timers", command=self.timing_edit)
+        self.timingmenu.add_command(label="Stop Timers", command=self.timing_stop)
+        self.timingmenu.add_separator()
+        self.timingmenu.add_command(label="Running Clock", command=self.timing_clock)
+        self.timingmenu.add_command(label="Latency", command=self.timing_latency)
+        self.timingmenu.add_command(label="Export Latency", command=self.timing_export_latency)
+        self.menubar.add_cascade(label="Timing", menu=self.timingmenu)
+
         self.master.config(menu=self.menubar)
 
         self.update()
@@ -65,15 +111,27 @@ class C4HScoreGUI(ttk.Notebook):
     def update(self):
 
         # enable/disable menu items depending on event state
+        if self.timing is not None and self.timing.running:
+            self.timingmenu.entryconfig("Stop Timers", state="normal")
+        else:
+            self.timingmenu.entryconfig("Stop Timers", state="disabled")
         if not self.event:
             self.eventmenu.entryconfig("Save", state="disabled")
             self.eventmenu.entryconfig("Save As", state="disabled")
+            self.eventmenu.entryconfig("Export YAML", state="disabled")
+            self.eventmenu.entryconfig("Import Nominate", state="disabled")
             self.eventmenu.entryconfig("Edit", state="disabled")
             self.menubar.entryconfig("Class", state="disabled")
+            self.timingmenu.entryconfig("Timers", state="disabled")
+            self.timingmenu.entryconfig("Running Clock", state="disabled")
         else:    
             self.eventmenu.entryconfig("Save As", state="normal")
+            self.eventmenu.entryconfig("Export YAML", state="normal")
+            self.eventmenu.entryconfig("Import Nominate", state="normal")
             self.eventmenu.entryconfig("Edit", state="normal")
             self.menubar.entryconfig("Class", state="normal")
+            self.timingmenu.entryconfig("Timers", state="normal")
+            self.timingmenu.entryconfig("Running Clock", state="normal")
         
             if (self.event.last_change > self.event.last_save) and self.event.filename:
                 self.eventmenu.entryconfig("Save", state="normal")
@@ -89,7 +147,9 @@ class C4HScoreGUI(ttk.Notebook):
         """Opens a new event dialog."""
         if self.event_check_saved() == 'cancelled': return
 
+        self.timing_forget()
         self.event = C4HEvent(name='New Event')
+        self.event.set_latency(self.latency)
         self.event_edit()
 
     def event_open(self):
@@ -102,7 +162,7 @@ class C4HScoreGUI(ttk.Notebook):
 
         fn = filedialog.askopenfilename(
             title="Select file to open",
-            filetypes=[('C4HScore files','*.c4hs')])
+            filetypes=[('C4HScore files','*.c4hs'), ('YAML exports','*.yaml')])
 
         #if cancel button wasn't clicked
         if fn:
@@ -111,7 +171,10 @@ class C4HScoreGUI(ttk.Notebook):
             if not self.event:
                 self.event = C4HEvent('_')
             
+            # the timers are bound to the arenas of the old event
+            self.timing_forget()
             self.event = self.event.event_open(fn)
+            self.event.set_latency(self.latency)
 
             self.update()
 
@@ -138,6 +201,39 @@ class C4HScoreGUI(ttk.Notebook):
         if fn:
             self.event.event_save_as(fn)
 
+    def event_export_yaml(self):
+        '''Exports the event as a yaml file.
+
+        Opens a filedialog and then passes fn to C4HEvent.event_export_yaml()
+        '''
+        fn = filedialog.asksaveasfilename(
+            title="Export as",
+            filetypes=[('YAML exports','*.yaml')],
+            defaultextension='.yaml'
+            )
+
+        #if cancel button wasn't clicked
+        if fn:
+            self.event.event_export_yaml(fn)
+
+    def event_import_nominate(self):
+        '''Imports entries from a Nominate csv export.
+
+        Opens a filedialog and then passes fn to C4HEvent.event_import_nominate()
+        '''
+        fn = filedialog.askopenfilename(
+            title="Import entries",
+            filetypes=[('Nominate exports','*.csv')]
+            )
+
+        #if cancel button wasn't clicked
+        if fn:
+            try:
+                self.event.event_import_nominate(fn)
+            except C4HImportError as e:
+                messagebox.showerror(title="Entries not imported", message=str(e))
+            self.update()
+
     def event_print(self):
         if self.event:
             print(self.event.name)
@@ -147,6 +243,9 @@ class C4HScoreGUI(ttk.Notebook):
     def event_exit(self):
         if self.event_check_saved() == 'cancelled': return
 
+        self.timing_stop()
+        if self.event:
+            self.event.event_close()
         self.master.quit()
 
     def event_check_saved(self):
@@ -171,6 +270,165 @@ class C4HScoreGUI(ttk.Notebook):
                     # cancelled so do nothing
                     return 'cancelled'
 
+    def timer_poll(self):
+        '''Picks up the timer results every TIMER_POLL_MS until timing_stop.
+
+        The timing thread only puts its results on the C4HTimingThread
+        queue, tk isn't safe to call from it, so they are taken off here on
+        the tk thread, however many have come in since the last poll.
+        '''
+        self._timer_poll = None
+        if self.timing is None:
+            return
+        self.timer_results()
+        self._timer_poll = self.after(self.TIMER_POLL_MS, self.timer_poll)
+
+    def timer_results(self):
+        '''Sets the timer results on the rounds being jumped and redraws.
+
+        Running times only go to the arena's running clock, which its
+        C4HScoreClocks draw at their own frame rate, or straight away when
+        the clock starts, stops or snaps. Only the last running time of
+        each arena since the last poll is fed to it.
+        '''
+        if self.timing is None or self.event is None:
+            return
+        drained = self.timing.drain()
+        latest = {
+            arena.ID: n for n, (arena, timer_event) in enumerate(drained)
+            if timer_event.kind == 'running'
+            }
+        results = []
+        for n, (arena, timer_event) in enumerate(drained):
+            if timer_event.kind == 'running' and latest[arena.ID] != n:
+                continue
+            if self.clock_for(arena).feed(timer_event):
+                for view in self.clock_views.get(arena.ID, ()):
+                    view.redraw()
+            if timer_event.kind == 'running':
+                continue
+            results.append(timer_event)
+            round_ = self.jumping.get(arena.ID)
+            if round_ is not None:
+                self.event.timer_event(round_, timer_event)
+        if not results:
+            return
+        self.update()
+        self.update_idletasks()
+        for timer_event in results:
+            self.latency.mark('repaint', timer_event.received)
+
+    def timing_edit(self):
+        '''Opens a C4HTimingDialog to bind a timer to each arena and pick
+        the round being jumped in it.'''
+        C4HTimingDialog(self)
+
+    def timing_start(self, registry: C4HTimingRegistry):
+        '''Reads the timers bound in registry on a C4HTimingThread until
+        timing_stop, replacing any timers already being read.
+
+        If the timers being replaced are still closing, starting waits for
+        them so their ports are free.
+        '''
+        self.timing_stop()
+        if self._stopping:
+            self.after(self.TIMER_POLL_MS, self.timing_start, registry)
+            return
+        self.timing = C4HTimingThread(registry)
+        self.timing.start()
+        self._timer_poll = self.after(self.TIMER_POLL_MS, self.timer_poll)
+        self.update()
+
+    def timing_stop(self):
+        '''Stops reading the timers.
+
+        The timing thread is only told to stop, closing its drivers can
+        take a moment so timing_stopped waits for it without holding up
+        the GUI.
+        '''
+        if self._timer_poll is not None:
+            self.after_cancel(self._timer_poll)
+            self._timer_poll = None
+        if self.timing is not None:
+            self.timing.stop(timeout=0)
+            if not self._stopping:
+                self.after(self.TIMER_POLL_MS, self.timing_stopped)
+            self._stopping.append(self.timing)
+            self.timing = None
+        self.update()
+
+    def timing_stopped(self):
+        '''Checks every TIMER_POLL_MS until the stopped timing threads have
+        finished.'''
+        self._stopping = [timing for timing in self._stopping if timing.running]
+        if self._stopping:
+            self.after(self.TIMER_POLL_MS, self.timing_stopped)
+
+    def timing_forget(self):
+        '''Stops reading the timers and forgets them and the rounds being
+        jumped, they belong to the arenas of the event being closed.'''
+        self.timing_stop()
+        self.timers = {}
+        self.jumping = {}
+        for clock in self.clocks.values():
+            clock.reset()
+        self.clocks = {}
+
+    def clock_for(self, arena) -> C4HRunningClock:
+        '''Returns the running clock of arena, made the first time it is
+        asked for, with the skew of its timer's clock.'''
+        clock = self.clocks.get(arena.ID)
+        if clock is None:
+            clock = self.clocks[arena.ID] = C4HRunningClock()
+        if self.timing is not None:
+            driver = self.timing.registry.driver_for(arena)
+            if driver is not None:
+                clock.skew = driver.clock.skew
+        return clock
+
+    def timing_clock(self):
+        '''Shows the running clock of each arena, fed by its timer, see
+        timing_edit.'''
+        if self.event is None:
+            return
+        dialog = tk.Toplevel(self)
+        dialog.title('Running clock')
+        for row, arena in enumerate(self.event.arenas):
+            view = C4HScoreClock(dialog, self.clock_for(arena))
+            views = self.clock_views.setdefault(arena.ID, [])
+            views.append(view)
+            view.bind('<Destroy>', lambda e, views=views, view=view: views.remove(view))
+            ttk.Label(dialog, text=arena.name).grid(row=row, column=0, padx=10, pady=5, sticky='W')
+            view.grid(row=row, column=1, padx=10, pady=5, sticky='E')
+        ttk.Button(dialog, text='Close', command=dialog.destroy).grid(
+            row=len(self.event.arenas), column=0, columnspan=2, pady=5
+            )
+
+    def timing_latency(self):
+        '''Shows how long timer results have taken to get through each stage.'''
+        dialog = tk.Toplevel(self)
+        dialog.title('Timer latency (ms)')
+        text = tk.Text(dialog, width=80, height=len(self.latency.stages) + 2, font='TkFixedFont')
+        text.insert('1.0', self.latency.report())
+        text.configure(state='disabled')
+        text.grid(row=0, column=0, padx=10, pady=10)
+        ttk.Button(dialog, text='Close', command=dialog.destroy).grid(row=1, column=0, pady=5)
+
+    def timing_export_latency(self):
+        '''Exports the latency histograms as a json file.
+
+        Opens a filedialog and then passes fn to C4HLatency.export()
+        '''
+        fn = filedialog.asksaveasfilename(
+            title="Export latency",
+            filetypes=[('JSON files','*.json')],
+            defaultextension='.json'
+            )
+
+        #if cancel button wasn't clicked
+        if fn:
+            self.latency.export(fn)
+
     def jumpclass_new(self):
         """Create a new jumpclass and open the jumpclass editor."""
         #TODO need to ensure a unique ID
@@ -321,6 +579,93 @@ class C4HEventDialog(tk.Toplevel):
         self.master.update()
         self.destroy()
 
+class C4HTimingDialog(tk.Toplevel):
+    '''A top level dialog for binding a timer to each arena.
+
+    Each arena gets a timer from TIMERS, the port it is on or the file to
+    replay, and the round being jumped in it, which its results are set on.
+
+    Attributes:
+        event (C4HEvent):
+        timers (list): [arena, TIMERS name StringVar, port StringVar, rounds Combobox]
+    '''
+    def __init__(self, master):
+        super().__init__(master)
+        self.master = master
+        self.event = master.event
+        self.title(f'{self.master.title}: Timers')
+        self.iconphoto(False, self.master.favicon)
+
+        for column, text in enumerate(('Arena', 'Timer', 'Port or file', 'Jumping'), 1):
+            ttk.Label(self, text=text).grid(column=column, row=1, sticky='W')
+
+        self.timers = []
+        for row, arena in enumerate(self.event.arenas, 2):
+            name, fn = master.timers.get(arena.ID, ('', ''))
+            timer = tk.StringVar(self, name)
+            port = tk.StringVar(self, fn)
+            rounds = self.arena_rounds(arena)
+            rounds_box = ttk.Combobox(
+                self, values=[label for label, _ in rounds], width=30, state='readonly'
+                )
+            jumping = master.jumping.get(arena.ID)
+            for label, round_ in rounds:
+                if round_ is jumping:
+                    rounds_box.set(label)
+            rounds_box.bind(
+                '<<ComboboxSelected>>',
+                lambda e, arena=arena, rounds=rounds: self.set_jumping(arena, rounds, e.widget)
+                )
+
+            ttk.Label(self, text=arena.name).grid(column=1, row=row, sticky='W')
+            ttk.Combobox(self, textvariable=timer, values=['', *TIMERS], state='readonly'
+                ).grid(column=2, row=row)
+            ttk.Entry(self, textvariable=port).grid(column=3, row=row, sticky='EW')
+            rounds_box.grid(column=4, row=row)
+            self.timers.append([arena, timer, port, rounds_box])
+
+        row = len(self.timers) + 2
+        ttk.Separator(self, orient='horizontal').grid(column=1, row=row, sticky='EW', columnspan=4)
+        ttk.Button(self, text='Start', default='active', command=self.start).grid(column=2, row=row + 1)
+        ttk.Button(self, text='Stop', command=self.stop).grid(column=3, row=row + 1)
+        ttk.Button(self, text='Close', command=self.destroy).grid(column=4, row=row + 1)
+
+        # add some nice padding all round
+        for c in self.winfo_children():
+            c.grid_configure(padx=10, pady=5)
+
+    def arena_rounds(self, arena) -> list:
+        """Returns (label, round) for each round in the jumpclasses in arena."""
+        return [
+            (f'{r.jumpclass.id} {r.round_type}: {r.combo.id if r.combo else ""}', r)
+            for r in self.event.rounds
+            if r.jumpclass is not None and r.jumpclass.arena is arena
+            ]
+
+    def set_jumping(self, arena, rounds, rounds_box):
+        self.master.jumping[arena.ID] = rounds[rounds_box.current()][1]
+
+    def start(self):
+        """Binds the timers picked and starts reading them."""
+        registry = C4HTimingRegistry(self.master.latency)
+        timers = {}
+        for arena, timer, port, _ in self.timers:
+            if not timer.get():
+                continue
+            kind, kwargs = TIMERS[timer.get()]
+            args = (port.get(),) if port.get() else ()
+            try:
+                registry.bind(arena, new_driver(kind, *args, **kwargs))
+            except (OSError, TypeError, ValueError) as e:
+                messagebox.showerror(title="Timer not started", message=f'{arena.name}: {e}')
+                return
+            timers[arena.ID] = (timer.get(), port.get())
+        self.master.timers = timers
+        self.master.timing_start(registry)
+
+    def stop(self):
+        self.master.timing_stop()
+
 # class C4HJumpClassTab(ttk.Frame):
 class C4HJumpClassTab(tk.Toplevel):
     '''Frame for holding jump class details.
@@ -449,3 +794,39 @@ class C4HJumpClassTab(tk.Toplevel):
 
 
         
+
+
+class C4HScoreClock(ttk.Label):
+    '''Draws a C4HRunningClock at FRAME_RATE while it is running.
+
+    The label is only configured when the time shown changes, so at most
+    ten times a second while running however fast the packets come.
+
+    Attributes:
+        clock (C4HRunningClock):
+    '''
+    IDLE_MS = 250 # how often a stopped clock is checked for starting
+
+    def __init__(self, master, clock: C4HRunningClock, font=('TkFixedFont', 48)):
+        super().__init__(master, font=font, anchor='e', width=8)
+        self.clock = clock
+        self._shown = None
+        self._tick()
+
+    def redraw(self):
+        """Draws straight away and ticks on from now, eg. when the clock
+        has just started so it doesn't wait out IDLE_MS."""
+        self.after_cancel(self._after)
+        self._tick()
+
+    def _tick(self):
+        text = self.clock.text()
+        if text != self._shown:
+            self.configure(text=text)
+            self._shown = text
+        frame_ms = 1000//FRAME_RATE if self.clock.state == RUNNING else self.IDLE_MS
+        self._after = self.after(frame_ms, self._tick)
+
+    def destroy(self):
+        self.after_cancel(self._after)
+        super().destroy()
@@ -6,18 +6,73 @@ They should be considered private and only accessed through CH4Event methods
 All unit tests are performed through C4HEvent
 """
 
+import random
+import threading
+import time
 import uuid
 import yaml
 import dataclasses
-from typing import Any
+from typing import Any, List
 from pydantic import validator
 from pydantic.dataclasses import dataclass
 from . import score as c4h
+from .score_faults import parse_faults
 
-def is_C4HEvent(event) -> bool:
+def is_C4HEvent(event) -> 'c4h.C4HEvent':
     if not isinstance(event, c4h.C4HEvent):
         raise TypeError('Event must be a C4HEvent')
-    return isinstance(event, c4h.C4HEvent)
+    return event
+
+class C4HIDs(object):
+    '''Makes version 1 uuids for the ID of every object.
+
+    uuid.uuid1 asks the system for the time and a clock sequence on every
+    call, which is slow when thousands of objects are made at once. This
+    does that once and then counts the 100ns timestamp up from the current
+    time, so IDs are unique and in order of creation however fast they are
+    asked for.
+    '''
+    # 100ns intervals between the uuid epoch, 1582-10-15, and the unix epoch
+    EPOCH = 0x01b21dd213814000
+
+    def __init__(self):
+        # a clock sequence of our own so the counted up times can't clash
+        # with uuids made by uuid.uuid1 elsewhere
+        base = uuid.uuid1(clock_seq=random.getrandbits(14))
+        self._low = (base.int & ((1 << 64) - 1)) # clock sequence and node
+        self._lock = threading.Lock()
+        self._last = base.time
+
+    def __call__(self) -> uuid.UUID:
+        return self.take(1)[0]
+
+    def take(self, count: int) -> List[uuid.UUID]:
+        """Returns count new IDs, reserved in one go."""
+        now = time.time_ns() // 100 + self.EPOCH
+        with self._lock:
+            first = max(self._last + 1, now)
+            self._last = first + count - 1
+        low = self._low
+        return [
+            uuid.UUID(int=(
+                (t & 0xffffffff) << 96 | (t >> 32 & 0xffff) << 80
+                | (0x1000 | t >> 48 & 0x0fff) << 64 | low
+                ))
+            for t in range(first, first + count)
+            ]
+
+
+next_ID = C4HIDs()
+
+
+def new_ID() -> dataclasses.Field:
+    """The ID field of a dataclass, a new uuid for every object.
+
+    The ID is what an object is known by outside the event, in exports and
+    when syncing. Inside the event objects are known by their key, see
+    C4HEvent.key_of.
+    """
+    return dataclasses.field(default_factory=next_ID, compare=False)
 
 class Config:
     """This defines the configuration for all the dataclasses.
@@ -32,7 +87,7 @@ class C4HArena(object):
     event: Any #c4h.C4HEvent # Must be a C4HEvent
     id: str = ''
     name: str = ''
-    ID: uuid.UUID = dataclasses.field(default=uuid.uuid1(), compare=False)
+    ID: uuid.UUID = new_ID()
 
     # validators
     _valid_event = validator('event', allow_reuse=True)(is_C4HEvent)
@@ -46,13 +101,13 @@ class C4HRider:
         event (C4HEvent):
         surname (str):
         forename (str):
-        _ID (uuid.UUID): unique ID
+        ID (uuid.UUID): unique ID
         ea_number (str): This must 7 numerical digits
     '''
     event: Any
     surname: str = ''
     forename: str = ''
-    ID: uuid.UUID = uuid.uuid1()
+    ID: uuid.UUID = new_ID()
     ea_number: str = ''
 
     # validators
@@ -84,7 +139,7 @@ class C4HHorse:
     event: Any
     name: str = ''
     ea_number: str = ''
-    ID: uuid.UUID = uuid.uuid1()
+    ID: uuid.UUID = new_ID()
 
     # validators
     _valid_event = validator('event', allow_reuse=True)(is_C4HEvent)
@@ -115,7 +170,7 @@ class C4HCombo:
     rider: C4HRider = None
     horse: C4HHorse = None
     id: str = ''
-    ID: uuid.UUID = uuid.uuid1()
+    ID: uuid.UUID = new_ID()
 
     # validators
     _valid_event = validator('event', allow_reuse=True)(is_C4HEvent)
@@ -137,66 +192,110 @@ class C4HOfficial:
         forename (str): 
         judge (bool): default True
         cd (bool): default False
+        ID (uuid.UUID): unique ID
     '''
     surname: str = ''
     forename: str = ''
     judge: bool = True
     cd: bool = False
+    ID: uuid.UUID = new_ID()
 
 @dataclass(config=Config)
 class C4HJumpClass:
     '''A show jumping class.
 
+    The rounds entered in the class are in C4HEvent.rounds with their
+    jumpclass set to this class.
+
     Attributes:
+        event (C4HEvent):
         id (str): an integer that may have a character appended eg. 8c 
         name (str):
-        arena (_C4HArena):
+        arena (C4HArena):
         ID (uuid): unique identifier
         description (str):
-        article (EAArticle):
+        article (str): the article number eg. '238.2.2', looked up in the
+            article library to place the rounds, see score_rules.py
         height (int): the height in cm
         judge (str): judges name
         cd (str): course designer name
         places (int): the number of places awarded prizes
-        rounds (list[_C4HRound]): rounds entered in this arenas
+        fences (int): the number of jumps on the course, 0 if not known yet
     '''
-    def __init__(self, id, arena):
+    event: Any
+    id: str = ''
+    name: str = ''
+    arena: C4HArena = None
+    ID: uuid.UUID = new_ID()
+    description: str = ''
+    article: str = ''
+    height: int = 0
+    judge: str = ''
+    cd: str = ''
+    places: int = 6
+    fences: int = 0
+
+    # validators
+    _valid_event = validator('event', allow_reuse=True)(is_C4HEvent)
+
+    @validator('article', pre=True)
+    def article_number(cls, val):
+        # numbers read from yaml as ints or floats are still article numbers
+        if val is None:
+            return ''
+        if isinstance(val, (int, float)) and not isinstance(val, bool):
+            return str(val)
+        if not isinstance(val, str):
+            raise TypeError(f'The article should be its number not a {type(val).__name__}')
+        return val.strip()
 
-        self.ID = uuid.UUID()
-        self.id = id
-        self.arena = arena
-        self.name = f'Class {self.id}'
-        self.article = None
-        self.description = ''
-        self.height = 0
-        self.judge = ''
-        self.cd = ''
-        self.places = 6
-        self.rounds= []
 
-class C4HRound(object):
+@dataclass(config=Config)
+class C4HRound:
     '''Jump round and results.
 
     Attributes:
-        jumpclass (_C4HJumpClass):
+        event (C4HEvent):
+        jumpclass (C4HJumpClass):
         round_type (str): identifies whether a round or jumpoff - r1, r2, jo1, jo2 etc
-        combo (_C4HCombo):
-        faults (list): Jump numbers followed by one or more letters indicating the fault type.
+        combo (C4HCombo):
+        faults (str): Jump numbers each followed by one or more letters indicating the fault type.
             rail: r, disobedience: d, displacement/knockdown: k, fall: f, elimination: e
-        jump_pens (int):
+            eg. '3r 7dr'
+        jump_pens (int): set from faults by C4HEvent.set_object
         time (float): time 0.01 secs
         time_pens (int):
+        time_added (float): correction time in seconds, eg. for a knockdown
+            while disobeying, set from faults by C4HEvent.set_object. The
+            round is placed on time + time_added
         notes (str): optional notes from the judge
+        ID (uuid.UUID): unique ID
+        eliminated (bool): set from faults by C4HEvent.set_object
+        judged (bool): set by C4HEvent.set_object once any result is given,
+            so a clear round with no time is still placed
     '''
-    def __init__(self, jumpclass, round_type, combo):
-        self.jumpclass = jumpclass
-        self.round_type = round_type
-        self.combo = combo
-        self.faults = []
-        self.jump_pens = 0
-        self.time = 0
-        self.time_pens = 0
-        self.notes = ''
+    event: Any
+    jumpclass: C4HJumpClass = None
+    round_type: str = 'r1'
+    combo: C4HCombo = None
+    faults: str = ''
+    jump_pens: int = 0
+    time: float = 0
+    time_pens: int = 0
+    notes: str = ''
+    ID: uuid.UUID = new_ID()
+    eliminated: bool = False
+    judged: bool = False
+    time_added: float = 0
+
+    # validators
+    _valid_event = validator('event', allow_reuse=True)(is_C4HEvent)
+
+    @validator('faults')
+    def parsable_faults(cls, val, values):
+        jumpclass = values.get('jumpclass')
+        parse_faults(val, jumpclass.fences if jumpclass else 0)
+        return val
 
 class C4HArticle(object):
     '''EA/FEI article.
@@ -251,50 +350,3 @@ class C4HArticle(object):
             new_event = yaml.load(in_file, Loader=yaml.FullLoader)
 
         return new_event
-    
-
-# def read_csv_nominate(fn, event_name='New Event'):
-#     '''Loads event data from a nominate like csv file
-
-#     Args:
-#         fn (str): path and filename
-#         event_name (str): the name of the event
-
-#     Returns:
-#         C4HEvent
-#     '''
-
-#     # event_data = pandas.read_csv(fn)
-#     with open(fn, newline='') as in_file:
-#         in_data = csv.DictReader(in_file)
-#         event = C4HEvent(event_name)
-#         for entry in in_data:
-#             rider = entry['Rider'].split(' ')
-#             given_name = rider[0]
-#             surname = ' '.join(rider[1:])
-#             horse = entry['Horse']
-#             id = entry['ID']
-#             jumpclass = entry['Class']
-#             if not event.get_rider(surname, given_name):
-#                 rider = event.new_rider(surname=surname, given_name=given_name)
-#             else:
-#                 rider = event.get_rider(surname, given_name)
-#             if not event.get_horse(horse):
-#                 horse = event.new_horse(horse)
-#             else:
-#                 horse = event.get_horse(horse)
-            
-#             if not event.get_combo(id):
-#                 combo = event.new_combo(id, rider=rider, horse=horse)
-#             else:
-#                 combo = event.get_combo(id)
-            
-#             if not event.get_class(jumpclass):
-#                 jumpclass = event.new_class(jumpclass)
-#             else:
-#                 jumpclass = event.get_class(jumpclass)
-
-#             if not jumpclass.get_combo(combo):
-#                 jumpclass.combos.append(combo)
-
-#     return event
@@ -0,0 +1,229 @@
+""" score_import.py - imports entries into a C4HEvent.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+Nominate exports a csv file with a row for each entry: the combination number
+(ID), the class it is entered in and the rider and horse names, optionally with
+their EA numbers. The file is read a row at a time into columns and the EA
+number columns are checked a whole column at a time. Riders, horses, combos,
+jumpclasses and entries are then matched against what is already in the event
+through dicts, so the import takes one pass over the rows however big the
+event is. An entry is the first round of a combo in a jumpclass.
+"""
+
+import csv
+import re
+
+from typing import Dict, List, TextIO, Tuple
+
+from .score_helpers import *
+from .score_index import COLLECTIONS
+from .score_tables import field_defaults, trusted_object
+
+# the key each column is read into: its heading in the csv file
+NOMINATE_COLUMNS = {
+    'id': 'ID',
+    'jumpclass': 'Class',
+    'rider': 'Rider',
+    'horse': 'Horse',
+    'rider_ea': 'Rider EA',
+    'horse_ea': 'Horse EA',
+}
+REQUIRED_COLUMNS = ('id', 'jumpclass', 'rider', 'horse')
+
+# the number of digits in each EA number column
+EA_DIGITS = {'rider_ea': 7, 'horse_ea': 8}
+
+
+class C4HImportError(ValueError):
+    '''Raised when entries can't be imported. Nothing is added to the event.
+
+    Attributes:
+        errors (list[tuple[int, str]]): (line number, problem) for each problem
+    '''
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = errors
+        problems = [f'line {line}: {problem}' for line, problem in errors[:10]]
+        if len(errors) > 10:
+            problems.append(f'and {len(errors) - 10} more')
+        super().__init__('Entries not imported\n    ' + '\n    '.join(problems))
+
+
+def read_columns(in_file: TextIO) -> Dict[str, List[str]]:
+    """Reads a Nominate csv file into a list of values per column.
+
+    Only the columns in NOMINATE_COLUMNS are kept, blank rows are skipped
+    and the 'line' column holds the line each row came from.
+
+    Raises:
+        C4HImportError: if a required column is missing
+    """
+    reader = csv.reader(in_file)
+    header = [name.strip() for name in next(reader, [])]
+    positions = {
+        key: header.index(name) for key, name in NOMINATE_COLUMNS.items()
+        if name in header
+        }
+    missing = [NOMINATE_COLUMNS[key] for key in REQUIRED_COLUMNS if key not in positions]
+    if missing:
+        raise C4HImportError([(1, f'missing the {", ".join(missing)} column(s)')])
+
+    columns = {key: [] for key in positions}
+    appends = [(columns[key].append, position) for key, position in positions.items()]
+    width = max(positions.values()) + 1
+    lines = columns['line'] = []
+    for row in reader:
+        if not any(row):
+            continue
+        if len(row) < width:
+            row += [''] * (width - len(row))
+        for append, position in appends:
+            append(row[position].strip())
+        lines.append(reader.line_num)
+
+    return columns
+
+
+def check_ea_numbers(column: List[str], digits: int, lines: List[int],
+        name: str) -> List[Tuple[int, str]]:
+    """Returns (line, problem) for each EA number in column that isn't blank
+    or digits long."""
+    pattern = re.compile(rf'\d{{{digits}}}')
+    return [
+        (line, f'{name} EA number {value!r} should be {digits} digits')
+        for line, value in zip(lines, column)
+        if value and not pattern.fullmatch(value)
+        ]
+
+
+def import_nominate(event, in_file: TextIO) -> Dict[str, int]:
+    """Adds the entries in a Nominate csv file to event.
+
+    Riders and horses are matched on their EA number when the row has one
+    and on their name when it doesn't, so two riders with the same name are
+    kept apart by their EA numbers. Combos are matched on ID and
+    jumpclasses on id. Entries already in the event are skipped so importing the same
+    file twice adds nothing the second time. The new objects have been
+    checked column by column so are created without validating them again,
+    and event.update is called once at the end.
+
+    Args:
+        event (C4HEvent):
+        in_file: the open csv file
+
+    Returns:
+        dict: collection: the number of objects added to it
+
+    Raises:
+        C4HImportError: listing every problem found, nothing is added
+    """
+    columns = read_columns(in_file)
+    lines = columns['line']
+    blank = [''] * len(lines)
+
+    errors = []
+    for key, digits in EA_DIGITS.items():
+        if key in columns:
+            name = NOMINATE_COLUMNS[key].split()[0]
+            errors += check_ea_numbers(columns[key], digits, lines, name)
+
+    # what is in the event already, keyed the way rows refer to it
+    riders, rider_eas = {}, {}
+    for r in event.riders:
+        riders.setdefault((r.surname, r.forename), r)
+        if r.ea_number:
+            rider_eas.setdefault(r.ea_number, r)
+    horses, horse_eas = {}, {}
+    for h in event.horses:
+        horses.setdefault(h.name, h)
+        if h.ea_number:
+            horse_eas.setdefault(h.ea_number, h)
+    combos = {c.id: c for c in event.combos}
+    jumpclasses = {j.id: j for j in event.jumpclasses}
+    entries = {
+        (id(r.jumpclass), id(r.combo)) for r in event.rounds if r.round_type == 'r1'
+        }
+
+    arena = event.arenas[0] if event.arenas else None
+    defaults = {obj_type: field_defaults(obj_type) for obj_type in
+        (C4HRider, C4HHorse, C4HCombo, C4HJumpClass, C4HRound)}
+    added = {obj_type: [] for obj_type in defaults}
+
+    def new(obj_type, **values):
+        # the IDs are reserved all at once at the end
+        obj = trusted_object(obj_type, defaults[obj_type], dict(values, ID=None))
+        added[obj_type].append(obj)
+        return obj
+
+    rows = zip(
+        lines, columns['id'], columns['jumpclass'], columns['rider'],
+        columns['horse'], columns.get('rider_ea', blank), columns.get('horse_ea', blank)
+        )
+    for line, combo_id, jumpclass_id, rider_name, horse_name, rider_ea, horse_ea in rows:
+        if not (combo_id and jumpclass_id and rider_name and horse_name):
+            errors.append((line, 'ID, Class, Rider and Horse are all needed'))
+            continue
+
+        forename, _, surname = rider_name.partition(' ')
+        if rider_ea:
+            rider = rider_eas.get(rider_ea)
+        else:
+            rider = riders.get((surname, forename))
+        if rider is None:
+            rider = new(
+                C4HRider, event=event, surname=surname, forename=forename,
+                ea_number=rider_ea
+                )
+            riders.setdefault((surname, forename), rider)
+            if rider_ea:
+                rider_eas[rider_ea] = rider
+
+        if horse_ea:
+            horse = horse_eas.get(horse_ea)
+        else:
+            horse = horses.get(horse_name)
+        if horse is None:
+            horse = new(C4HHorse, event=event, name=horse_name, ea_number=horse_ea)
+            horses.setdefault(horse_name, horse)
+            if horse_ea:
+                horse_eas[horse_ea] = horse
+
+        combo = combos.get(combo_id)
+        if combo is None:
+            combo = combos[combo_id] = new(
+                C4HCombo, event=event, id=combo_id, rider=rider, horse=horse
+                )
+        elif combo.rider is not rider or combo.horse is not horse:
+            errors.append((line, f'combination {combo_id} is already entered '
+                f'with a different rider or horse'))
+            continue
+
+        jumpclass = jumpclasses.get(jumpclass_id)
+        if jumpclass is None:
+            jumpclass = jumpclasses[jumpclass_id] = new(
+                C4HJumpClass, event=event, id=jumpclass_id, arena=arena
+                )
+
+        entry = (id(jumpclass), id(combo))
+        if entry not in entries:
+            entries.add(entry)
+            new(C4HRound, event=event, jumpclass=jumpclass, combo=combo)
+
+    if errors:
+        raise C4HImportError(sorted(errors))
+
+    IDs = iter(next_ID.take(sum(len(objects) for objects in added.values())))
+    for objects in added.values():
+        for obj in objects:
+            obj.__dict__['ID'] = next(IDs)
+
+    counts = {}
+    for obj_type, objects in added.items():
+        collection = COLLECTIONS[obj_type]
+        event._add_objects(collection, objects)
+        counts[collection] = len(objects)
+    event.update()
+
+    return counts
@@ -0,0 +1,297 @@
+""" score_index.py - secondary indexes and query views for the C4HEvent lists.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+Objects are indexed on id, ID, ea_number, name and (surname, forename) when
+they are added to the event and re-indexed by C4HEvent.set_object, so changes
+made by assigning to attributes directly are not seen by the indexes.
+
+Every object is also given a key as it is added: its position in its event
+list. Keys are dense, starting at 0 in each list, and as nothing is ever
+removed from the lists an object keeps its key for the life of the event.
+The saved files and the journal use keys for references, and anything that
+needs an array per list can use them as the array index. The uuid in each
+object's ID is the stable identity for exports and syncing.
+
+Queries return a C4HView over the live objects rather than copies.
+"""
+
+import copy
+from collections.abc import Sequence
+from itertools import islice
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .score_helpers import *
+
+# the list attributes of C4HEvent keyed on the type of object they hold
+COLLECTIONS = {
+    C4HArena: 'arenas',
+    C4HRider: 'riders',
+    C4HHorse: 'horses',
+    C4HCombo: 'combos',
+    C4HOfficial: 'officials',
+    C4HJumpClass: 'jumpclasses',
+    C4HRound: 'rounds',
+}
+
+# attribute(s) each index is keyed on
+INDEX_KEYS = (('id',), ('ea_number',), ('name',), ('surname', 'forename'))
+# the key the ID uuids are indexed under, across all the lists
+UUID_KEY = ('ID',)
+
+_EMPTY = {}
+
+
+class C4HIndex(object):
+    '''Hash indexes over the list attributes of a C4HEvent.
+
+    Each bucket is a dict of id(obj): obj so objects can be moved in O(1)
+    and are returned in the order they were added. IDs are indexed on the
+    uuid's int, which hashes much faster than the uuid itself.
+
+    Attributes:
+        tables (dict): collection -> key -> value -> {id(obj): obj}
+        members (dict): collection -> {id(obj): obj} in list order
+        entries (dict): id(obj) -> (collection, key, {index key: value})
+        uuids (dict): ID.int -> obj for every object with an ID
+    '''
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[tuple, Dict[Any, Dict[int, Any]]]] = {}
+        self.members: Dict[str, Dict[int, Any]] = {}
+        self.entries: Dict[int, tuple] = {}
+        self.uuids: Dict[int, Any] = {}
+        self._keys: Dict[type, tuple] = {}
+        self._pending: Dict[str, List[Any]] = {}
+
+    def keys_for(self, obj_type: type) -> tuple:
+        """Returns (index key, getter) for the index keys that apply to
+        objects of obj_type. The getter returns the value for the key."""
+        keys = self._keys.get(obj_type)
+        if keys is None:
+            fields = getattr(obj_type, '__dataclass_fields__', {})
+            keys = tuple(
+                (key, attrgetter(*key)) for key in INDEX_KEYS
+                if all(attr in fields for attr in key)
+                )
+            self._keys[obj_type] = keys
+        return keys
+
+    def rebuild_later(self, lists: Dict[str, List[Any]]) -> None:
+        """Rebuilds the indexes for each collection: objects in lists the next
+        time the indexes are used.
+
+        For when the objects may not be complete yet, eg. while an event and
+        its objects are being unpickled or deep copied.
+        """
+        self._pending.update(lists)
+
+    def _rebuild_pending(self) -> None:
+        pending, self._pending = self._pending, {}
+        for collection, objects in pending.items():
+            self.rebuild(collection, objects)
+
+    def collection_of(self, obj: object) -> Optional[str]:
+        """Returns the name of the collection obj is indexed in or None."""
+        if self._pending:
+            self._rebuild_pending()
+        entry = self.entries.get(id(obj))
+        return entry[0] if entry else None
+
+    def position(self, obj: object) -> Optional[int]:
+        """Returns the key of obj, its position in its event list, or None."""
+        if self._pending:
+            self._rebuild_pending()
+        entry = self.entries.get(id(obj))
+        return entry[1] if entry else None
+
+    def add(self, collection: str, obj: object) -> None:
+        """Adds obj, which has just been appended to collection, to the indexes
+        and gives it the next key in collection."""
+        if self._pending:
+            self._rebuild_pending()
+        members = self.members.setdefault(collection, {})
+        obj_id = id(obj)
+        self.entries[obj_id] = (collection, len(members), {})
+        members[obj_id] = obj
+        self._index_values(obj)
+
+    def reindex(self, obj: object) -> Optional[str]:
+        """Moves obj to the buckets for its current attribute values.
+
+        Uses the values obj was indexed under to find the old buckets so
+        works whatever has changed since.
+
+        Returns:
+            str: the collection obj is indexed in, None if it isn't indexed.
+        """
+        if self._pending:
+            self._rebuild_pending()
+        entry = self.entries.get(id(obj))
+        if entry is None:
+            return None
+        collection, position, values = entry
+        table = self.tables[collection]
+        for key, value in values.items():
+            if key is UUID_KEY:
+                self._drop_uuid(value, obj)
+                continue
+            bucket = table[key][value]
+            del bucket[id(obj)]
+            if not bucket:
+                del table[key][value]
+        values.clear()
+        self._index_values(obj)
+        return collection
+
+    def _index_values(self, obj: object) -> None:
+        """Puts obj in the buckets for its attribute values."""
+        obj_id = id(obj)
+        collection, position, values = self.entries[obj_id]
+        table = self.tables.setdefault(collection, {})
+        for key, getter in self.keys_for(type(obj)):
+            value = getter(obj)
+            buckets = table.get(key)
+            if buckets is None:
+                buckets = table[key] = {}
+            try:
+                bucket = buckets.get(value)
+                if bucket is None:
+                    bucket = buckets[value] = {}
+            except TypeError:
+                continue # unhashable so can't be indexed
+            bucket[obj_id] = obj
+            values[key] = value
+        ID = getattr(obj, 'ID', None)
+        if ID is not None:
+            self.uuids[ID.int] = obj
+            values[UUID_KEY] = ID.int
+
+    def by_uuid(self, ID) -> Optional[Any]:
+        """Returns the object with the uuid ID in any collection, or None."""
+        if self._pending:
+            self._rebuild_pending()
+        return self.uuids.get(ID.int)
+
+    def _drop_uuid(self, uuid_int: int, obj: object) -> None:
+        if self.uuids.get(uuid_int) is obj:
+            del self.uuids[uuid_int]
+
+    def rebuild(self, collection: str, objects: Iterable[Any]) -> None:
+        """Drops the indexes for collection and re-indexes objects."""
+        self._pending.pop(collection, None)
+        for obj_id, obj in self.members.pop(collection, _EMPTY).items():
+            uuid_int = self.entries.pop(obj_id)[2].get(UUID_KEY)
+            if uuid_int is not None:
+                self._drop_uuid(uuid_int, obj)
+        self.tables[collection] = {}
+        self.members[collection] = {}
+        for obj in objects:
+            self.add(collection, obj)
+
+    def find(self, collection: str, **kwargs) -> Optional[Dict[int, Any]]:
+        """Returns the smallest bucket of objects matching one of the kwargs.
+
+        The bucket only narrows the search, objects in it may still need
+        checking against the other kwargs.
+
+        Returns:
+            dict: id(obj): obj, or None if none of the kwargs are indexed.
+        """
+        if self._pending:
+            self._rebuild_pending()
+        ID = kwargs.get('ID')
+        if ID is not None and hasattr(ID, 'int'):
+            obj = self.uuids.get(ID.int)
+            if obj is not None and self.entries[id(obj)][0] == collection:
+                return {id(obj): obj}
+            return _EMPTY
+        best = None
+        for key, buckets in self.tables.get(collection, _EMPTY).items():
+            if not all(attr in kwargs for attr in key):
+                continue
+            if len(key) == 1:
+                value = kwargs[key[0]]
+            else:
+                value = tuple(kwargs[attr] for attr in key)
+            try:
+                bucket = buckets.get(value, _EMPTY)
+            except TypeError:
+                continue # unhashable query value
+            if best is None or len(bucket) < len(best):
+                best = bucket
+        return best
+
+
+class C4HView(Sequence):
+    '''A lazy, read-only view of the objects in a list matching some criteria.
+
+    Nothing is copied: the view is evaluated against the live objects every
+    time it is used so it always reflects the current state of the event.
+    Like a dict view it shouldn't be iterated while the objects it matches
+    are being changed, use list(view) or view.snapshot() for that.
+
+    Attributes:
+        objects (list): the list being viewed
+        criteria (dict): attribute: value pairs the objects must match
+        index (C4HIndex): indexes for objects, None if it isn't an event list
+        collection (str): name of the event list objects is
+    '''
+
+    def __init__(self, objects: List[Any], criteria: dict = None,
+            index: C4HIndex = None, collection: str = None):
+        self.objects = objects
+        self.criteria = criteria or {}
+        self.index = index
+        self.collection = collection
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.criteria:
+            return iter(self.objects)
+
+        candidates = self.objects
+        if self.index is not None:
+            bucket = self.index.find(self.collection, **self.criteria)
+            if bucket is not None:
+                candidates = bucket.values()
+        criteria = self.criteria.items()
+        return (
+            o for o in candidates
+            if all(getattr(o, key) == val for key, val in criteria)
+            )
+
+    def __len__(self) -> int:
+        if not self.criteria:
+            return len(self.objects)
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        for _ in self:
+            return True
+        return False
+
+    def __getitem__(self, item):
+        if not self.criteria:
+            return self.objects[item]
+        if isinstance(item, slice) or item < 0:
+            return list(self)[item]
+        for o in islice(self, item, None):
+            return o
+        raise IndexError('C4HView index out of range')
+
+    def __repr__(self) -> str:
+        args = ', '.join(f'{key}={val!r}' for key, val in self.criteria.items())
+        return f'C4HView({self.collection or "list"}: {args})'
+
+    def first(self, default: Any = None) -> Any:
+        """Returns the first matching object or default if there are none."""
+        return next(iter(self), default)
+
+    def snapshot(self) -> List[Any]:
+        """Returns a deep copy of the matching objects.
+
+        Only use this when a copy is really needed, copying an object also
+        copies the event it refers to.
+        """
+        return copy.deepcopy(list(self))
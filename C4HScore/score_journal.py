@@ -0,0 +1,329 @@
+""" score_journal.py - append only journal of the changes made to a C4HEvent.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+A journaled event appends every change made through C4HEvent to a sidecar
+file next to its c4hs file, one json record per line, instead of rewriting
+the whole file on every save. The journal is compacted into the c4hs file in
+a background thread and C4HEvent.event_open replays it on top of the c4hs file.
+
+Records refer to objects by their position in the event lists. The
+snapshot for a compaction is taken on the thread making the changes, so it
+holds exactly the records journaled before it, and only its bytes are
+written in the background while the event carries on changing.
+"""
+
+import json
+import os
+import threading
+import uuid
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from .score_index import C4HIndex, COLLECTIONS
+
+JOURNAL_SUFFIX = '.journal'
+COMPACT_RECORDS = 1000 # compact the journal once it has this many records
+
+# event attributes that are derived or about the file itself
+UNJOURNALED = ('last_change', 'last_save', 'filename', 'journaled')
+
+TYPES = {collection: obj_type for obj_type, collection in COLLECTIONS.items()}
+
+
+def journal_path(fn) -> Path:
+    """Returns the path of the journal for the c4hs file fn."""
+    return Path(f'{fn}{JOURNAL_SUFFIX}')
+
+
+def object_values(obj: object) -> dict:
+    """Returns the attributes of obj that are saved."""
+    return {
+        key: val for key, val in vars(obj).items()
+        if key != 'event' and not key.startswith('_')
+        }
+
+
+def encode(value: Any, index: C4HIndex) -> Any:
+    """Converts value to something json can write.
+
+    Objects in the event lists are written as a reference to their position.
+
+    Raises:
+        TypeError: if value can't be written
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'date': value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {'uuid': str(value)}
+    if isinstance(value, (list, tuple)):
+        return [encode(v, index) for v in value]
+    collection = index.collection_of(value)
+    if collection:
+        return {'ref': [collection, index.position(value)]}
+    raise TypeError(f"Can't journal a {type(value).__name__}")
+
+
+def decode(value: Any, event) -> Any:
+    """Converts a value written by encode back, resolving references in event."""
+    if isinstance(value, list):
+        return [decode(v, event) for v in value]
+    if isinstance(value, dict):
+        (kind, val), = value.items()
+        if kind == 'ref':
+            collection, position = val
+            return getattr(event, collection)[position]
+        if kind == 'datetime':
+            return datetime.fromisoformat(val)
+        if kind == 'date':
+            return date.fromisoformat(val)
+        if kind == 'uuid':
+            return uuid.UUID(val)
+        raise ValueError(f'Unknown journal value {kind}')
+    return value
+
+
+def blank_object(event, obj_type: type) -> object:
+    """Creates an object of obj_type for event with default attributes."""
+    fields = getattr(obj_type, '__dataclass_fields__', None)
+    if fields is None:
+        # plain class, the attributes are all set from the record
+        return obj_type.__new__(obj_type)
+    if 'event' in fields:
+        return obj_type(event=event)
+    return obj_type()
+
+
+class C4HJournal(object):
+    '''Append only log of the changes made to an event since its last snapshot.
+
+    Each record is one line of json so a record cut short by a crash only
+    loses that record.
+
+    Attributes:
+        path (Path): the sidecar file, the event file name + '.journal'
+        index (C4HIndex): the event's indexes, used to find object positions
+        count (int): the number of records in the journal
+        error (Exception): why the last background compaction failed, or None
+    '''
+
+    def __init__(self, fn, index: C4HIndex, count: int = 0):
+        '''Opens the journal for the c4hs file fn.
+
+        Args:
+            fn (str or Path): the event file name
+            index (C4HIndex): the event's indexes
+            count (int): the number of records already in the journal, as
+                read by read_journal. Anything after them is dropped so new
+                records start on a line of their own. If 0 the journal is
+                emptied.
+        '''
+        self.path = journal_path(fn)
+        self.index = index
+        self.count = count
+        self.error = None
+        self._unrecorded = False
+        self._lock = threading.Lock()
+        self._compactor = None
+        if count:
+            self._truncate(count)
+        self._file = open(self.path, 'a' if count else 'w', encoding='utf-8')
+
+    def _truncate(self, count: int) -> None:
+        """Cuts the journal back to its first count records.
+
+        A record cut short by a crash would otherwise have the next record
+        appended onto the end of it, and read_journal would stop there and
+        lose everything after it.
+        """
+        with open(self.path, 'rb+') as journal:
+            end = 0
+            line = b'\n'
+            for _, line in zip(range(count), journal):
+                end += len(line)
+            journal.seek(end)
+            journal.truncate()
+            if not line.endswith(b'\n'):
+                # the last record was read but its newline was never written
+                journal.write(b'\n')
+
+    @property
+    def needs_snapshot(self) -> bool:
+        """True if the journal is missing changes so the next save must be a full one."""
+        return self._unrecorded or self.error is not None
+
+    @property
+    def compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def append(self, op: str, **fields) -> None:
+        """Writes a record to the journal.
+
+        Values in fields['values'] and fields['objects'] are encoded first.
+        If the record can't be encoded the journal is marked as needing a
+        snapshot rather than raising, the change itself has already been made.
+        """
+        try:
+            if 'values' in fields:
+                fields['values'] = self._encode_values(fields['values'])
+            if 'objects' in fields:
+                fields['objects'] = [self._encode_values(v) for v in fields['objects']]
+        except TypeError:
+            self._unrecorded = True
+            return
+        line = json.dumps({'op': op, **fields}, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.count += 1
+
+    def _encode_values(self, values: dict) -> dict:
+        return {key: encode(val, self.index) for key, val in values.items()}
+
+    def record_new(self, collection: str, obj: object) -> None:
+        self.append(
+            'new', collection=collection, position=self.index.position(obj),
+            values=object_values(obj)
+            )
+
+    def record_set(self, collection: str, obj: object, values: dict) -> None:
+        self.append(
+            'set', collection=collection, position=self.index.position(obj),
+            values=values
+            )
+
+    def record_event(self, values: dict) -> None:
+        self.append('event', values=values)
+
+    def record_list(self, collection: str, objects: Iterable[Any]) -> None:
+        self.append(
+            'list', collection=collection,
+            objects=[object_values(obj) for obj in objects]
+            )
+
+    def sync(self) -> None:
+        """Makes sure everything appended so far is on disk."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def compact(self, write_snapshot) -> bool:
+        """Writes a snapshot and drops the records it holds, in the background.
+
+        Args:
+            write_snapshot (callable): writes a snapshot of the event, taken
+                before calling compact, to its c4hs file. It mustn't read
+                the event, which may change while it runs.
+
+        Returns:
+            bool: False if a compaction is already running
+        """
+        if self.compacting:
+            return False
+
+        self._compactor = threading.Thread(
+            target=self._compact, args=(write_snapshot, self.count),
+            name='C4HJournal compaction', daemon=True
+            )
+        self._compactor.start()
+        return True
+
+    def _compact(self, write_snapshot, mark: int) -> None:
+        try:
+            write_snapshot()
+        except Exception as e:
+            # the journal still has everything so nothing is lost
+            self.error = e
+            return
+
+        # the snapshot holds the first mark records so only keep the rest
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with self._lock:
+            self._file.close()
+            with open(self.path, encoding='utf-8') as in_file:
+                lines = in_file.readlines()[mark:]
+            with open(tmp, 'w', encoding='utf-8') as out_file:
+                out_file.writelines(lines)
+                out_file.flush()
+                os.fsync(out_file.fileno())
+            os.replace(tmp, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self.count -= mark
+
+    def wait(self) -> None:
+        """Waits for a background compaction to finish."""
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def close(self) -> None:
+        self.wait()
+        with self._lock:
+            self._file.close()
+
+
+def read_journal(fn) -> Iterator[dict]:
+    """Yields the records in the journal for the c4hs file fn.
+
+    Stops at a record cut short by a crash.
+    """
+    with open(journal_path(fn), encoding='utf-8') as in_file:
+        for line in in_file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return
+
+
+def replay(event, records: Iterable[dict]) -> int:
+    """Applies journal records to event.
+
+    The event shouldn't have a journal attached while replaying.
+
+    Returns:
+        int: the number of records replayed
+
+    Raises:
+        ValueError: if a record refers to an object the event doesn't have,
+            the journal doesn't belong to the snapshot or is damaged
+    """
+    count = 0
+    for record in records:
+        op = record['op']
+        if op == 'event':
+            for key, val in record['values'].items():
+                setattr(event, key, decode(val, event))
+        elif op == 'list':
+            obj_type = TYPES[record['collection']]
+            objects = []
+            for values in record['objects']:
+                obj = blank_object(event, obj_type)
+                for key, val in values.items():
+                    setattr(obj, key, decode(val, event))
+                objects.append(obj)
+            setattr(event, record['collection'], objects)
+        else:
+            collection, position = record['collection'], record['position']
+            objects = getattr(event, collection)
+            values = {key: decode(val, event) for key, val in record['values'].items()}
+            if position < len(objects):
+                # already in the snapshot
+                event.set_object(objects[position], **values)
+            elif op == 'new' and position == len(objects):
+                obj = blank_object(event, TYPES[collection])
+                event.set_object(obj, **values)
+                event._add_object(obj)
+            else:
+                raise ValueError(
+                    f'Journal record {count + 1} refers to {collection}[{position}]'
+                    f' but there are only {len(objects)}'
+                    )
+        count += 1
+
+    return count
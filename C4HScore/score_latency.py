@@ -0,0 +1,178 @@
+""" score_latency.py - how long a timer result takes to reach the scoreboard.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+Every C4HTimerEvent carries the time.monotonic() its last byte was read
+from the timer. As the result goes through each stage it is marked with
+how long it has taken since then:
+
+    parsed: framed into an event and handed on by the timing driver
+    round: set on its C4HRound by C4HEvent.timer_event
+    placings: the placings moved, see score_placings.py
+    repaint: the GUI has redrawn with it
+
+Each stage keeps a C4HHistogram, a fixed array of counts in buckets that
+grow by an eighth at a time from a microsecond, so a mark is a clock read,
+a frexp and an increment however many results there are. The timing
+drivers mark 'parsed' through the C4HLatency they are given, so nothing in
+C4HTiming needs to import this.
+
+The drivers mark 'parsed' on the timing thread while the GUI thread marks
+the other stages and reads the histograms, so a C4HLatency takes a lock
+for each mark and for each report or export, which then read every
+histogram at the same moment.
+"""
+
+import json
+import math
+import threading
+import time
+
+from typing import Dict, List, Optional
+
+STAGES = ('parsed', 'round', 'placings', 'repaint')
+
+SUB_BUCKETS = 8 # buckets per doubling, so each is within 1/8 of the next
+BUCKETS = 40*SUB_BUCKETS # from 1 us to about 300 hours
+
+
+class C4HHistogram(object):
+    '''Counts latencies in logarithmic buckets.
+
+    Attributes:
+        count (int):
+        total (float): the sum of the latencies in seconds
+        min (float):
+        max (float):
+    '''
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    @staticmethod
+    def bucket(seconds: float) -> int:
+        """Returns the bucket seconds is counted in."""
+        microseconds = seconds*1_000_000
+        if microseconds < 1:
+            return 0
+        mantissa, exponent = math.frexp(microseconds) # mantissa in [0.5, 1)
+        return min(
+            (exponent - 1)*SUB_BUCKETS + int((mantissa - 0.5)*2*SUB_BUCKETS) + 1,
+            BUCKETS - 1
+            )
+
+    @staticmethod
+    def upper(bucket: int) -> float:
+        """Returns the largest latency in seconds counted in bucket."""
+        if bucket == 0:
+            return 1e-6
+        exponent, sub = divmod(bucket - 1, SUB_BUCKETS)
+        return 2.0**exponent*(1 + (sub + 1)/SUB_BUCKETS)/1_000_000
+
+    def record(self, seconds: float) -> None:
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Returns the latency percent of the results took no longer than,
+        to the top of its bucket. None before any are recorded."""
+        if not self.count:
+            return None
+        wanted = math.ceil(self.count*percent/100) or 1
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(self.upper(bucket), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Returns count, mean, min, p50, p90, p99 and max, in seconds."""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': self.total/self.count,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+            }
+
+
+class C4HLatency(object):
+    '''The latency histograms for every stage.
+
+    Example:
+        latency = C4HLatency()
+        this_event.set_latency(latency)
+        driver.latency = latency
+        ...
+        print(latency.report())
+    '''
+
+    def __init__(self, stages: tuple = STAGES):
+        self.stages = stages
+        self.histograms = {stage: C4HHistogram() for stage in stages}
+        self._lock = threading.Lock()
+
+    def mark(self, stage: str, received: float, now: float = None) -> None:
+        """Counts the time from received, a time.monotonic(), to now for stage.
+
+        Can be called from any thread.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self.histograms[stage].record(now - received)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms = {stage: C4HHistogram() for stage in self.stages}
+
+    def summaries(self) -> Dict[str, Dict[str, float]]:
+        """Returns the summary of each stage, all taken at the same moment."""
+        with self._lock:
+            return {stage: h.summary() for stage, h in self.histograms.items()}
+
+    def report(self) -> str:
+        """Returns a table of the latencies in milliseconds."""
+        columns = ('mean', 'min', 'p50', 'p90', 'p99', 'max')
+        lines = [f'{"stage":<10}{"count":>8}' + ''.join(f'{c:>10}' for c in columns)]
+        for stage, summary in self.summaries().items():
+            line = f'{stage:<10}{summary["count"]:>8}'
+            if summary['count']:
+                line += ''.join(f'{summary[c]*1000:>10.3f}' for c in columns)
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def export(self, fn) -> None:
+        """Writes the summaries and the bucket counts of each stage as json.
+
+        The buckets are [upper bound in seconds, count] for the buckets that
+        have a count.
+        """
+        with self._lock:
+            data = {
+                stage: {
+                    **histogram.summary(),
+                    'buckets': [
+                        [histogram.upper(bucket), count]
+                        for bucket, count in enumerate(histogram.counts) if count
+                        ],
+                    }
+                for stage, histogram in self.histograms.items()
+                }
+        with open(fn, 'w') as out_file:
+            json.dump(data, out_file, indent=2)
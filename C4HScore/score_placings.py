@@ -0,0 +1,287 @@
+""" score_placings.py - placings for the rounds in a C4HJumpClass.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+Each jumpclass gets a C4HPlacings the first time C4HEvent.get_placings is
+called for it. C4HEvent passes it every new or changed round after that so
+the placings are kept in order as results come in rather than sorted again
+for every result.
+
+A combo is placed on the furthest stage it has jumped. Combos in a later
+stage are placed ahead of combos that didn't get there. Up to the jump-off
+a combo's penalties are added up over all its rounds and the time of its
+last round breaks ties, in a jump-off only the jump-off round counts.
+Eliminated combos are placed last in their stage. Combos with the same
+stage, penalties and time share a place.
+
+If the article has a jump-off, the combos equal on the fewest penalties
+over the rounds before it go through to it. What counts as penalties
+depends on the table, see score_rules.py, and eliminated combos never go
+through.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain, takewhile
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+# stages are numbered from 0 for r1, jump-offs are numbered from JUMPOFF
+JUMPOFF = 100
+
+
+def stage_of(round_type: str) -> int:
+    """Returns the stage number of a round type eg. r1: 0, r2: 1, jo1: 100."""
+    if round_type.startswith('jo'):
+        return JUMPOFF + int(round_type[2:] or 1) - 1
+    return int(round_type.lstrip('r') or 1) - 1
+
+
+# round attributes that are results, setting any of them judges the round
+RESULTS = frozenset(('faults', 'jump_pens', 'time', 'time_pens', 'eliminated'))
+
+
+def has_result(round_: Any) -> bool:
+    """True once round_ has been judged.
+
+    Rounds saved before rounds were marked as judged count once something
+    has been scored for them.
+    """
+    return bool(
+        round_.judged or round_.time or round_.faults or round_.jump_pens
+        or round_.time_pens or round_.eliminated
+        )
+
+
+def round_key(round_: Any) -> Tuple[float, float]:
+    """Returns what rounds in the same stage are placed on, lowest first.
+
+    The first item is the penalties, added up over the rounds before the
+    jump-off, then the time with any correction time. Eliminated rounds
+    come last.
+    """
+    if round_.eliminated:
+        return (float('inf'), float('inf'))
+    return (round_.jump_pens + round_.time_pens, round_.time + round_.time_added)
+
+
+def round_penalties(round_: Any) -> float:
+    """Returns the penalties of round_ jump-off qualifiers must be equal on."""
+    if round_.eliminated:
+        return float('inf')
+    return round_.jump_pens + round_.time_pens
+
+
+def total_key(keys: List[tuple]) -> tuple:
+    """Combines the keys of a combo's rounds, in stage order: the penalties
+    are added up and the last round breaks ties."""
+    return (sum(key[0] for key in keys), *keys[-1][1:])
+
+
+class C4HSortedList(object):
+    '''A list that keeps its values in order.
+
+    The values are held in chunks of at most 2*CHUNK, with the last value of
+    each chunk kept in a separate list. Finding a value is a binary search
+    of the chunk ends then of one chunk, so O(log n), and adding or
+    removing it only moves the values in that one chunk.
+    '''
+    CHUNK = 64
+
+    def __init__(self):
+        self._chunks: List[list] = []
+        self._maxes: List[Any] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, item: int) -> Any:
+        if item < 0:
+            item += self._len
+        for chunk in self._chunks:
+            if item < len(chunk):
+                return chunk[item]
+            item -= len(chunk)
+        raise IndexError('C4HSortedList index out of range')
+
+    def add(self, value: Any) -> None:
+        if not self._chunks:
+            self._chunks.append([value])
+            self._maxes.append(value)
+        else:
+            i = bisect_right(self._maxes, value)
+            if i == len(self._maxes):
+                i -= 1
+                self._chunks[i].append(value)
+                self._maxes[i] = value
+            else:
+                insort(self._chunks[i], value)
+            chunk = self._chunks[i]
+            if len(chunk) > 2*self.CHUNK:
+                self._chunks[i:i + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+                self._maxes[i:i + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+        self._len += 1
+
+    def remove(self, value: Any) -> None:
+        """Removes value.
+
+        Raises:
+            ValueError: if value isn't in the list
+        """
+        i = bisect_left(self._maxes, value)
+        if i < len(self._chunks):
+            chunk = self._chunks[i]
+            j = bisect_left(chunk, value)
+            if j < len(chunk) and chunk[j] == value:
+                del chunk[j]
+                if chunk:
+                    self._maxes[i] = chunk[-1]
+                else:
+                    del self._chunks[i]
+                    del self._maxes[i]
+                self._len -= 1
+                return
+        raise ValueError(f'{value!r} is not in the list')
+
+
+class C4HPlacings(object):
+    '''The placings in a jumpclass, kept up to date one round at a time.
+
+    Attributes:
+        jumpclass (C4HJumpClass):
+        key (callable): round -> what rounds in a stage are placed on, see
+            round_key
+        penalties (callable): round -> the penalties jump-off qualifiers
+            are equal on, see round_penalties
+        jumpoffs (bool): False if the jumpclass has no jump-off
+    '''
+
+    def __init__(self, jumpclass: Any, key_of: Callable[[Any], int],
+            key: Callable[[Any], tuple] = round_key,
+            penalties: Callable[[Any], float] = round_penalties,
+            jumpoffs: bool = True):
+        '''
+        Args:
+            jumpclass (C4HJumpClass):
+            key_of (callable): C4HEvent.key_of, the combo keys keep the
+                values in the sorted lists unique
+            key (callable): round -> what rounds in a stage are placed on
+            penalties (callable): round -> the penalties jump-off
+                qualifiers are equal on
+            jumpoffs (bool): False if the jumpclass has no jump-off
+        '''
+        self.jumpclass = jumpclass
+        self.key = key
+        self.penalties = penalties
+        self.jumpoffs = jumpoffs
+        self._key_of = key_of
+        # (-stage, *key, combo key) for every placed combo
+        self._order = C4HSortedList()
+        # (penalties, *key, combo key) over the rounds before the jump-off
+        # of every combo that hasn't been eliminated in them
+        self._qualifying = C4HSortedList()
+        self._combos = {} # combo key: (combo, {stage: round})
+        self._placed = {} # combo key: (round placed on, order value, qualifying value)
+        self._round_combos = {} # id(round): combo key
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def update(self, round_: Any) -> None:
+        """Moves the combo of round_ to its new place, O(log n).
+
+        Call for every new or changed round in the event, rounds from
+        other jumpclasses are ignored unless they used to be in this one.
+        """
+        old_combo = self._round_combos.pop(id(round_), None)
+        if old_combo is None and round_.jumpclass is not self.jumpclass:
+            return
+        if old_combo is not None:
+            rounds = self._combos[old_combo][1]
+            for stage, r in list(rounds.items()):
+                if r is round_:
+                    del rounds[stage]
+
+        combo_key = None
+        if round_.jumpclass is self.jumpclass and round_.combo is not None:
+            combo_key = self._key_of(round_.combo)
+            rounds = self._combos.setdefault(combo_key, (round_.combo, {}))[1]
+            rounds[stage_of(round_.round_type)] = round_
+            self._round_combos[id(round_)] = combo_key
+
+        if old_combo is not None and old_combo != combo_key:
+            self._place(old_combo)
+        if combo_key is not None:
+            self._place(combo_key)
+
+    def _place(self, combo_key: int) -> None:
+        placed = self._placed.pop(combo_key, None)
+        if placed:
+            _, order, qualifying = placed
+            self._order.remove(order)
+            if qualifying:
+                self._qualifying.remove(qualifying)
+
+        combo, rounds = self._combos[combo_key]
+        stages = [stage for stage, r in rounds.items() if has_result(r)]
+        if not stages:
+            return
+        stage = max(stages)
+        round_ = rounds[stage]
+        before_jumpoff = sorted(s for s in stages if s < JUMPOFF)
+        total = None
+        if before_jumpoff:
+            total = total_key([self.key(rounds[s]) for s in before_jumpoff])
+        key = total if stage < JUMPOFF else self.key(round_)
+        order = (-stage, *key, combo_key)
+        self._order.add(order)
+        qualifying = None
+        if before_jumpoff and not any(rounds[s].eliminated for s in before_jumpoff):
+            penalties = sum(self.penalties(rounds[s]) for s in before_jumpoff)
+            qualifying = (penalties, *total, combo_key)
+            self._qualifying.add(qualifying)
+        self._placed[combo_key] = (round_, order, qualifying)
+
+    def placings(self, limit: Optional[int] = None) -> List[Tuple[int, Any, Any]]:
+        """Returns (place, combo, round placed on), best first.
+
+        Args:
+            limit (int): only return the combos placed limit or better
+
+        Combos placed equal share the place and the next place is skipped.
+        """
+        results = []
+        previous = None
+        place = 0
+        for n, order in enumerate(self._order, 1):
+            if order[:-1] != previous:
+                place = n
+                previous = order[:-1]
+                if limit is not None and place > limit:
+                    break
+            combo_key = order[-1]
+            results.append((place, self._combos[combo_key][0], self._placed[combo_key][0]))
+        return results
+
+    def prize_winners(self) -> List[Tuple[int, Any, Any]]:
+        """Returns the placings that win a prize, the jumpclass places
+        and any combos equal with the last of them."""
+        return self.placings(self.jumpclass.places)
+
+    def jumpoff_qualifiers(self) -> List[Any]:
+        """Returns the combos that go through to the jump-off.
+
+        They are the combos equal on the fewest penalties over the rounds
+        before the jump-off, none if only one combo has them or the
+        jumpclass has no jump-off. Eliminated combos don't go through.
+        """
+        if not self.jumpoffs or len(self._qualifying) < 2:
+            return []
+        fewest = self._qualifying[0][0]
+        qualifying = list(takewhile(lambda v: v[0] == fewest, self._qualifying))
+        if len(qualifying) < 2:
+            return []
+        return [self._combos[v[-1]][0] for v in qualifying]
@@ -0,0 +1,374 @@
+""" score_rules.py - compiles EA/FEI articles into the functions that place rounds.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+An article says how many rounds and jump-offs a jumpclass has and, for each
+of them, the table it is judged under and whether it is against the clock.
+Rather than looking at those attributes every time two rounds are compared,
+each article is compiled once into a C4HRules holding a key function per
+stage that C4HPlacings sorts on:
+
+    Table A against the clock: (penalties, time)
+    Table A not against the clock: (penalties, 0.0), equal penalties share a place
+    Table C: (time + KNOCKDOWN_SECONDS per rail, 0.0)
+
+The times include any correction time added for the faults, see
+C4HRound.time_added.
+
+Eliminated rounds are (inf, inf) under every table. Jump-offs, immediate
+jump-offs and the second phase of a two phase competition are later stages
+and are placed ahead of the earlier ones by C4HPlacings.
+
+The combos that go through to a jump-off are those equal on the fewest
+penalties, so each stage also has a penalties function: the jump and time
+penalties under Table A, and under Table C, which has the rails in the
+time, the converted time. Articles without a jump-off have no qualifiers.
+
+The article library is read from ARTICLES_FILE, the article definitions by
+rules body eg. {'EA': [{_id, description, rounds, jumpoffs, sub_arts}]}, and
+compiled as a whole. The compiled library is cached on the file's
+modification time so editing the file is picked up next time it is asked for.
+"""
+
+import os
+import re
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from .score_faults import parse_faults
+from .score_placings import JUMPOFF, stage_of
+
+ARTICLES_FILE = Path(__file__).parent / 'ea_articles.yaml'
+
+KNOCKDOWN_SECONDS = 4.0 # added to the time for each rail under Table C
+
+ELIMINATED = (float('inf'), float('inf'))
+
+# file: (modification time, library)
+_libraries: Dict[str, Tuple[int, Dict[str, 'C4HRules']]] = {}
+
+
+class C4HRulesError(ValueError):
+    '''Raised when an article can't be found or compiled.'''
+
+
+class C4HStage(NamedTuple):
+    '''How one round or jump-off is judged.'''
+    table: str = 'A'
+    against_clock: bool = True
+
+
+def table_a_clock(round_: Any) -> Tuple[float, float]:
+    """Table A against the clock: penalties then time."""
+    if round_.eliminated:
+        return ELIMINATED
+    return (round_.jump_pens + round_.time_pens, round_.time + round_.time_added)
+
+
+def table_a(round_: Any) -> Tuple[float, float]:
+    """Table A not against the clock: penalties only."""
+    if round_.eliminated:
+        return ELIMINATED
+    return (round_.jump_pens + round_.time_pens, 0.0)
+
+
+def table_c(round_: Any) -> Tuple[float, float]:
+    """Table C: the time with the rails converted to seconds."""
+    if round_.eliminated:
+        return ELIMINATED
+    jumpclass = round_.jumpclass
+    faults = parse_faults(round_.faults, jumpclass.fences if jumpclass else 0)
+    return (round_.time + round_.time_added + faults.rails*KNOCKDOWN_SECONDS, 0.0)
+
+
+def table_a_penalties(round_: Any) -> float:
+    """Table A: the jump and time penalties."""
+    if round_.eliminated:
+        return ELIMINATED[0]
+    return round_.jump_pens + round_.time_pens
+
+
+def table_c_penalties(round_: Any) -> float:
+    """Table C: the time with the rails converted to seconds."""
+    return table_c(round_)[0]
+
+
+def stage_key(stage: C4HStage) -> Callable[[Any], Tuple[float, float]]:
+    """Returns the key function for rounds judged under stage."""
+    if stage.table == 'C':
+        return table_c
+    return table_a_clock if stage.against_clock else table_a
+
+
+def stage_penalties(stage: C4HStage) -> Callable[[Any], float]:
+    """Returns the penalties function for rounds judged under stage."""
+    return table_c_penalties if stage.table == 'C' else table_a_penalties
+
+
+class C4HRules(object):
+    '''A compiled article.
+
+    Attributes:
+        id (str): the article number eg. '238.2.2'
+        description (str):
+        rules (str): the rules body eg. 'EA'
+        rounds (tuple[C4HStage]): the rounds in order
+        jumpoffs (tuple[C4HStage]): the jump-offs in order
+    '''
+
+    def __init__(self, id: str, rounds: Tuple[C4HStage, ...],
+            jumpoffs: Tuple[C4HStage, ...] = (), description: str = '',
+            rules: str = 'EA'):
+        self.id = id
+        self.description = description
+        self.rules = rules
+        self.rounds = tuple(rounds) or (C4HStage(),)
+        self.jumpoffs = tuple(jumpoffs)
+        self._keys: Dict[str, Callable] = {} # round_type: key function
+        self._penalties: Dict[str, Callable] = {} # round_type: penalties function
+
+    def __repr__(self) -> str:
+        return f'C4HRules({self.id!r}, rounds={self.rounds}, jumpoffs={self.jumpoffs})'
+
+    def stage(self, round_type: str) -> C4HStage:
+        """Returns how round_type is judged.
+
+        Rounds past the last one in the article are judged like the last,
+        jump-offs like the last jump-off or, if there is none, the last round.
+        """
+        stage = stage_of(round_type)
+        if stage >= JUMPOFF and self.jumpoffs:
+            stages, n = self.jumpoffs, stage - JUMPOFF
+        elif stage >= JUMPOFF:
+            stages, n = self.rounds, len(self.rounds)
+        else:
+            stages, n = self.rounds, stage
+        return stages[min(n, len(stages) - 1)]
+
+    def key(self, round_: Any) -> Tuple[float, float]:
+        """Returns what round_ is placed on within its stage, lowest first.
+
+        The key function for each round type is picked once and kept.
+        """
+        key = self._keys.get(round_.round_type)
+        if key is None:
+            key = self._keys[round_.round_type] = stage_key(self.stage(round_.round_type))
+        return key(round_)
+
+    def penalties(self, round_: Any) -> float:
+        """Returns the penalties of round_ that jump-off qualifiers are equal on."""
+        penalties = self._penalties.get(round_.round_type)
+        if penalties is None:
+            penalties = self._penalties[round_.round_type] = stage_penalties(
+                self.stage(round_.round_type)
+                )
+        return penalties(round_)
+
+
+# the rules for a jumpclass with no article
+DEFAULT_RULES = C4HRules('', (C4HStage(),), (C4HStage(),))
+
+
+# Compiling
+# -------------------------------------------------------------
+
+def _count(value: Any, default: int) -> int:
+    """Returns the number of rounds in value eg. 2, '1-2': 2, None: default."""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise C4HRulesError(f'{value!r} is not a number of rounds')
+    if isinstance(value, (int, float)):
+        return int(value)
+    numbers = [int(n) for n in re.findall(r'\d+', str(value))]
+    return max(numbers) if numbers else default
+
+
+def _table(value: Any, default: str) -> str:
+    """Returns the table in value eg. 'A', 'A or C': 'A', None: default."""
+    match = re.search(r'\b([AC])\b', str(value or '').upper())
+    return match.group(1) if match else default
+
+
+def _against_clock(value: Any, default: bool, round_num: int) -> bool:
+    """Returns whether round round_num (from 1) is against the clock.
+
+    value is True, False, None for the default or a description like
+    '2nd round', which is against the clock from that round on.
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    match = re.search(r'\d+', str(value))
+    if match:
+        return round_num >= int(match.group())
+    return str(value).strip().lower() in ('true', 'yes')
+
+
+def _merge_specs(parent: List[dict], child: Optional[List[dict]]) -> List[dict]:
+    """Returns the round specs of a sub article, parent's overridden by child's."""
+    if not child:
+        return [dict(spec) for spec in parent]
+    merged = []
+    for n, spec in enumerate(child):
+        base = parent[min(n, len(parent) - 1)] if parent else {}
+        merged.append({
+            **base,
+            **{key: value for key, value in (spec or {}).items() if value is not None},
+            })
+    return merged
+
+
+def _stages(specs: List[dict], default_num: int,
+        default: C4HStage) -> Tuple[C4HStage, ...]:
+    stages = []
+    for spec in specs:
+        table = _table(spec.get('table'), default.table)
+        for _ in range(_count(spec.get('num'), default_num)):
+            against_clock = _against_clock(
+                spec.get('against_clock'), default.against_clock, len(stages) + 1
+                )
+            stages.append(C4HStage(table, against_clock))
+    return tuple(stages)
+
+
+def _sub_id(parent_id: str, sub_id: Any) -> str:
+    """Returns the full number of a sub article.
+
+    '.1.2' and 2 are paragraphs of parent_id, a number like 245.3 is an
+    article in its own right.
+    """
+    sub_id = str(sub_id)
+    if sub_id.startswith('.'):
+        return parent_id + sub_id
+    if int(float(sub_id.split('.')[0])) >= 100:
+        return sub_id
+    return f'{parent_id}.{sub_id}'
+
+
+def article_definition(article: Any) -> dict:
+    """Returns a C4HArticle as an article definition like those in ARTICLES_FILE."""
+    if isinstance(article, dict):
+        return article
+    return {
+        '_id': article._id,
+        'description': article.description,
+        'alt_name': article.alt_name,
+        'rounds': [{
+            'num': article.round_num,
+            'table': article.round_table,
+            'against_clock': article.round_against_clock,
+            }],
+        'jumpoffs': [{
+            'num': article.jo_num,
+            'table': article.jo_table or article.round_table,
+            }],
+        'sub_arts': [
+            {'_id': sub.get('id'), 'description': sub.get('name', ''),
+                'rounds': [{'table': sub.get('table')}]}
+            for sub in article.sub_articles
+            ],
+        }
+
+
+def compile_article(article: Any, rules: str = 'EA') -> Dict[str, C4HRules]:
+    """Compiles an article and its sub articles.
+
+    Args:
+        article: a C4HArticle or an article definition from ARTICLES_FILE
+        rules (str): the rules body the article is from
+
+    Returns:
+        dict: article number: C4HRules, the sub articles included
+
+    Raises:
+        C4HRulesError: if the article has no number
+    """
+    definition = article_definition(article)
+    if definition.get('_id') is None:
+        raise C4HRulesError(f'Article {definition!r} has no number')
+    return _compile(definition, rules, str(definition['_id']), [{}], [], '')
+
+
+def _compile(definition: dict, rules: str, id: str, parent_rounds: List[dict],
+        parent_jumpoffs: List[dict], parent_description: str) -> Dict[str, C4HRules]:
+    round_specs = _merge_specs(parent_rounds, definition.get('rounds'))
+    jumpoff_specs = _merge_specs(parent_jumpoffs, definition.get('jumpoffs'))
+    rounds = _stages(round_specs, 1, C4HStage())
+    # jump-offs are judged like the last round unless they say otherwise
+    jumpoffs = _stages(jumpoff_specs, 1, C4HStage(rounds[-1].table if rounds else 'A'))
+    description = definition.get('description') or parent_description
+
+    compiled = {id: C4HRules(id, rounds, jumpoffs, description, rules)}
+    for sub in definition.get('sub_arts') or ():
+        compiled.update(_compile(
+            sub, rules, _sub_id(id, sub.get('_id')), round_specs, jumpoff_specs,
+            description
+            ))
+    return compiled
+
+
+# The library
+# -------------------------------------------------------------
+
+def compile_library(definitions: Dict[str, List[Any]]) -> Dict[str, C4HRules]:
+    """Compiles the articles of every rules body in definitions.
+
+    Args:
+        definitions (dict): rules body: [article definitions or C4HArticles]
+
+    Returns:
+        dict: article number: C4HRules
+    """
+    library = {}
+    for rules, articles in definitions.items():
+        for article in articles or ():
+            library.update(compile_article(article, rules))
+    return library
+
+
+def article_library(fn: Any = ARTICLES_FILE) -> Dict[str, C4HRules]:
+    """Returns the compiled articles in the file fn.
+
+    The file is only read and compiled again when its modification time
+    changes.
+
+    Raises:
+        C4HRulesError: if the file isn't an article library
+    """
+    path = os.path.abspath(fn)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _libraries.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'r') as in_file:
+        definitions = yaml.safe_load(in_file)
+    if not isinstance(definitions, dict):
+        raise C4HRulesError(f'{fn} is not an article library')
+    library = compile_library(definitions)
+    _libraries[path] = (mtime, library)
+    return library
+
+
+def article_rules(article: str, fn: Any = ARTICLES_FILE) -> C4HRules:
+    """Returns the compiled rules for a jumpclass article.
+
+    Args:
+        article: the jumpclass article number to look up in the library in
+            fn, None or '' for DEFAULT_RULES
+
+    Raises:
+        C4HRulesError: if there is no article with that number
+    """
+    if article is None or article == '':
+        return DEFAULT_RULES
+    rules = article_library(fn).get(str(article).strip())
+    if rules is None:
+        raise C4HRulesError(f'There is no article {article}')
+    return rules
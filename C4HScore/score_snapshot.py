@@ -0,0 +1,340 @@
+""" score_snapshot.py - compact binary snapshots of a C4HEvent.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+The event file is a binary snapshot, yaml is kept for import and export.
+
+File layout, all integers little endian:
+    magic b'C4HS', version (uint16)
+    sections, each a 4 byte tag, a uint32 payload length and the payload.
+        EVNT: the event attributes
+        LIST: one of the event lists, written column by column
+
+Objects are written once in their list and refer to each other by their
+position in the list they are in, see score_tables.py.
+
+Sections with tags a reader doesn't know, lists it doesn't have and fields
+its objects and event don't have are skipped, so adding any of them keeps
+VERSION and older versions can still read the file. VERSION is only
+bumped for a change older readers can't skip, eg. to the layout of a
+section, and a reader refuses a version newer than its own.
+"""
+
+import struct
+import uuid
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .score_index import COLLECTIONS
+from .score_journal import TYPES, object_values
+from .score_tables import build_event
+
+MAGIC = b'C4HS'
+VERSION = 1 # only bumped for layout changes older readers can't skip
+
+# every list is written, in this order, so references are easy to follow
+COLLECTION_CODES = {collection: code for code, collection in enumerate(COLLECTIONS.values())}
+CODE_COLLECTIONS = list(COLLECTIONS.values())
+
+_HEADER = struct.Struct('<4sH')
+_SECTION = struct.Struct('<4sI')
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+
+
+class C4HSnapshotError(ValueError):
+    '''Raised when a snapshot can't be read.'''
+
+
+class Ref(tuple):
+    '''A reference to the object at a position in an event list.'''
+    __slots__ = ()
+
+
+# Writing
+# -------------------------------------------------------------
+
+def _pack_str(out: bytearray, value: str) -> None:
+    data = value.encode('utf-8')
+    out += _U32.pack(len(data))
+    out += data
+
+
+def _pack_value(out: bytearray, value: Any, index) -> None:
+    """Writes a single value of any type that can be saved."""
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        out += b'i' + _I64.pack(value)
+    elif isinstance(value, float):
+        out += b'f' + _F64.pack(value)
+    elif isinstance(value, str):
+        out += b's'
+        _pack_str(out, value)
+    elif isinstance(value, (list, tuple)):
+        out += b'l' + _U32.pack(len(value))
+        for v in value:
+            _pack_value(out, v, index)
+    elif isinstance(value, datetime):
+        out += b't'
+        _pack_str(out, value.isoformat())
+    elif isinstance(value, date):
+        out += b'd' + _U32.pack(value.toordinal())
+    elif isinstance(value, uuid.UUID):
+        out += b'u' + value.bytes
+    elif isinstance(value, Path):
+        out += b'p'
+        _pack_str(out, str(value))
+    else:
+        collection = index.collection_of(value)
+        if collection is None:
+            raise TypeError(f"Can't save a {type(value).__name__}")
+        out += b'r' + _U8.pack(COLLECTION_CODES[collection])
+        out += _U32.pack(index.position(value))
+
+
+def _column_kind(values: List[Any], index) -> Tuple[bytes, Any]:
+    """Picks the most compact way to write a column of values."""
+    types = {type(v) for v in values}
+    if types == {str}:
+        return b'S', None
+    if types == {bool}:
+        return b'B', None
+    if types == {int}:
+        return b'I', None
+    if types == {float}:
+        return b'D', None
+    if types == {uuid.UUID}:
+        return b'U', None
+    collections = {index.collection_of(v) for v in values if v is not None}
+    if len(collections) == 1 and None not in collections:
+        return b'R', collections.pop()
+    return b'O', None
+
+
+def _pack_column(out: bytearray, values: List[Any], index) -> None:
+    kind, collection = _column_kind(values, index)
+    out += kind
+    n = len(values)
+    if kind == b'S':
+        data = [v.encode('utf-8') for v in values]
+        out += struct.pack(f'<{n}I', *map(len, data))
+        out += b''.join(data)
+    elif kind == b'B':
+        out += bytes(values)
+    elif kind == b'I':
+        out += struct.pack(f'<{n}q', *values)
+    elif kind == b'D':
+        out += struct.pack(f'<{n}d', *values)
+    elif kind == b'U':
+        out += b''.join(v.bytes for v in values)
+    elif kind == b'R':
+        out += _U8.pack(COLLECTION_CODES[collection])
+        out += struct.pack(
+            f'<{n}i', *(-1 if v is None else index.position(v) for v in values)
+            )
+    else:
+        for v in values:
+            _pack_value(out, v, index)
+
+
+def _pack_list(collection: str, objects: List[Any], index) -> bytearray:
+    out = bytearray()
+    _pack_str(out, collection)
+    rows = [object_values(obj) for obj in objects]
+    fields = list(rows[0]) if rows else []
+    out += _U32.pack(len(rows)) + _U32.pack(len(fields))
+    for field in fields:
+        column = bytearray()
+        _pack_column(column, [row[field] for row in rows], index)
+        _pack_str(out, field)
+        out += _U32.pack(len(column))
+        out += column
+    return out
+
+
+def dumps(event, fields: List[str]) -> bytes:
+    """Returns the binary snapshot of event.
+
+    Args:
+        event (C4HEvent):
+        fields (list[str]): the event attributes to save, other than the lists
+    """
+    index = event._index
+    out = bytearray(_HEADER.pack(MAGIC, VERSION))
+
+    payload = bytearray(_U32.pack(len(fields)))
+    for field in fields:
+        _pack_str(payload, field)
+        _pack_value(payload, getattr(event, field), index)
+    out += _SECTION.pack(b'EVNT', len(payload)) + payload
+
+    for collection in CODE_COLLECTIONS:
+        payload = _pack_list(collection, getattr(event, collection), index)
+        out += _SECTION.pack(b'LIST', len(payload)) + payload
+
+    return bytes(out)
+
+
+# Reading
+# -------------------------------------------------------------
+
+class _Reader(object):
+    '''Walks through a snapshot.'''
+
+    def __init__(self, data: bytes, pos: int = 0, end: int = None):
+        self.data = data
+        self.pos = pos
+        self.end = len(data) if end is None else end
+
+    def take(self, n: int) -> bytes:
+        if self.pos + n > self.end:
+            raise C4HSnapshotError('Snapshot is truncated')
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return chunk
+
+    def unpack(self, fmt: struct.Struct) -> Any:
+        values = fmt.unpack(self.take(fmt.size))
+        return values[0] if len(values) == 1 else values
+
+    def unpack_many(self, code: str, n: int) -> tuple:
+        fmt = struct.Struct(f'<{n}{code}')
+        return fmt.unpack(self.take(fmt.size))
+
+    def str(self) -> str:
+        return self.take(self.unpack(_U32)).decode('utf-8')
+
+    def value(self) -> Any:
+        kind = self.take(1)
+        if kind == b'N':
+            return None
+        if kind == b'T':
+            return True
+        if kind == b'F':
+            return False
+        if kind == b'i':
+            return self.unpack(_I64)
+        if kind == b'f':
+            return self.unpack(_F64)
+        if kind == b's':
+            return self.str()
+        if kind == b'l':
+            return [self.value() for _ in range(self.unpack(_U32))]
+        if kind == b't':
+            return datetime.fromisoformat(self.str())
+        if kind == b'd':
+            return date.fromordinal(self.unpack(_U32))
+        if kind == b'u':
+            return uuid.UUID(bytes=self.take(16))
+        if kind == b'p':
+            return Path(self.str())
+        if kind == b'r':
+            return Ref((CODE_COLLECTIONS[self.unpack(_U8)], self.unpack(_U32)))
+        raise C4HSnapshotError(f'Unknown value type {kind!r}')
+
+    def column(self, n: int) -> List[Any]:
+        kind = self.take(1)
+        if kind == b'S':
+            lengths = self.unpack_many('I', n)
+            values = []
+            for length in lengths:
+                values.append(self.take(length).decode('utf-8'))
+            return values
+        if kind == b'B':
+            return [bool(b) for b in self.take(n)]
+        if kind == b'I':
+            return list(self.unpack_many('q', n))
+        if kind == b'D':
+            return list(self.unpack_many('d', n))
+        if kind == b'U':
+            data = self.take(16*n)
+            return [uuid.UUID(bytes=data[i:i+16]) for i in range(0, 16*n, 16)]
+        if kind == b'R':
+            self.unpack(_U8) # the collection, known from the field
+            return [None if p < 0 else p for p in self.unpack_many('i', n)]
+        if kind == b'O':
+            return [self.value() for _ in range(n)]
+        raise C4HSnapshotError(f'Unknown column type {kind!r}')
+
+
+def read_sections(data: bytes) -> Tuple[dict, Dict[str, Dict[str, List[Any]]]]:
+    """Reads a snapshot into the event attributes and a table per list.
+
+    References in the lists are left as positions, references in the event
+    attributes as Ref(collection, position).
+
+    Returns:
+        tuple: (event attributes, {collection: {field: column}})
+    """
+    reader = _Reader(data)
+    magic, version = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise C4HSnapshotError('Not a C4HScore snapshot')
+    if version > VERSION:
+        raise C4HSnapshotError(f'Snapshot version {version} is newer than {VERSION}')
+
+    attributes = {}
+    tables = {}
+    while reader.pos < reader.end:
+        tag, length = reader.unpack(_SECTION)
+        section = _Reader(data, reader.pos, reader.pos + length)
+        reader.take(length)
+        if tag == b'EVNT':
+            for _ in range(section.unpack(_U32)):
+                field = section.str()
+                attributes[field] = section.value()
+        elif tag == b'LIST':
+            collection = section.str()
+            count, num_fields = section.unpack(_U32), section.unpack(_U32)
+            columns = {}
+            for _ in range(num_fields):
+                field = section.str()
+                length = section.unpack(_U32)
+                column = _Reader(data, section.pos, section.pos + length)
+                section.take(length)
+                columns[field] = column.column(count)
+            tables[collection] = (count, columns)
+        # anything else is from a newer version and can be skipped
+
+    return attributes, tables
+
+
+def loads(data: bytes, event_cls, trusted: bool = False) -> Any:
+    """Creates an event from a binary snapshot.
+
+    The lists are read as flat tables and re-linked in one pass, see
+    score_tables.py.
+
+    Args:
+        data (bytes): the snapshot
+        event_cls (type): C4HEvent
+        trusted (bool): skip validating the event and its objects, the
+            snapshot was written from valid objects
+    """
+    attributes, tables = read_sections(data)
+    # fields added by newer versions are skipped
+    attributes = {
+        field: value for field, value in attributes.items() if field in event_cls.__fields__
+        }
+    rows = {}
+    for collection, (count, columns) in tables.items():
+        if collection not in TYPES:
+            continue
+        known = TYPES[collection].__dataclass_fields__
+        columns = {field: column for field, column in columns.items() if field in known}
+        fields = list(columns)
+        rows[collection] = [
+            dict(zip(fields, values)) for values in zip(*columns.values())
+            ] if fields else [{} for _ in range(count)]
+
+    return build_event(event_cls, attributes, rows, trusted)
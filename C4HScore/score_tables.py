@@ -0,0 +1,213 @@
+""" score_tables.py - the C4HEvent object graph as flat tables.
+
+These are called by the main class C4HEvent.
+They should be considered private and only accessed through CH4Event methods
+
+Every object in the event lists is written once, as a row in the table for
+its list. Objects that refer to each other (combo -> rider and horse,
+jumpclass -> arena, round -> combo and jumpclass) hold the position of the
+object in its table rather than the object itself, and the event reference
+each object holds is left out altogether.
+
+The lists are in COLLECTIONS order and every reference points to a list that
+comes before the one it is in, so loading re-links the references in a single
+pass over the rows.
+"""
+
+import dataclasses
+import uuid
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from .score_index import C4HIndex, COLLECTIONS
+from .score_journal import TYPES, object_values
+
+TABLES_VERSION = 1
+
+
+def _references(obj_type: type) -> Dict[str, str]:
+    """Returns field: collection for the fields of obj_type that refer to
+    objects in another event list."""
+    fields = getattr(obj_type, '__dataclass_fields__', {})
+    return {
+        name: COLLECTIONS[field.type] for name, field in fields.items()
+        if field.type in COLLECTIONS
+        }
+
+
+# collection -> field -> the collection the field refers to
+REFERENCES = {
+    collection: _references(obj_type) for obj_type, collection in COLLECTIONS.items()
+    }
+
+
+def field_defaults(obj_type: type) -> Tuple[Dict[str, Any], Dict[str, Callable]]:
+    """Returns the defaults for the fields of obj_type that have one.
+
+    Returns:
+        tuple: ({field: default value}, {field: default factory})
+    """
+    values = {}
+    factories = {}
+    for name, field in obj_type.__dataclass_fields__.items():
+        if field.default is not dataclasses.MISSING:
+            values[name] = field.default
+        elif field.default_factory is not dataclasses.MISSING:
+            factories[name] = field.default_factory
+    return values, factories
+
+
+def trusted_object(obj_type: type, defaults: tuple, row: dict) -> Any:
+    """Creates an object of obj_type from row without validating it.
+
+    This is what the pydantic dataclass __init__ ends up with when row is
+    valid, only use it for rows that were valid when they were saved.
+
+    Args:
+        obj_type (type):
+        defaults (tuple): field_defaults(obj_type)
+        row (dict): field: value
+    """
+    obj = obj_type.__new__(obj_type)
+    values, factories = defaults
+    values = dict(values)
+    values.update(row)
+    for name, factory in factories.items():
+        if name not in values:
+            values[name] = factory()
+    values['__initialised__'] = True
+    object.__setattr__(obj, '__dict__', values)
+    return obj
+
+
+def plain(value: Any) -> Any:
+    """Converts value to something a safe yaml dumper can write."""
+    if value is None or isinstance(value, (str, int, float, bool, date, datetime)):
+        return value
+    if isinstance(value, (uuid.UUID, Path)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    raise TypeError(f"Can't write a {type(value).__name__} to a table")
+
+
+def object_row(obj: object, references: Dict[str, str], index: C4HIndex) -> dict:
+    """Returns the saved attributes of obj with references as positions."""
+    row = object_values(obj)
+    for field in references:
+        target = row.get(field)
+        if target is None:
+            continue
+        position = index.position(target)
+        if position is None:
+            raise ValueError(
+                f'{type(obj).__name__}.{field} refers to an object not in the event'
+                )
+        row[field] = position
+    return row
+
+
+def event_tables(event, fields: List[str]) -> dict:
+    """Returns the event as a mapping of plain values.
+
+    Args:
+        event (C4HEvent):
+        fields (list[str]): the event attributes to write, other than the lists
+
+    Returns:
+        dict: {'version', 'event': {attributes}, collection: [rows]}
+    """
+    index = event._index
+    tables = {
+        'version': TABLES_VERSION,
+        'event': {field: plain(getattr(event, field)) for field in fields},
+        }
+    for collection, references in REFERENCES.items():
+        tables[collection] = [
+            {
+                key: val if key in references else plain(val)
+                for key, val in object_row(obj, references, index).items()
+                }
+            for obj in getattr(event, collection)
+            ]
+    return tables
+
+
+def build_event(event_cls, attributes: dict, tables: Dict[str, List[dict]],
+        trusted: bool = False) -> Any:
+    """Creates an event from its attributes and the rows of each list.
+
+    Rows hold references as positions, or None, and are re-linked in one pass.
+
+    Args:
+        event_cls (type): C4HEvent
+        attributes (dict): the event attributes
+        tables (dict): collection: [rows], missing lists are left empty
+        trusted (bool): build the event and its objects without validating
+            them. Only for data that was valid when it was saved, use
+            C4HEvent.event_validate to check it later.
+    """
+    if trusted:
+        event = event_cls.construct(**attributes)
+    else:
+        event = event_cls(**attributes)
+
+    for collection, references in REFERENCES.items():
+        obj_type = TYPES[collection]
+        takes_event = 'event' in obj_type.__dataclass_fields__
+        defaults = field_defaults(obj_type) if trusted else None
+        objects = []
+        for row in tables.get(collection) or ():
+            for field, target in references.items():
+                position = row.get(field)
+                if position is not None:
+                    row[field] = getattr(event, target)[position]
+            if takes_event:
+                row['event'] = event
+            if trusted:
+                objects.append(trusted_object(obj_type, defaults, row))
+            else:
+                objects.append(obj_type(**row))
+        if trusted:
+            event.__dict__[collection] = objects
+        else:
+            setattr(event, collection, objects)
+
+    if renew_shared_IDs(event) or trusted:
+        event._reindex()
+    return event
+
+
+def renew_shared_IDs(event) -> int:
+    """Gives each object whose uuid an earlier object in the event already
+    has a new one.
+
+    Files saved when every object of a type shared one uuid would otherwise
+    have one object indexed for all of them. The event must be reindexed
+    if any are renewed.
+
+    Returns:
+        int: the number of objects given a new uuid
+    """
+    seen = set()
+    renewed = 0
+    for collection in COLLECTIONS.values():
+        for obj in getattr(event, collection):
+            ID = getattr(obj, 'ID', None)
+            if ID is None:
+                continue
+            if ID in seen:
+                obj.__dict__['ID'] = ID = uuid.uuid1()
+                renewed += 1
+            seen.add(ID)
+    return renewed
+
+
+def load_tables(event_cls, tables: dict) -> Any:
+    """Creates an event from the mapping written by event_tables."""
+    version = tables.get('version', TABLES_VERSION)
+    if version > TABLES_VERSION:
+        raise ValueError(f'Event tables version {version} is newer than {TABLES_VERSION}')
+    return build_event(event_cls, tables['event'], tables)
@@ -0,0 +1,193 @@
+""" timing_bridge.py - passes a Farmtek console through to Jumper Judge Dashboard.
+
+JJD reads a Farmtek from a serial port, which is what the C4HCable cables
+are for. A C4HJJDBridge does the same job in software: it reads the console
+on one port and writes each packet as JJD expects it to a second port, eg.
+one end of a null modem or virtual serial pair that JJD is connected to.
+
+JJD's Farmtek reader wants the packets a genuine Farmtek cable passes
+through, see C4HCable/cables_details.md:
+
+    normal mode, 1200 baud: '  11.53 (M)' then 'Round 1 Faults    0.00'
+    continuous mode, 9600 baud: ' 14.409', ASCII Fixed Pt
+
+The bridge writes each packet whole as soon as it is framed, so noise on
+the line and partial packets never reach JJD. A frame is written from the
+reader's callback, without going through a queue, and only waits on the
+port if the port's buffer is full.
+
+To run a bridge from the command line:
+    python -m C4HTiming.timing_bridge /dev/ttyUSB0 /dev/pts/3
+"""
+
+import asyncio
+import os
+import time
+
+from typing import Any
+
+from .timing_farmtek import (BAUD_RATES, CONTINUOUS, NORMAL, C4HFarmtekError,
+    C4HFarmtekReader, C4HTimerEvent, configure_port)
+
+try:
+    import termios
+except ImportError: # Windows
+    termios = None
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+
+def jjd_frame(timer_event: C4HTimerEvent) -> bytes:
+    """Returns the bytes JJD reads for timer_event."""
+    if timer_event.kind == 'running':
+        return f'{timer_event.value:7.3f}'.encode('ascii')
+    if timer_event.kind == 'time':
+        return f'{timer_event.value:7.2f} ({timer_event.flag or "M"})'.encode('ascii')
+    if timer_event.kind == 'faults':
+        return f'Round {timer_event.round_num or 1} Faults {timer_event.value:7.2f}'.encode('ascii')
+    return b''
+
+
+class C4HJJDBridge(object):
+    '''Reads a Farmtek console and writes its packets to JJD.
+
+    Example:
+        async with C4HJJDBridge('/dev/ttyUSB0', 'COM7') as bridge:
+            await bridge.wait()
+
+    Attributes:
+        in_port (str): the console's serial port
+        out_port (str): the port JJD reads
+        mode (str): NORMAL or CONTINUOUS, the console and JJD's
+        recorder (C4HRecorder): records the console, see timing_record.py
+        frames (int): frames written
+        bytes_written (int):
+    '''
+
+    def __init__(self, in_port: str, out_port: str, mode: str = NORMAL,
+            recorder: Any = None):
+        self.in_port = in_port
+        self.out_port = out_port
+        self.mode = mode
+        self.recorder = recorder
+        self.frames = 0
+        self.bytes_written = 0
+        self.reader = None
+        self._loop = None
+        self._fd = None
+        self._serial = None
+        self._pending = bytearray() # written when the port has room
+        self._ended = None
+
+    async def open(self) -> None:
+        """Opens JJD's port then starts reading the console.
+
+        Raises:
+            C4HFarmtekError: if either port can't be opened
+        """
+        self._loop = asyncio.get_running_loop()
+        self._ended = self._loop.create_future()
+        try:
+            if termios is not None:
+                self._fd = os.open(self.out_port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+                if os.isatty(self._fd):
+                    configure_port(self._fd, BAUD_RATES[self.mode])
+            elif serial is not None:
+                self._serial = serial.Serial(
+                    self.out_port, BAUD_RATES[self.mode], write_timeout=0.5
+                    )
+            else:
+                raise C4HFarmtekError('pyserial is needed to write a serial port on this platform')
+        except (OSError, ValueError) as e:
+            self._close_out()
+            raise C4HFarmtekError(f"Can't open {self.out_port}: {e}") from e
+        # the bridge stands in for the reader's queue
+        self.reader = C4HFarmtekReader(self.in_port, self.mode, queue=self, recorder=self.recorder)
+        try:
+            await self.reader.open()
+        except C4HFarmtekError:
+            self._close_out()
+            raise
+
+    def put_nowait(self, timer_event: C4HTimerEvent) -> None:
+        """Writes timer_event to JJD, None when the console has gone."""
+        if timer_event is None:
+            if not self._ended.done():
+                self._ended.set_result(None)
+            return
+        frame = jjd_frame(timer_event)
+        if not frame:
+            return
+        self.frames += 1
+        if self._serial is not None:
+            self.bytes_written += self._serial.write(frame)
+        elif self._fd is not None:
+            self._pending += frame
+            self._write()
+
+    def _write(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            written = os.write(self._fd, self._pending)
+        except BlockingIOError:
+            written = 0
+        self.bytes_written += written
+        del self._pending[:written]
+        if self._pending:
+            self._loop.add_writer(self._fd, self._write)
+        else:
+            self._loop.remove_writer(self._fd)
+
+    async def wait(self) -> None:
+        """Waits until the console goes away or the bridge is closed."""
+        await self._ended
+
+    def _close_out(self) -> None:
+        if self._fd is not None:
+            self._loop.remove_writer(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    def close(self) -> None:
+        """Stops reading the console and closes both ports."""
+        if self.reader is not None:
+            self.reader.close()
+        self._close_out()
+        if self._ended is not None and not self._ended.done():
+            self._ended.set_result(None)
+
+    async def __aenter__(self) -> 'C4HJJDBridge':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Passes a Farmtek console through to JJD until Ctrl-C')
+    parser.add_argument('console', help="the console's port")
+    parser.add_argument('jjd', help='the port JJD reads')
+    parser.add_argument('--continuous', action='store_true', help='continuous mode')
+    args = parser.parse_args()
+
+    async def bridge():
+        mode = CONTINUOUS if args.continuous else NORMAL
+        async with C4HJJDBridge(args.console, args.jjd, mode) as bridge:
+            started = time.monotonic()
+            await bridge.wait()
+            print(f'{bridge.frames} frames in {time.monotonic() - started:.0f} s')
+
+    try:
+        asyncio.run(bridge())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,456 @@
+""" timing_drivers.py - one interface to every timing device.
+
+Every device is driven through a C4HTimingDriver:
+
+    await driver.open()
+    async for timer_event in driver: ...
+    driver.health()
+    driver.close()
+
+The events are C4HTimerEvents, see timing_farmtek.py. The drivers are:
+
+    C4HFarmtekDriver: a Farmtek Polaris console on a serial port
+    C4HTimyDriver: an ALGE Timy through its USB driver or serial port
+    C4HReplayDriver: raw bytes recorded from either, replayed through the
+        same framing as the real device
+
+The Farmtek and Timy drivers take a C4HRecorder to record the session, see
+timing_record.py. Every driver fits its device's clock to the host's from
+the running times and impulses it streams, see timing_sync.py.
+
+A C4HTimingRegistry binds each arena in an event to one driver and runs them
+all on one asyncio loop, a task per arena, so a slow or failed device only
+holds up its own arena. C4HTimingThread runs that loop on a thread of its
+own for the tk GUI, which picks the events up off its queue.
+"""
+
+import asyncio
+import codecs
+import queue
+import threading
+import time
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .timing_farmtek import NORMAL, C4HFarmtekFramer, C4HFarmtekReader, C4HTimerEvent
+from .timing_timy import (C4HTimyFramer, C4HTimyReader, C4HTimySerial, C4HTimyUSB,
+    C4HTimyBackend)
+from .timing_record import C4HRecorder, is_log, read_log
+from .timing_sync import C4HClockSync
+
+# driver states
+CLOSED = 'closed'
+OPEN = 'open'
+ENDED = 'ended' # the device went away or the replay finished
+FAILED = 'failed'
+
+CLOCK_KINDS = ('running', 'impulse') # events whose value is read off the device clock
+
+
+class C4HDriverHealth(NamedTuple):
+    '''How a driver is going.
+
+    Attributes:
+        state (str): CLOSED, OPEN, ENDED or FAILED
+        events (int): events streamed
+        last_event (float): time.monotonic() of the last event, None before one
+        dropped (int): events lost because they weren't read quickly enough
+        error (str): why it FAILED
+        skew (float): how much faster the host clock runs than the device's
+    '''
+    state: str
+    events: int = 0
+    last_event: Optional[float] = None
+    dropped: int = 0
+    error: str = ''
+    skew: float = 0.0
+
+
+class C4HTimingDriver(object):
+    '''A timing device.
+
+    Subclasses implement _open, _read and _close, this class keeps count
+    for health.
+
+    Attributes:
+        name (str): what the device is eg. the port
+        latency (C4HLatency): marks the 'parsed' stage of each event as it is
+            streamed, see C4HScore/score_latency.py
+        clock (C4HClockSync): the device clock fitted to time.monotonic()
+    '''
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.latency = None
+        self.clock = C4HClockSync()
+        self._state = CLOSED
+        self._events = 0
+        self._last_event = None
+        self._error = ''
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.name!r})'
+
+    async def open(self) -> None:
+        """Opens the device.
+
+        Raises:
+            OSError: if it can't be opened, the driver is then FAILED
+        """
+        try:
+            await self._open()
+        except Exception as e:
+            self.failed(e)
+            raise
+        self._state = OPEN
+        self._error = ''
+
+    def __aiter__(self) -> AsyncIterator[C4HTimerEvent]:
+        return self._stream()
+
+    async def _stream(self) -> AsyncIterator[C4HTimerEvent]:
+        async for timer_event in self._read():
+            self._events += 1
+            self._last_event = timer_event.received
+            if timer_event.kind in CLOCK_KINDS:
+                self.clock.add(timer_event.value, timer_event.received)
+            if self.latency is not None:
+                self.latency.mark('parsed', timer_event.received)
+            yield timer_event
+        if self._state == OPEN:
+            self._state = ENDED
+
+    def failed(self, error: Exception) -> None:
+        """Marks the driver FAILED because of error."""
+        self._state = FAILED
+        self._error = f'{type(error).__name__}: {error}'
+
+    def close(self) -> None:
+        """Closes the device, it can be opened again. A FAILED driver
+        stays FAILED so its health still says why."""
+        if self._state != CLOSED:
+            self._close()
+        if self._state != FAILED:
+            self._state = CLOSED
+
+    def health(self) -> C4HDriverHealth:
+        return C4HDriverHealth(
+            self._state, self._events, self._last_event, self._dropped(), self._error,
+            self.clock.skew
+            )
+
+    async def _open(self) -> None:
+        raise NotImplementedError
+
+    def _read(self) -> AsyncIterator[C4HTimerEvent]:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+    def _dropped(self) -> int:
+        return 0
+
+
+class C4HFarmtekDriver(C4HTimingDriver):
+    '''A Farmtek Polaris console, see timing_farmtek.py.'''
+
+    def __init__(self, port: str, mode: str = NORMAL, recorder: C4HRecorder = None):
+        super().__init__(port)
+        self.port = port
+        self.mode = mode
+        self.recorder = recorder
+        self.reader = None
+
+    async def _open(self) -> None:
+        self.reader = C4HFarmtekReader(self.port, self.mode, recorder=self.recorder)
+        await self.reader.open()
+
+    async def _read(self) -> AsyncIterator[C4HTimerEvent]:
+        reader_queue = self.reader.queue
+        while True:
+            timer_event = await reader_queue.get()
+            if timer_event is None:
+                return
+            yield timer_event
+
+    def _close(self) -> None:
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class C4HTimyDriver(C4HTimingDriver):
+    '''An ALGE Timy, see timing_timy.py.
+
+    Attributes:
+        backend (C4HTimyBackend): where the lines come from, the USB driver
+            if None
+    '''
+
+    def __init__(self, backend: C4HTimyBackend = None, name: str = 'Timy',
+            recorder: C4HRecorder = None):
+        super().__init__(name)
+        self.backend = backend
+        self.recorder = recorder
+        self.reader = None
+        self._dropped_before = 0
+
+    async def _open(self) -> None:
+        backend = self.backend if self.backend is not None else C4HTimyUSB()
+        self.reader = C4HTimyReader(backend, recorder=self.recorder)
+        self.reader.open()
+
+    def _read(self) -> AsyncIterator[C4HTimerEvent]:
+        return self.reader.__aiter__()
+
+    def _close(self) -> None:
+        if self.reader is not None:
+            self._dropped_before = self.reader.ring.dropped
+            self.reader.close()
+            self.reader = None
+
+    def _dropped(self) -> int:
+        return self.reader.ring.dropped if self.reader else self._dropped_before
+
+
+class C4HReplayDriver(C4HTimingDriver):
+    '''Replays raw bytes from a timing device.
+
+    Attributes:
+        chunks (list[tuple[float, bytes]]): (seconds from the start, bytes)
+        device (str): 'farmtek' or 'timy', how the bytes are framed
+        mode (str): the Farmtek mode
+        speed (float): 2 replays twice as fast, 0 as fast as possible
+    '''
+
+    def __init__(self, chunks: Iterable[Tuple[float, bytes]], device: str = 'farmtek',
+            mode: str = NORMAL, speed: float = 1.0, name: str = 'replay'):
+        if device not in ('farmtek', 'timy'):
+            raise ValueError(f'Unknown device {device!r}')
+        super().__init__(name)
+        self.chunks = list(chunks)
+        self.device = device
+        self.mode = mode
+        self.speed = speed
+
+    @classmethod
+    def from_log(cls, fn, speed: float = 1.0) -> 'C4HReplayDriver':
+        """Replays a timing log written by a C4HRecorder."""
+        log = read_log(fn)
+        return cls(log.chunks, log.device, log.mode or NORMAL, speed, str(fn))
+
+    @classmethod
+    def from_file(cls, fn, device: str = 'farmtek', mode: str = NORMAL,
+            speed: float = 1.0) -> 'C4HReplayDriver':
+        """Replays a timing log or a text recording.
+
+        A text recording has a line per chunk of bytes with the seconds from
+        the start and a tab in front of it. The bytes are written with
+        python escapes eg. '\\r'.
+        """
+        if is_log(fn):
+            return cls.from_log(fn, speed)
+        chunks = []
+        with open(fn, 'r') as in_file:
+            for line in in_file:
+                when, _, data = line.rstrip('\r\n').partition('\t')
+                data = codecs.escape_decode(data.encode('latin-1'))[0]
+                chunks.append((float(when), data))
+        return cls(chunks, device, mode, speed, str(fn))
+
+    async def _open(self) -> None:
+        pass
+
+    async def _read(self) -> AsyncIterator[C4HTimerEvent]:
+        framer = C4HFarmtekFramer(self.mode) if self.device == 'farmtek' else C4HTimyFramer()
+        start = time.monotonic()
+        for offset, data in self.chunks:
+            if self.speed:
+                delay = start + offset/self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0) # let the other arenas run
+            for timer_event in framer.feed(data):
+                yield timer_event
+
+
+# the drivers new_driver can make
+DRIVERS = {
+    'farmtek': C4HFarmtekDriver,
+    'timy': C4HTimyDriver,
+    'replay': C4HReplayDriver.from_file,
+}
+
+
+def new_driver(kind: str, *args, **kwargs) -> C4HTimingDriver:
+    """Returns a driver of kind eg. new_driver('farmtek', '/dev/ttyUSB0').
+
+    new_driver('timy', port) reads a Timy through its serial port rather than
+    the USB driver.
+    """
+    if kind == 'timy' and (args or 'port' in kwargs):
+        return C4HTimyDriver(C4HTimySerial(*args, **kwargs), 'Timy')
+    try:
+        make = DRIVERS[kind]
+    except KeyError:
+        raise ValueError(f'Unknown timing device {kind!r}') from None
+    return make(*args, **kwargs)
+
+
+class C4HTimingRegistry(object):
+    '''The timing device for each arena.
+
+    Example:
+        registry = C4HTimingRegistry()
+        registry.bind(arena, new_driver('farmtek', '/dev/ttyUSB0'))
+        await registry.run(lambda arena, timer_event: ...)
+
+    Attributes:
+        latency (C4HLatency): given to every driver bound
+    '''
+
+    def __init__(self, latency: Any = None):
+        self.latency = latency
+        self._bindings: Dict[Any, Tuple[Any, C4HTimingDriver]] = {} # arena ID: (arena, driver)
+
+    def __len__(self) -> int:
+        return len(self._bindings)
+
+    def bind(self, arena: Any, driver: C4HTimingDriver) -> None:
+        """Makes driver the timing device for arena, replacing any it had.
+
+        Raises:
+            ValueError: if driver is already bound to another arena
+        """
+        for other, bound in self._bindings.values():
+            if bound is driver and other is not arena:
+                raise ValueError(f'{driver!r} is already the timer for arena {other.id}')
+        old = self._bindings.get(arena.ID)
+        if old is not None and old[1] is not driver:
+            old[1].close()
+        if self.latency is not None:
+            driver.latency = self.latency
+        self._bindings[arena.ID] = (arena, driver)
+
+    def unbind(self, arena: Any) -> Optional[C4HTimingDriver]:
+        """Closes and returns the driver for arena, None if it had none."""
+        arena_driver = self._bindings.pop(arena.ID, None)
+        if arena_driver is None:
+            return None
+        arena_driver[1].close()
+        return arena_driver[1]
+
+    def driver_for(self, arena: Any) -> Optional[C4HTimingDriver]:
+        arena_driver = self._bindings.get(arena.ID)
+        return arena_driver[1] if arena_driver else None
+
+    def bindings(self) -> List[Tuple[Any, C4HTimingDriver]]:
+        """Returns (arena, driver) for every bound arena."""
+        return list(self._bindings.values())
+
+    def health(self) -> Dict[str, C4HDriverHealth]:
+        """Returns the health of each arena's driver keyed on the arena id."""
+        return {arena.id: driver.health() for arena, driver in self._bindings.values()}
+
+    async def run(self, handler: Callable[[Any, C4HTimerEvent], None]) -> None:
+        """Opens every driver and calls handler(arena, timer_event) for each
+        event until they have all ended or failed, or run is cancelled.
+
+        A driver that fails is marked FAILED and the rest carry on.
+        """
+        tasks = [
+            asyncio.create_task(self._run_arena(arena, driver, handler))
+            for arena, driver in self._bindings.values()
+            ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for _, driver in self._bindings.values():
+                driver.close()
+
+    @staticmethod
+    async def _run_arena(arena: Any, driver: C4HTimingDriver,
+            handler: Callable[[Any, C4HTimerEvent], None]) -> None:
+        try:
+            await driver.open()
+            async for timer_event in driver:
+                handler(arena, timer_event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            driver.failed(e)
+
+
+class C4HTimingThread(object):
+    '''Runs a C4HTimingRegistry on its own thread so the GUI never waits
+    for a timer.
+
+    The events are put on results as (arena, timer_event) and notify, if
+    given, is called from the timing thread after each one. The GUI thread
+    takes them with drain and applies them to the event, tk mustn't be
+    called from notify so a tk GUI polls drain with after instead.
+    '''
+
+    def __init__(self, registry: C4HTimingRegistry, notify: Callable[[], None] = None):
+        self.registry = registry
+        self.notify = notify
+        self.results = queue.SimpleQueue()
+        self._loop = None
+        self._task = None
+        self._thread = None
+        self._started = threading.Event()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='timing', daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._task = self._loop.create_task(self.registry.run(self._deliver))
+            self._loop.call_soon(self._started.set)
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._started.set()
+            self._loop.close()
+
+    def _deliver(self, arena: Any, timer_event: C4HTimerEvent) -> None:
+        self.results.put((arena, timer_event))
+        if self.notify is not None:
+            self.notify()
+
+    def drain(self) -> List[Tuple[Any, C4HTimerEvent]]:
+        """Returns the (arena, timer_event)s delivered since the last drain."""
+        results = []
+        try:
+            while True:
+                results.append(self.results.get_nowait())
+        except queue.Empty:
+            return results
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout: float = 2) -> None:
+        """Cancels the registry and closes its drivers.
+
+        Args:
+            timeout (float): how long to wait for the drivers to close, 0
+                to return straight away and leave running True until they
+                have, eg. on a GUI thread
+        """
+        if self.running:
+            try:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+            except RuntimeError:
+                pass # the loop has just finished
+            if timeout:
+                self._thread.join(timeout)
@@ -0,0 +1,291 @@
+""" timing_farmtek.py - reads a Farmtek Polaris console over its serial port.
+
+The console sends in one of two modes, see C4HCable/cables_details.md:
+
+    normal mode, 1200 baud: the time as it stops, 11 characters with the
+        flag eg. '  11.53 (M)', then the round and its faults eg.
+        'Round 1 Faults    0.00'
+    continuous mode, 9600 baud: the running time, 7 characters eg. ' 14.409'
+
+Neither has an end of line so packets are framed by what they look like.
+C4HFarmtekFramer is fed the bytes as they arrive, however they are split,
+and returns a C4HTimerEvent for every complete packet.
+
+C4HFarmtekReader puts those events on an asyncio.Queue. On POSIX the port is
+read from the event loop as soon as it is readable, so an event is on the
+queue within a loop iteration of its last byte arriving. Elsewhere the port
+is read with pyserial on a thread. consume_timer applies the events on the
+queue to the round being jumped through C4HEvent.timer_event.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+
+from typing import Any, Callable, List, NamedTuple, Optional
+
+try:
+    import termios
+except ImportError: # Windows
+    termios = None
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+NORMAL = 'normal'
+CONTINUOUS = 'continuous'
+
+BAUD_RATES = {NORMAL: 1200, CONTINUOUS: 9600}
+
+# packets in each mode, a packet is complete when its pattern matches
+PACKETS = {
+    NORMAL: re.compile(
+        rb'(?P<time>\d+\.\d+) \((?P<flag>[A-Z])\)'
+        rb'|Round *(?P<round>\d+) *Faults *(?P<faults>\d+\.\d\d)'
+        ),
+    CONTINUOUS: re.compile(rb'(?P<running>\d+\.\d{3})'),
+    }
+# bytes kept while waiting for the rest of a packet, more than the longest
+MAX_PARTIAL = 32
+
+READ_SIZE = 4096
+
+
+class C4HFarmtekError(OSError):
+    '''Raised when the console's port can't be opened.'''
+
+
+class C4HTimerEvent(NamedTuple):
+    '''A packet from a timing console.
+
+    Attributes:
+        kind (str): 'running' for a running time, 'time' for the time a
+            round stopped at or 'faults' for the faults in a round
+        value (float): the time in seconds or the faults
+        round_num (int): the console round number of 'faults', otherwise None
+        flag (str): the flag sent with 'time' eg. 'M'
+        received (float): time.monotonic() when its last byte was read
+    '''
+    kind: str
+    value: float
+    round_num: Optional[int] = None
+    flag: str = ''
+    received: float = 0.0
+
+
+class C4HFarmtekFramer(object):
+    '''Splits the bytes from a Farmtek console into C4HTimerEvents.
+
+    Bytes that aren't part of a packet, eg. noise while the cable is plugged
+    in, are skipped.
+
+    Attributes:
+        mode (str): NORMAL or CONTINUOUS
+    '''
+
+    def __init__(self, mode: str = NORMAL):
+        if mode not in PACKETS:
+            raise ValueError(f'Unknown Farmtek mode {mode!r}')
+        self.mode = mode
+        self._pattern = PACKETS[mode]
+        self._partial = b''
+
+    def feed(self, data: bytes, received: float = None) -> List[C4HTimerEvent]:
+        """Returns the events completed by data.
+
+        Args:
+            data (bytes): the next bytes from the console
+            received (float): when data was read, time.monotonic() if None
+        """
+        if received is None:
+            received = time.monotonic()
+        buffer = self._partial + data
+        events = []
+        end = 0
+        for match in self._pattern.finditer(buffer):
+            end = match.end()
+            groups = match.groupdict()
+            if groups.get('running') is not None:
+                events.append(C4HTimerEvent(
+                    'running', float(groups['running']), received=received
+                    ))
+            elif groups.get('time') is not None:
+                events.append(C4HTimerEvent(
+                    'time', float(groups['time']), flag=groups['flag'].decode(),
+                    received=received
+                    ))
+            else:
+                events.append(C4HTimerEvent(
+                    'faults', float(groups['faults']), int(groups['round']),
+                    received=received
+                    ))
+        self._partial = buffer[max(end, len(buffer) - MAX_PARTIAL):]
+        return events
+
+
+def configure_port(fd: int, baud: int) -> None:
+    """Sets the POSIX serial port fd to raw 8N1 at baud."""
+    speed = getattr(termios, f'B{baud}')
+    iflag, oflag, cflag, lflag, _, _, cc = termios.tcgetattr(fd)
+    iflag = 0
+    oflag = 0
+    lflag = 0
+    cflag = (cflag & ~(termios.CSIZE | termios.PARENB | termios.CSTOPB)
+        | termios.CS8 | termios.CREAD | termios.CLOCAL)
+    cc[termios.VMIN] = 1
+    cc[termios.VTIME] = 0
+    termios.tcsetattr(fd, termios.TCSANOW, [iflag, oflag, cflag, lflag, speed, speed, cc])
+
+
+class C4HFarmtekReader(object):
+    '''Reads a Farmtek console and puts its events on a queue.
+
+    Example:
+        reader = C4HFarmtekReader('/dev/ttyUSB0')
+        await reader.open()
+        event = await reader.queue.get()
+
+    Attributes:
+        port (str): the serial port eg. '/dev/ttyUSB0' or 'COM3'
+        mode (str): NORMAL or CONTINUOUS, sets the baud rate
+        queue (asyncio.Queue): the C4HTimerEvents read, then None once the
+            port is closed or the console goes away
+        recorder (C4HRecorder): records the bytes read, see timing_record.py
+    '''
+
+    def __init__(self, port: str, mode: str = NORMAL,
+            queue: asyncio.Queue = None, recorder: Any = None):
+        self.port = port
+        self.mode = mode
+        self.recorder = recorder
+        self.framer = C4HFarmtekFramer(mode)
+        self.queue = queue if queue is not None else asyncio.Queue()
+        self.bytes_read = 0
+        self._loop = None
+        self._fd = None
+        self._serial = None
+        self._thread = None
+        self._ended = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._fd is not None or self._serial is not None
+
+    async def open(self) -> None:
+        """Opens the port and starts reading it.
+
+        Raises:
+            C4HFarmtekError: if the port can't be opened
+        """
+        self._loop = asyncio.get_running_loop()
+        try:
+            if termios is not None:
+                self._open_posix()
+            else:
+                self._open_pyserial()
+        except (OSError, ValueError) as e:
+            raise C4HFarmtekError(f"Can't open {self.port}: {e}") from e
+
+    def _open_posix(self) -> None:
+        fd = os.open(self.port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            if os.isatty(fd):
+                configure_port(fd, BAUD_RATES[self.mode])
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._loop.add_reader(fd, self._on_readable)
+
+    def _open_pyserial(self) -> None:
+        if serial is None:
+            raise C4HFarmtekError('pyserial is needed to read a serial port on this platform')
+        self._serial = serial.Serial(self.port, BAUD_RATES[self.mode], timeout=0.5)
+        self._thread = threading.Thread(
+            target=self._read_thread, name=f'farmtek {self.port}', daemon=True
+            )
+        self._thread.start()
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            # the console was unplugged or the other end of a pty closed
+            data = b''
+        if not data:
+            self._loop.remove_reader(self._fd)
+            self._finished()
+            return
+        self._received(data, time.monotonic())
+
+    def _read_thread(self) -> None:
+        port = self._serial
+        while port.is_open:
+            try:
+                data = port.read(max(1, port.in_waiting))
+            except (OSError, TypeError, AttributeError):
+                break # closed under us
+            if data:
+                received = time.monotonic()
+                self._loop.call_soon_threadsafe(self._received, data, received)
+        self._loop.call_soon_threadsafe(self._finished)
+
+    def _received(self, data: bytes, received: float) -> None:
+        self.bytes_read += len(data)
+        if self.recorder is not None:
+            self.recorder.write(data, received)
+        for event in self.framer.feed(data, received):
+            self.queue.put_nowait(event)
+
+    def _finished(self) -> None:
+        if not self._ended:
+            self._ended = True
+            self.queue.put_nowait(None)
+
+    def close(self) -> None:
+        """Stops reading and closes the port."""
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._finished()
+        if self._serial is not None:
+            self._serial.close()
+            self._thread.join(1)
+            self._serial = None
+
+    async def __aenter__(self) -> 'C4HFarmtekReader':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def consume_timer(event: Any, queue: asyncio.Queue,
+        current_round: Callable[[], Any]) -> None:
+    """Applies the timer events on queue to the round being jumped.
+
+    Runs until the queue gives None or it is cancelled.
+
+    Args:
+        event (C4HEvent):
+        queue (asyncio.Queue): C4HTimerEvents eg. C4HFarmtekReader.queue
+        current_round (callable): returns the C4HRound being jumped, or None
+            while there isn't one
+    """
+    while True:
+        timer_event = await queue.get()
+        if timer_event is None:
+            queue.task_done()
+            return
+        round_ = current_round()
+        if round_ is not None:
+            event.timer_event(round_, timer_event)
+        queue.task_done()
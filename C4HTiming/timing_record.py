@@ -0,0 +1,210 @@
+""" timing_record.py - records the raw bytes from a timing device to replay later.
+
+A C4HRecorder is given to a Farmtek or Timy reader and writes every chunk of
+bytes the device sends, with when it arrived, to a log file. Replaying the
+log through C4HReplayDriver (see timing_drivers.py) gives the same events
+as the session did, at the speed it happened, faster or as fast as
+possible, so a show day can be reproduced for debugging, as a regression
+test for the framing and as a benchmark.
+
+File layout, all integers little endian:
+    magic b'C4HT', version (uint16)
+    the device and mode, each a uint8 length and ascii
+    the wall clock time recording started (float64 unix time)
+    chunks, each the microseconds since the chunk before (uint32), the
+        length (uint16) and the bytes. A gap longer than a uint32 of
+        microseconds is written as empty chunks.
+
+To record a Farmtek console from the command line:
+    python -m C4HTiming.timing_record /dev/ttyUSB0 session.c4ht
+"""
+
+import struct
+import time
+
+from typing import BinaryIO, Iterator, List, NamedTuple, Tuple
+
+MAGIC = b'C4HT'
+VERSION = 1
+LOG_SUFFIX = '.c4ht'
+
+_HEADER = struct.Struct('<4sH')
+_STARTED = struct.Struct('<d')
+_CHUNK = struct.Struct('<IH')
+MAX_GAP = 0xFFFFFFFF # microseconds
+MAX_CHUNK = 0xFFFF # bytes
+
+FLUSH_SIZE = 4096 # bytes buffered before they are written to the file
+
+
+class C4HLogError(ValueError):
+    '''Raised when a timing log can't be read.'''
+
+
+class C4HTimingLog(NamedTuple):
+    '''A recorded session.
+
+    Attributes:
+        device (str): 'farmtek' or 'timy'
+        mode (str): the Farmtek mode, '' for a Timy
+        started (float): unix time the recording started
+        chunks (list[tuple[float, bytes]]): (seconds from the first chunk, bytes)
+    '''
+    device: str
+    mode: str
+    started: float
+    chunks: List[Tuple[float, bytes]]
+
+    @property
+    def size(self) -> int:
+        """The number of bytes recorded."""
+        return sum(len(data) for _, data in self.chunks)
+
+
+class C4HRecorder(object):
+    '''Writes the bytes from one timing device to a log file.
+
+    Only the thread reading the device should call write.
+
+    Attributes:
+        fn (str): the log file
+        device (str): 'farmtek' or 'timy'
+        mode (str): the Farmtek mode
+        chunks (int): chunks written
+    '''
+
+    def __init__(self, fn, device: str, mode: str = ''):
+        self.fn = fn
+        self.device = device
+        self.mode = mode
+        self.chunks = 0
+        self._file = open(fn, 'wb')
+        self._buffer = bytearray(_HEADER.pack(MAGIC, VERSION))
+        for name in (device, mode):
+            data = name.encode('ascii')
+            self._buffer += bytes([len(data)]) + data
+        self._buffer += _STARTED.pack(time.time())
+        self._last = None
+
+    def write(self, data: bytes, received: float) -> None:
+        """Records data, read from the device at time.monotonic() received."""
+        if self._file is None:
+            return
+        last = received if self._last is None else self._last
+        gap = max(0, round((received - last)*1_000_000))
+        self._last = received
+        while gap > MAX_GAP:
+            self._buffer += _CHUNK.pack(MAX_GAP, 0)
+            gap -= MAX_GAP
+        for i in range(0, max(len(data), 1), MAX_CHUNK):
+            chunk = data[i:i + MAX_CHUNK]
+            self._buffer += _CHUNK.pack(gap, len(chunk))
+            self._buffer += chunk
+            gap = 0
+        self.chunks += 1
+        if len(self._buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._file is not None and self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer.clear()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'C4HRecorder':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def is_log(fn) -> bool:
+    """True if fn is a timing log."""
+    with open(fn, 'rb') as in_file:
+        return in_file.read(len(MAGIC)) == MAGIC
+
+
+def read_log(fn) -> C4HTimingLog:
+    """Reads a timing log.
+
+    Raises:
+        C4HLogError: if fn isn't a timing log or is newer than this version
+    """
+    with open(fn, 'rb') as in_file:
+        data = in_file.read()
+    if len(data) < _HEADER.size or data[:len(MAGIC)] != MAGIC:
+        raise C4HLogError(f'{fn} is not a timing log')
+    _, version = _HEADER.unpack_from(data)
+    if version > VERSION:
+        raise C4HLogError(f'Timing log version {version} is newer than {VERSION}')
+
+    pos = _HEADER.size
+    names = []
+    for _ in range(2):
+        length = data[pos]
+        names.append(data[pos + 1:pos + 1 + length].decode('ascii'))
+        pos += 1 + length
+    started, = _STARTED.unpack_from(data, pos)
+    pos += _STARTED.size
+
+    chunks = []
+    offset = 0
+    end = len(data)
+    while pos + _CHUNK.size <= end:
+        gap, length = _CHUNK.unpack_from(data, pos)
+        pos += _CHUNK.size
+        offset += gap
+        if length:
+            # a chunk cut off by a crash is dropped
+            if pos + length > end:
+                break
+            chunks.append((offset/1_000_000, data[pos:pos + length]))
+            pos += length
+    return C4HTimingLog(names[0], names[1], started, chunks)
+
+
+def log_events(log: C4HTimingLog) -> list:
+    """Returns the C4HTimerEvents in log, framed straight from the chunks.
+
+    The received time of each event is its offset in the log, so the events
+    of a log are the same every time it is read.
+    """
+    from .timing_farmtek import C4HFarmtekFramer
+    from .timing_timy import C4HTimyFramer
+
+    framer = C4HTimyFramer() if log.device == 'timy' else C4HFarmtekFramer(log.mode)
+    events = []
+    for offset, data in log.chunks:
+        events += framer.feed(data, offset)
+    return events
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+
+    from .timing_farmtek import CONTINUOUS, NORMAL, C4HFarmtekReader
+
+    parser = argparse.ArgumentParser(description='Records a Farmtek console until Ctrl-C')
+    parser.add_argument('port')
+    parser.add_argument('log')
+    parser.add_argument('--continuous', action='store_true', help='continuous mode')
+    args = parser.parse_args()
+    mode = CONTINUOUS if args.continuous else NORMAL
+
+    async def record():
+        with C4HRecorder(args.log, 'farmtek', mode) as recorder:
+            async with C4HFarmtekReader(args.port, mode, recorder=recorder) as reader:
+                while (timer_event := await reader.queue.get()) is not None:
+                    print(timer_event)
+
+    try:
+        asyncio.run(record())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,126 @@
+""" timing_sync.py - maps a timing device's clock onto the host's.
+
+Running times from a Farmtek in continuous mode and the impulses from a
+Timy are read off the device's own oscillator, which runs a little fast or
+slow against the host and drifts over a show day. Each of those events is
+also stamped with the time.monotonic() it arrived, so every one is a sample
+of
+
+    host = offset + (1 + skew)*device + delay
+
+where delay is how long the bytes took to arrive. C4HClockSync fits offset
+and skew to the samples by least squares as they come in. The sums are
+exponentially weighted so old samples fade out as the clocks drift, which
+keeps the cost of a sample O(1) and the memory a handful of floats.
+
+When the device clock jumps back, a new Farmtek round starting from 0 or a
+Timy passing midnight, the means are started again so the offset is fitted
+from the new samples only, but the sums of squares about the means are
+kept. The skew is then fitted over every stretch of samples at once, each
+counting for as much time as it covers, so the few samples just after a
+jump barely move the skew found so far.
+"""
+
+import math
+import time
+
+from datetime import datetime, timezone
+from typing import Optional
+
+HALF_LIFE = 2000 # samples for a sample's weight to halve
+MIN_SAMPLES = 8 # before outliers are rejected
+OUTLIER = 6.0 # residuals this many rms from the fit are rejected
+MIN_RESIDUAL = 0.005 # seconds, so a very good fit doesn't reject everything
+RESET = 1.0 # seconds the device clock has to jump back to start again
+
+
+class C4HClockSync(object):
+    '''Estimates a device clock's offset and skew from the host clock.
+
+    Attributes:
+        samples (int): samples fitted since the device clock last jumped back
+        rejected (int): samples rejected as outliers
+        resets (int): times the device clock has jumped back
+    '''
+
+    def __init__(self, half_life: float = HALF_LIFE):
+        self.decay = 0.5**(1/half_life)
+        self.samples = 0
+        self.rejected = 0
+        self.resets = 0
+        self._last_device = None
+        # weighted sums of squares about the means of each stretch of
+        # samples, kept when the device clock jumps back
+        self._sxx = 0.0
+        self._sxy = 0.0
+        self._residual = 0.0 # weighted mean square residual
+        self._clear()
+        # monotonic to unix time, for wall_time
+        self._unix_offset = time.time() - time.monotonic()
+
+    def _clear(self) -> None:
+        self.samples = 0
+        self._weight = 0.0
+        self._mean_device = 0.0
+        self._mean_host = 0.0
+
+    def add(self, device: float, host: float) -> bool:
+        """Fits the sample that device time was read at host time.monotonic().
+
+        Returns:
+            bool: False if the sample was rejected as an outlier
+        """
+        if self._last_device is not None and device < self._last_device - RESET:
+            self.resets += 1
+            self._clear()
+        self._last_device = device
+
+        if self.samples >= MIN_SAMPLES:
+            error = host - self.host_time(device)
+            limit = max(OUTLIER*math.sqrt(self._residual), MIN_RESIDUAL)
+            if abs(error) > limit:
+                self.rejected += 1
+                return False
+            decay = self.decay
+            self._residual = decay*self._residual + (1 - decay)*error*error
+
+        decay = self.decay
+        self._weight = decay*self._weight + 1
+        share = 1/self._weight
+        dx = device - self._mean_device
+        dy = host - self._mean_host
+        self._mean_device += share*dx
+        self._mean_host += share*dy
+        self._sxx = decay*self._sxx + dx*(device - self._mean_device)
+        self._sxy = decay*self._sxy + dx*(host - self._mean_host)
+        self.samples += 1
+        return True
+
+    @property
+    def skew(self) -> float:
+        """How much faster the host clock runs, eg. 50e-6 is 50 ppm."""
+        if self._sxx <= 0:
+            return 0.0
+        return self._sxy/self._sxx - 1
+
+    @property
+    def offset(self) -> Optional[float]:
+        """The host time when the device clock read 0, None before a sample."""
+        if not self.samples:
+            return None
+        return self._mean_host - (1 + self.skew)*self._mean_device
+
+    def host_time(self, device: float) -> Optional[float]:
+        """Returns the time.monotonic() device time was on the host clock,
+        None before a sample."""
+        if not self.samples:
+            return None
+        return self._mean_host + (1 + self.skew)*(device - self._mean_device)
+
+    def wall_time(self, device: float) -> Optional[datetime]:
+        """Returns device time as a UTC datetime like C4HEvent.update uses,
+        None before a sample."""
+        host = self.host_time(device)
+        if host is None:
+            return None
+        return datetime.fromtimestamp(host + self._unix_offset, timezone.utc)
@@ -0,0 +1,369 @@
+""" timing_timy.py - reads timing impulses from an ALGE Timy.
+
+The Timy sends a line, ending in a carriage return, for every impulse and
+every run time it works out eg.
+
+    ' 0012 C0  12:34:56.7890 00'   start impulse for start number 12
+    ' 0012 C1  12:35:08.1234 00'   finish impulse
+    ' 0012 RT     00:11.3344 00'   run time
+
+A backend reads the lines on a dedicated thread as they arrive, parses them
+into C4HTimerEvents (see timing_farmtek.py) and writes them to a
+C4HRingBuffer. C4HTimyReader reads the ring buffer as an async stream, the
+thread only has to wake the event loop when the stream is waiting for an
+event, so impulses are neither polled for nor held up by anything else the
+thread or the loop is doing.
+
+Backends:
+    C4HTimyUSB: the ALGEUSB driver's COM object, Windows only
+    C4HTimySerial: the Timy's RS232 port through pyserial
+    C4HTimyReplay: recorded Timy output, for testing without a Timy
+"""
+
+import asyncio
+import re
+import threading
+import time
+
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .timing_farmtek import C4HTimerEvent
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+BAUD_RATE = 9600
+RING_SIZE = 1024 # events buffered between the thread and the stream
+MAX_LINE = 256 # bytes kept while waiting for the end of a line
+
+_LINE = re.compile(
+    r'\s*(?P<number>\d{1,4})\s+(?P<channel>C\d{1,2}M?|RTM?)\s+'
+    r'(?:(?P<hours>\d+):)??(?:(?P<minutes>\d+):)?(?P<seconds>\d+\.\d+)'
+    r'(?:\s+\d+)?\s*',
+    re.IGNORECASE
+    )
+
+
+def parse_timy(line: str, received: float = 0.0) -> Optional[C4HTimerEvent]:
+    """Returns the event in a line from the Timy, None if it isn't one.
+
+    Impulses are 'impulse' events with the channel as the flag and the time
+    of day in seconds as the value, run times are 'time' events.
+    """
+    match = _LINE.fullmatch(line)
+    if match is None:
+        return None
+    seconds = (
+        int(match.group('hours') or 0)*3600 + int(match.group('minutes') or 0)*60
+        + float(match.group('seconds'))
+        )
+    channel = match.group('channel').upper()
+    kind = 'time' if channel.startswith('RT') else 'impulse'
+    return C4HTimerEvent(kind, seconds, flag=channel, received=received)
+
+
+class C4HTimyFramer(object):
+    '''Splits raw bytes from a Timy into C4HTimerEvents, like
+    C4HFarmtekFramer. Lines end with a carriage return.'''
+
+    def __init__(self):
+        self._partial = b''
+
+    def feed(self, data: bytes, received: float = None) -> List[C4HTimerEvent]:
+        if received is None:
+            received = time.monotonic()
+        *lines, partial = (self._partial + data).split(b'\r')
+        self._partial = partial[-MAX_LINE:]
+        events = []
+        for line in lines:
+            event = parse_timy(line.decode('ascii', 'replace').strip('\n\0'), received)
+            if event is not None:
+                events.append(event)
+        return events
+
+
+class C4HRingBuffer(object):
+    '''A fixed size buffer between one writing thread and one reader.
+
+    Neither side takes a lock. The writer only moves the write count and the
+    reader only moves the read count, each after the slot is written or read,
+    and assigning an int is atomic. When the buffer is full new values are
+    dropped and counted rather than overwriting ones not read yet.
+
+    Attributes:
+        capacity (int):
+        dropped (int): values dropped because the buffer was full
+    '''
+
+    def __init__(self, capacity: int = RING_SIZE):
+        self.capacity = capacity
+        self.dropped = 0
+        self._slots: List[Any] = [None] * capacity
+        self._written = 0
+        self._read = 0
+
+    def __len__(self) -> int:
+        return self._written - self._read
+
+    def put(self, value: Any) -> bool:
+        """Adds value, returns False if it was dropped. Writer only."""
+        written = self._written
+        if written - self._read >= self.capacity:
+            self.dropped += 1
+            return False
+        self._slots[written % self.capacity] = value
+        self._written = written + 1
+        return True
+
+    def get(self) -> Any:
+        """Removes and returns the oldest value, None if empty. Reader only."""
+        read = self._read
+        if read == self._written:
+            return None
+        i = read % self.capacity
+        value = self._slots[i]
+        self._slots[i] = None
+        self._read = read + 1
+        return value
+
+    def drain(self) -> List[Any]:
+        """Removes and returns every value there is. Reader only."""
+        values = []
+        value = self.get()
+        while value is not None:
+            values.append(value)
+            value = self.get()
+        return values
+
+
+# Backends
+# -------------------------------------------------------------
+
+class C4HTimyBackend(object):
+    '''Where the Timy lines come from.
+
+    run is called on the reader's thread and calls emit(line, received) for
+    every line until stopping is set.
+    '''
+
+    def run(self, emit: Callable[[str, float], None], stopping: threading.Event) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Unblocks run, called after stopping is set."""
+
+
+class C4HTimyReplay(C4HTimyBackend):
+    '''Replays recorded Timy output.
+
+    Attributes:
+        lines (list[tuple[float, str]]): (seconds from the start, line)
+        speed (float): 2 replays twice as fast, 0 as fast as possible
+    '''
+
+    def __init__(self, lines: Iterable[Tuple[float, str]], speed: float = 1.0):
+        self.lines = list(lines)
+        self.speed = speed
+
+    @classmethod
+    def from_file(cls, fn, speed: float = 1.0) -> 'C4HTimyReplay':
+        """Reads a recording, a line per Timy line with the seconds from the
+        start and a tab in front of it. Lines without a time follow the line
+        before straight away."""
+        lines = []
+        offset = 0.0
+        with open(fn, 'r') as in_file:
+            for line in in_file:
+                line = line.rstrip('\r\n')
+                if '\t' in line:
+                    when, line = line.split('\t', 1)
+                    offset = float(when)
+                lines.append((offset, line))
+        return cls(lines, speed)
+
+    def run(self, emit: Callable[[str, float], None], stopping: threading.Event) -> None:
+        start = time.monotonic()
+        for offset, line in self.lines:
+            if self.speed:
+                delay = start + offset/self.speed - time.monotonic()
+                if delay > 0 and stopping.wait(delay):
+                    return
+            if stopping.is_set():
+                return
+            emit(line, time.monotonic())
+
+
+class C4HTimySerial(C4HTimyBackend):
+    '''Reads the Timy's RS232 port.
+
+    Attributes:
+        port (str): eg. '/dev/ttyUSB0' or 'COM3'
+        baud (int):
+    '''
+
+    def __init__(self, port: str, baud: int = BAUD_RATE):
+        if serial is None:
+            raise RuntimeError('pyserial is needed to read a Timy through its serial port')
+        self.port = port
+        self.baud = baud
+        self._serial = serial.Serial(port, baud, timeout=0.5)
+
+    def run(self, emit: Callable[[str, float], None], stopping: threading.Event) -> None:
+        port = self._serial
+        while not stopping.is_set():
+            try:
+                line = port.read_until(b'\r')
+            except (OSError, TypeError, AttributeError):
+                return # closed under us
+            if line.endswith(b'\r'):
+                emit(line[:-1].decode('ascii', 'replace'), time.monotonic())
+
+    def close(self) -> None:
+        self._serial.close()
+
+
+class C4HTimyUSB(C4HTimyBackend):
+    '''Reads a Timy through the ALGEUSB driver, Windows only.
+
+    The COM object is made on the reader's thread, which sleeps until a
+    message arrives for it or stopping is set rather than pumping messages
+    on a timer.
+    '''
+
+    def __init__(self, device: int = 0):
+        import pythoncom, win32com.client, win32event # Windows only
+        self.device = device
+        self._wake = win32event.CreateEvent(None, False, False, None)
+
+    def run(self, emit: Callable[[str, float], None], stopping: threading.Event) -> None:
+        import pythoncom, win32com.client, win32event
+
+        class Events:
+            def OnUSBInput(self, data):
+                emit(str(data).rstrip('\r\n'), time.monotonic())
+
+        pythoncom.CoInitialize()
+        try:
+            timy = win32com.client.DispatchWithEvents('ALGEUSB.TimyUSB', Events)
+            timy.Init()
+            timy.OpenConnection(self.device)
+            try:
+                while not stopping.is_set():
+                    win32event.MsgWaitForMultipleObjects(
+                        [self._wake], False, win32event.INFINITE, win32event.QS_ALLINPUT
+                        )
+                    pythoncom.PumpWaitingMessages()
+            finally:
+                timy.CloseConnection()
+        finally:
+            pythoncom.CoUninitialize()
+
+    def close(self) -> None:
+        import win32event
+        win32event.SetEvent(self._wake)
+
+
+# The reader
+# -------------------------------------------------------------
+
+class C4HTimyReader(object):
+    '''Reads a Timy on its own thread, the events are an async stream.
+
+    Example:
+        async with C4HTimyReader(C4HTimyUSB()) as timy:
+            async for event in timy:
+                ...
+
+    Attributes:
+        backend (C4HTimyBackend):
+        ring (C4HRingBuffer): the events read and not yet streamed
+        lines_read (int):
+        recorder (C4HRecorder): records the lines read, see timing_record.py
+    '''
+
+    def __init__(self, backend: C4HTimyBackend, capacity: int = RING_SIZE,
+            recorder: Any = None):
+        self.backend = backend
+        self.recorder = recorder
+        self.ring = C4HRingBuffer(capacity)
+        self.lines_read = 0
+        self._loop = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._ready = None
+        self._waiting = False
+        self._finished = False
+
+    def open(self) -> None:
+        """Starts reading on the reader's thread, call from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f'timy {type(self.backend).__name__}', daemon=True
+            )
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.backend.run(self._emit, self._stopping)
+        finally:
+            self._finished = True
+            self._wake()
+
+    def _emit(self, line: str, received: float) -> None:
+        self.lines_read += 1
+        if self.recorder is not None:
+            self.recorder.write(line.encode('ascii', 'replace') + b'\r', received)
+        event = parse_timy(line, received)
+        if event is not None and self.ring.put(event):
+            # the stream only needs waking when it has run out of events
+            if self._waiting:
+                self._wake()
+
+    def _wake(self) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                pass # the loop closed in between
+
+    def __aiter__(self) -> 'C4HTimyReader':
+        return self
+
+    async def __anext__(self) -> C4HTimerEvent:
+        while True:
+            event = self.ring.get()
+            if event is not None:
+                return event
+            if self._finished:
+                # anything put just before finishing is in the ring by now
+                event = self.ring.get()
+                if event is None:
+                    raise StopAsyncIteration
+                return event
+            self._ready.clear()
+            self._waiting = True
+            # an event put before _waiting was seen won't wake us
+            event = self.ring.get()
+            if event is not None:
+                self._waiting = False
+                return event
+            await self._ready.wait()
+            self._waiting = False
+
+    def close(self) -> None:
+        """Stops the thread, events already read can still be streamed."""
+        self._stopping.set()
+        self.backend.close()
+        if self._thread is not None:
+            self._thread.join(1)
+
+    async def __aenter__(self) -> 'C4HTimyReader':
+        self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,70 @@
+""" Benchmark sampling the path curves between fences.
+
+Samples n random cubic curves at 8 points each, first one at a time with
+the nested loops design_helpers.bezier used and then all at once with
+design_curves.bezier_curves. Then compares the length of the curves
+sampled at 8 points and adaptively against a dense sampling.
+
+run from the repository root:
+    python -m benchmarks.bench_bezier [-n 2000]
+"""
+import argparse
+import random
+import time
+
+from C4HDesign.design_curves import adaptive_bezier_curves, bezier_curves
+from C4HDesign.design_helpers import binomial_coeffs
+
+
+def loop_bezier(control_points: list, num_points: int = 8) -> list:
+    curve_zs = []
+    order = len(control_points) - 1
+    coeffs = binomial_coeffs(order)
+    for p in range(num_points):
+        t = p/(num_points-1)
+        z = complex(0,0)
+        for ind, cp in enumerate(control_points):
+            z += coeffs[ind] * cp * (1-t)**(order-ind) * t**ind
+        curve_zs.append(z)
+    return curve_zs
+
+
+def length(zs) -> float:
+    return sum(abs(b - a) for a, b in zip(zs, zs[1:]))
+
+
+def main(n: int) -> None:
+    rng = random.Random(1)
+    curves = [
+        [complex(rng.uniform(0, 6000), rng.uniform(0, 4000)) for _ in range(4)]
+        for _ in range(n)
+        ]
+
+    start = time.perf_counter()
+    for curve in curves:
+        loop_bezier(curve)
+    loops = time.perf_counter() - start
+    start = time.perf_counter()
+    bezier_curves(curves, 8)
+    product = time.perf_counter() - start
+
+    dense = bezier_curves(curves, 2001).tolist()
+    fixed = bezier_curves(curves, 8).tolist()
+    start = time.perf_counter()
+    adaptive = adaptive_bezier_curves(curves)
+    adapting = time.perf_counter() - start
+    fixed_error = max(abs(length(f) - length(d))/length(d) for f, d in zip(fixed, dense))
+    adaptive_error = max(abs(length(a) - length(d))/length(d) for a, d in zip(adaptive, dense))
+
+    print(f'{n} cubic curves, 8 points each')
+    print(f'nested loops:   {loops/n*1e6:8.2f} us a curve')
+    print(f'bezier_curves:  {product/n*1e6:8.2f} us a curve')
+    print(f'adaptive:       {adapting/n*1e6:8.2f} us a curve, '
+        f'{sum(map(len, adaptive))/n:.1f} points on average')
+    print(f'worst length error, 8 points: {fixed_error:.2%}, adaptive: {adaptive_error:.2%}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help='number of curves')
+    main(parser.parse_args().n)
@@ -0,0 +1,86 @@
+""" Benchmark the latency, jitter and throughput of the Farmtek to JJD bridge.
+
+Latency: writes n continuous mode packets, one at a time, to a pty standing
+in for the console and times each until its frame is read from a second pty
+standing in for JJD. Jitter is the spread of those times.
+
+Throughput: writes n packets to the console as fast as the pty takes them
+and times until every frame has been read from JJD's side.
+
+run from the repository root (POSIX only):
+    python -m benchmarks.bench_bridge [-n 2000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from C4HTiming.timing_bridge import C4HJJDBridge
+from C4HTiming.timing_farmtek import CONTINUOUS
+
+FRAME_SIZE = 7
+
+
+async def measure(n: int) -> tuple:
+    loop = asyncio.get_running_loop()
+    console, console_slave = os.openpty()
+    jjd, jjd_slave = os.openpty()
+    os.set_blocking(console, False)
+    received = bytearray()
+    arrived = asyncio.Event()
+
+    def on_jjd():
+        received.extend(os.read(jjd, 65536))
+        arrived.set()
+
+    async def read_until(size):
+        while len(received) < size:
+            arrived.clear()
+            await arrived.wait()
+
+    latencies = []
+    loop.add_reader(jjd, on_jjd)
+    try:
+        async with C4HJJDBridge(os.ttyname(console_slave), os.ttyname(jjd_slave), CONTINUOUS):
+            for i in range(n):
+                sent = time.monotonic()
+                os.write(console, f'{i/1000:7.3f}'.encode())
+                await read_until((i + 1)*FRAME_SIZE)
+                latencies.append(time.monotonic() - sent)
+
+            received.clear()
+            packets = b''.join(f'{i/1000:7.3f}'.encode() for i in range(n))
+            started = time.monotonic()
+            pos = 0
+            while pos < len(packets):
+                try:
+                    pos += os.write(console, packets[pos:pos + 4096])
+                except BlockingIOError:
+                    pass
+                await asyncio.sleep(0)
+            await read_until(len(packets))
+            elapsed = time.monotonic() - started
+    finally:
+        loop.remove_reader(jjd)
+        for fd in (console, console_slave, jjd, jjd_slave):
+            os.close(fd)
+    return latencies, elapsed
+
+
+def main(n: int) -> None:
+    latencies, elapsed = asyncio.run(measure(n))
+    ms = sorted(t*1000 for t in latencies)
+    print(f'{n} packets, latency from console write to JJD read')
+    print(f'median: {statistics.median(ms):8.3f} ms')
+    print(f'p99:    {ms[int(0.99*(n - 1))]:8.3f} ms')
+    print(f'max:    {ms[-1]:8.3f} ms')
+    print(f'jitter: {statistics.pstdev(ms):8.3f} ms stdev')
+    print(f'throughput: {n/elapsed:,.0f} frames/s '
+        f'({n*FRAME_SIZE*10/elapsed:,.0f} baud, a console sends 9,600)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help='number of packets')
+    main(parser.parse_args().n)
@@ -0,0 +1,67 @@
+""" Benchmark saving and opening a large event in the binary and yaml formats.
+
+Builds an event with n riders, n horses and n combos, saves it as a binary
+snapshot and as a yaml export, then opens both again. The binary snapshot is
+opened both trusted, the default, and fully validated.
+
+run from the repository root:
+    python -m benchmarks.bench_event_io [-n 10000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from C4HScore.score import C4HEvent
+
+
+def build_event(n: int) -> C4HEvent:
+    event = C4HEvent(name='Benchmark Championships')
+    event.new_arena(id='1', name='Main Arena')
+    for i in range(n):
+        rider = event.new_rider(
+            surname=f'Surname {i}', forename=f'Forename {i}', ea_number=f'{i:07d}'
+            )
+        horse = event.new_horse(name=f'Horse {i}', ea_number=f'{i:08d}')
+        event.new_combo(rider=rider, horse=horse, id=str(i))
+    return event
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(n: int) -> None:
+    event = build_event(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_fn = os.path.join(tmp, 'bench.c4hs')
+        yaml_fn = os.path.join(tmp, 'bench.yaml')
+
+        _, binary_save = timed(event.event_save_as, binary_fn)
+        opened, binary_open = timed(event.event_open, binary_fn)
+        assert len(opened.combos) == n
+        _, validate = timed(opened.event_validate)
+        opened, checked_open = timed(event.event_open, binary_fn, False)
+        assert len(opened.combos) == n
+        _, yaml_save = timed(event.event_export_yaml, yaml_fn)
+        opened, yaml_open = timed(event.event_open, yaml_fn)
+        assert len(opened.combos) == n
+
+        print(f'{n} riders, horses and combos')
+        print(f'{"format":8}{"save (s)":>10}{"open (s)":>10}{"size (kB)":>12}')
+        for name, fn, save, open_ in [
+                ('binary', binary_fn, binary_save, binary_open),
+                ('checked', binary_fn, binary_save, checked_open),
+                ('yaml', yaml_fn, yaml_save, yaml_open)]:
+            size = os.path.getsize(fn) / 1024
+            print(f'{name:8}{save:10.3f}{open_:10.3f}{size:12.0f}')
+        print(f'trusted open is {checked_open / binary_open:.1f}x faster, '
+            f'event_validate afterwards takes {validate:.3f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=10000, help='number of entries')
+    main(parser.parse_args().n)
@@ -0,0 +1,47 @@
+""" Benchmark the latency from a Farmtek packet's last byte to its event.
+
+Writes n continuous mode packets to a pty standing in for the console and
+times each from the write to the event coming off the reader's queue.
+
+run from the repository root (POSIX only):
+    python -m benchmarks.bench_farmtek [-n 2000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from C4HTiming.timing_farmtek import CONTINUOUS, C4HFarmtekReader
+
+
+async def measure(n: int) -> list:
+    master, slave = os.openpty()
+    latencies = []
+    try:
+        async with C4HFarmtekReader(os.ttyname(slave), CONTINUOUS) as reader:
+            for i in range(n):
+                packet = f'{i/1000:7.3f}'.encode()
+                sent = time.monotonic()
+                os.write(master, packet)
+                await reader.queue.get()
+                latencies.append(time.monotonic() - sent)
+    finally:
+        os.close(master)
+        os.close(slave)
+    return latencies
+
+
+def main(n: int) -> None:
+    latencies = sorted(asyncio.run(measure(n)))
+    ms = [t*1000 for t in latencies]
+    print(f'{n} packets, latency from write to event')
+    print(f'median: {statistics.median(ms):8.3f} ms')
+    print(f'p99:    {ms[int(0.99*(n - 1))]:8.3f} ms')
+    print(f'max:    {ms[-1]:8.3f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help='number of packets')
+    main(parser.parse_args().n)
@@ -0,0 +1,46 @@
+""" Benchmark parsing the faults judges type for each round.
+
+Parses n random faults strings with an empty cache, then again with them
+all cached, as a scoreboard redraw would.
+
+run from the repository root:
+    python -m benchmarks.bench_faults [-n 20000]
+"""
+import argparse
+import random
+import time
+
+from C4HScore.score_faults import C4HFaultParser
+
+
+def random_faults(rng: random.Random, fences: int) -> str:
+    jumps = rng.sample(range(1, fences + 1), rng.choice([0, 0, 1, 1, 2, 3]))
+    return ' '.join(f'{j}{rng.choice(["r", "r", "d", "dr", "dk"])}' for j in sorted(jumps))
+
+
+def main(n: int) -> None:
+    rng = random.Random(1)
+    strings = [random_faults(rng, 14) for _ in range(n)]
+    parser = C4HFaultParser()
+
+    start = time.perf_counter()
+    for faults in strings:
+        parser._parse(faults, 14)
+    parsing = time.perf_counter() - start
+
+    for faults in strings:
+        parser.parse(faults, 14)
+    start = time.perf_counter()
+    for faults in strings:
+        parser.parse(faults, 14)
+    cached = time.perf_counter() - start
+
+    print(f'{n} rounds, {len(set(strings))} different faults strings')
+    print(f'parsed: {n / parsing:12,.0f} rounds/s')
+    print(f'cached: {n / cached:12,.0f} rounds/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=20000, help='number of rounds')
+    main(parser.parse_args().n)
@@ -0,0 +1,67 @@
+""" Benchmark rotating and moving a selection of fences as a drag would.
+
+Each motion event rotates a selection of 20 fences, each 3 rails, an arrow
+and a 16 point shrub beside it, and moves it, first point by point as
+C4HPlan did and then with C4HGeometry, including taking the canvas coords
+of the selection out of it. The canvas writes aren't timed.
+
+run from the repository root:
+    python -m benchmarks.bench_geometry [-n 2000]
+"""
+import argparse
+import cmath
+import math
+import random
+import time
+
+from C4HDesign.design_geometry import C4HGeometry
+from C4HDesign.design_helpers import cartesian_to_complex, complex_to_cartesian
+
+FENCES = 20
+
+
+def selection(rng: random.Random) -> dict:
+    coords = {}
+    for fence in range(FENCES):
+        x, y = rng.uniform(0, 2000), rng.uniform(0, 1500)
+        for rail in range(3):
+            coords[len(coords)] = [x - 70, y + 20*rail, x + 70, y + 20*rail]
+        coords[len(coords)] = [x, y - 50, x, y + 60]
+        coords[len(coords)] = [
+            v for n in range(16)
+            for v in (x + 200 + 30*math.cos(n), y + 30*math.sin(n))
+            ]
+    return coords
+
+
+def main(n: int) -> None:
+    coords = selection(random.Random(1))
+    rotation, delta, pivot = cmath.exp(0.01j), complex(1, -1), complex(1000, -750)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        for id, xy in coords.items():
+            zs = [pivot + (z - pivot)*rotation for z in cartesian_to_complex(xy)]
+            zs = [z + delta for z in zs]
+            coords[id] = complex_to_cartesian(zs)
+    points = time.perf_counter() - start
+
+    geometry = C4HGeometry()
+    for id, xy in coords.items():
+        geometry.add(id, cartesian_to_complex(xy))
+    ids = list(coords)
+    start = time.perf_counter()
+    for _ in range(n):
+        geometry.transform(ids, rotation=rotation, delta=delta, pivot=pivot)
+        geometry.coords(ids)
+    vectorised = time.perf_counter() - start
+
+    print(f'{n} drags of {FENCES} fences ({len(coords)} components)')
+    print(f'point by point: {points/n*1e6:8.1f} us a drag')
+    print(f'C4HGeometry:    {vectorised/n*1e6:8.1f} us a drag')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help='number of motion events')
+    main(parser.parse_args().n)
@@ -0,0 +1,45 @@
+""" Benchmark importing a large Nominate csv file of entries.
+
+Writes a csv file with n entries, two classes for each combination, and
+imports it into an empty event.
+
+run from the repository root:
+    python -m benchmarks.bench_import [-n 20000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from C4HScore.score import C4HEvent
+
+
+def write_entries(fn: str, n: int) -> None:
+    with open(fn, 'w', newline='') as out_file:
+        out_file.write('ID,Class,Rider,Horse,Rider EA,Horse EA\n')
+        for i in range(n):
+            combo = i // 2
+            out_file.write(
+                f'{combo},{i % 50},Forename{combo} Surname {combo},Horse {combo},'
+                f'{combo:07d},{combo:08d}\n'
+                )
+
+
+def main(n: int) -> None:
+    event = C4HEvent(name='Benchmark Championships')
+    event.new_arena(id='1', name='Main Arena')
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, 'entries.csv')
+        write_entries(fn, n)
+        start = time.perf_counter()
+        counts = event.event_import_nominate(fn)
+        elapsed = time.perf_counter() - start
+
+    print(f'{n} entries imported in {elapsed:.3f}s')
+    print(', '.join(f'{count} {collection}' for collection, count in counts.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=20000, help='number of entries')
+    main(parser.parse_args().n)
@@ -0,0 +1,90 @@
+""" Benchmark the results path from timer bytes to the ranked scoreboard.
+
+Records a normal mode Farmtek session of n rounds, each its time then its
+faults split into small chunks as they arrive at 1200 baud, and replays it
+as fast as possible through a C4HReplayDriver and a C4HTimingRegistry. Each
+event is set on its round through C4HEvent.timer_event and the prize
+winners are read back, as the scoreboard would after every result. The
+latency of each stage is printed at the end.
+
+run from the repository root:
+    python -m benchmarks.bench_replay [-n 2000] [--log session.c4ht]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from C4HScore.score import C4HEvent
+from C4HScore.score_latency import C4HLatency
+from C4HTiming.timing_drivers import C4HReplayDriver, C4HTimingRegistry
+from C4HTiming.timing_record import C4HRecorder, read_log
+
+
+def record_session(fn: str, n: int) -> None:
+    rng = random.Random(1)
+    received = 0.0
+    with C4HRecorder(fn, 'farmtek', 'normal') as recorder:
+        for _ in range(n):
+            received += rng.uniform(40, 90)
+            packets = (
+                f'{rng.uniform(50, 80):7.2f} (M)'.encode(),
+                f'Round 1 Faults {rng.choice([0, 0, 1, 2]):7.2f}'.encode(),
+                )
+            for packet in packets:
+                for i in range(0, len(packet), 4):
+                    recorder.write(packet[i:i + 4], received)
+                    received += 0.033
+                received += 0.2
+
+
+def main(n: int, fn: str = None) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        if fn is None:
+            fn = os.path.join(tmp, 'session.c4ht')
+            record_session(fn, n)
+        log = read_log(fn)
+
+    event = C4HEvent(name='Benchmark Championships')
+    arena = event.new_arena(id='1', name='Main Arena')
+    jumpclass = event.new_jumpclass(id='1', arena=arena)
+    rider = event.new_rider(forename='Andi', surname='Gravity')
+    horses = event.new_horses({'name': f'Horse {i}'} for i in range(n)).objects
+    combos = event.new_combos({'rider': rider, 'horse': h} for h in horses).objects
+    rounds = [event.new_round(jumpclass=jumpclass, combo=c) for c in combos]
+    placings = event.get_placings(jumpclass)
+    latency = C4HLatency()
+    event.set_latency(latency)
+
+    registry = C4HTimingRegistry(latency)
+    registry.bind(arena, C4HReplayDriver(log.chunks, log.device, log.mode or 'normal', 0))
+    counts = {'time': 0, 'faults': 0}
+
+    def handler(arena, timer_event):
+        # a time starts the next round, its faults follow
+        counts[timer_event.kind] = counts.get(timer_event.kind, 0) + 1
+        round_ = rounds[(counts['time'] - 1) % len(rounds)]
+        event.timer_event(round_, timer_event)
+        placings.prize_winners()
+        latency.mark('repaint', timer_event.received)
+
+    start = time.perf_counter()
+    asyncio.run(registry.run(handler))
+    elapsed = time.perf_counter() - start
+
+    events = sum(counts.values())
+    print(f'{len(log.chunks)} chunks, {log.size} bytes, {events} events in {elapsed:.3f}s')
+    print(f'{log.size / elapsed:12,.0f} bytes/s')
+    print(f'{events / elapsed:12,.0f} events/s, {elapsed / events * 1e6:.1f} us each')
+    print()
+    print(latency.report())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', type=int, default=2000, help='number of rounds')
+    parser.add_argument('--log', help='replay this timing log instead')
+    args = parser.parse_args()
+    main(args.n, args.log)
@@ -0,0 +1,200 @@
+import pytest
+from ..C4HDesign import design_index as di
+
+
+# Spatial index
+# -------------------------------------------------------------
+def test_spatial_index():
+    index = di.C4HSpatialIndex(cell=50)
+    rail, arrow, shrub = object(), object(), object()
+    index.insert(1, rail, [100, 100, 244, 100])
+    index.insert(2, rail, [172, 90, 172, 110])
+    index.insert(3, shrub, [400, 400, 440, 400, 440, 440, 400, 440], closed=True)
+    assert (len(index), index.sprite(2), index.sprite(99)) == (3, rail, None)
+
+    assert index.nearest(200, 110, 40) is rail
+    assert index.nearest(420, 420, 5) is shrub # inside the shrub
+    assert index.nearest(300, 300, 40) is None
+
+    # moving keeps the grid in step
+    index.move(3, [1000, 1000, 1040, 1000, 1040, 1040, 1000, 1040])
+    assert index.nearest(420, 420, 40) is None
+    assert index.nearest(1020, 1045, 10) is shrub
+    assert index.coords(3)[0] == 1000
+
+    index.remove(1)
+    index.remove(1)
+    assert 1 not in index and index.nearest(110, 100, 20) is None
+    assert index.nearest(172, 100, 20) is rail
+
+def test_spatial_index_many():
+    import random
+    random.seed(21)
+    index = di.C4HSpatialIndex()
+    sprites = []
+    for n in range(500):
+        x, y = random.uniform(0, 2000), random.uniform(0, 1500)
+        sprites.append((x, y))
+        index.insert(n, n, [x - 70, y, x + 70, y])
+    for _ in range(100):
+        x, y = random.uniform(0, 2000), random.uniform(0, 1500)
+        expected = min(
+            (di.distance(x, y, [sx - 70, sy, sx + 70, sy]), n)
+            for n, (sx, sy) in enumerate(sprites)
+            )
+        found = index.nearest(x, y, 40)
+        if expected[0] <= 40:
+            assert di.distance(x, y, index.coords(found)) == expected[0]
+        else:
+            assert found is None
+
+# Focus
+# -------------------------------------------------------------
+def test_focus():
+    from ..C4HDesign.design_helpers import C4HFocus, C4HSprite
+    from ..C4HDesign.design_model import C4HFence
+    changes = []
+    focus = C4HFocus(lambda sprites: changes.append([s.fence.number for s in sprites]))
+    a, b, c = (C4HSprite(fence=C4HFence(pivot=0j, number=n)) for n in 'abc')
+    focus.add(a)
+    focus.add(b)
+    focus.add(a) # already has focus so nothing to repaint
+    assert changes == [['a'], ['b']]
+    assert (len(focus), focus[0] is a, b in focus, c in focus) == (2, True, True, False)
+
+    for sprite in focus: # replacing while iterating keeps the order
+        focus.replace(sprite, c if sprite is a else sprite)
+    assert [s.fence.number for s in focus] == ['c', 'b']
+    assert changes[2] == ['a', 'c']
+
+    focus.discard(a) # lost focus already
+    assert len(changes) == 3
+    focus.clear()
+    assert changes[-1] == ['c', 'b'] and not focus
+    focus.clear()
+    assert len(changes) == 4
+
+# Geometry
+# -------------------------------------------------------------
+def test_geometry():
+    import cmath
+    from ..C4HDesign import design_geometry as dg
+    geometry = dg.C4HGeometry()
+    geometry.add(1, [0, 100])
+    geometry.add(2, [50 + 10j, 50 - 20j])
+    assert geometry.coords([1]) == {1: [0, 0, 100, 0]}
+    assert geometry.coords([2], scale=2) == {2: [100, -20, 100, 40]}
+
+    geometry.transform([1, 2], delta=complex(10, -5))
+    assert geometry.coords([1, 2]) == {1: [10, 5, 110, 5], 2: [60, -5, 60, 25]}
+    # a quarter turn anticlockwise about the rail's middle
+    geometry.transform([1], rotation=cmath.exp(1j*cmath.pi/2), pivot=complex(60, -5))
+    assert geometry.coords([1])[1] == pytest.approx([60, 55, 60, -45])
+    assert geometry.coords([2])[2] == [60, -5, 60, 25] # not selected so not moved
+
+    # removed fences are closed up and the rest keep their vertices
+    for key in range(3, 300):
+        geometry.add(key, [complex(key, -key), complex(key + 1, -key)])
+    for key in range(3, 299):
+        geometry.remove(key)
+    geometry.remove(3)
+    assert len(geometry) == 3
+    assert geometry.coords([299]) == {299: [299, 299, 300, 299]}
+    geometry.transform([2, 299], delta=1)
+    assert geometry.coords([2, 299]) == {2: [61, -5, 61, 25], 299: [300, 299, 301, 299]}
+
+# Course plan
+# -------------------------------------------------------------
+def test_course_plan():
+    import cmath
+    from ..C4HDesign import design_model as dm
+    plan = dm.C4HCoursePlan(class_height=100)
+    vertical = plan.new_jump(complex(0, 0))
+    oxer = plan.new_jump(complex(0, 3000), rails=2)
+    shrub = plan.new_shrub(complex(1000, 1000), radius=100)
+    assert (oxer.spread, len(shrub.shape)) == (110, dm.SHRUB_POINTS)
+
+    parts = plan.outline(oxer)
+    assert [part for part, _ in parts] == ['rail', 'rail', 'arrow']
+    assert parts[1][1][0] == pytest.approx(complex(-180, 3000 - 90)) # the back rail
+    assert parts[2][1][0] == pytest.approx(complex(0, 3120)) # the arrow points north
+    assert all(50 <= abs(z - shrub.pivot) <= 100 for z in plan.outline(shrub)[0][1])
+
+    # from one fence to the next, landing and approaching straight
+    path = plan.path([vertical, oxer], num_points=8)
+    assert len(path) == 10 and (path[0], path[-1]) == (vertical.pivot, oxer.pivot)
+    assert path[1] == pytest.approx(vertical.pivot + plan.approach()*1j)
+    assert path[-2] == pytest.approx(oxer.pivot - plan.approach()*1j)
+    assert plan.path_length([vertical, oxer]) > 30
+
+    plan.rotate([vertical, oxer], cmath.pi/2, complex(0, 0))
+    assert oxer.pivot == pytest.approx(complex(-3000, 0)) and oxer.angle == 90
+    assert plan.outline(oxer)[2][1][0] == pytest.approx(complex(-3120, 0)) # now west
+    plan.move([oxer], complex(3000, 0))
+    assert oxer.pivot == pytest.approx(0)
+    # the outline moved with the fence, it is the same as drawing it afresh
+    for (part, zs), (fresh, fresh_zs) in zip(plan.outline(oxer), plan._outline(oxer)):
+        assert part == fresh and zs == pytest.approx(fresh_zs)
+    # canvas coords at 1:40, y down
+    assert plan.coords([oxer], 0.4)[0][0] == pytest.approx([0, 72, 0, -72])
+
+    plan.set_fence(vertical, rails=3, spread=130)
+    assert [part for part, _ in plan.outline(vertical)] == ['rail', 'rail', 'rail', 'arrow']
+
+    plan.remove(shrub)
+    assert plan.fences == [vertical, oxer]
+
+def test_course_plan_export():
+    import pickle
+    from ..C4HDesign import design_model as dm
+    plan = dm.C4HCoursePlan(open=False)
+    for n in range(4):
+        plan.new_jump(complex(0, 2000*n), rails=n % 3 + 1)
+    plan.new_shrub(complex(500, 500))
+    copy = dm.C4HCoursePlan.from_dict(plan.to_dict())
+    assert copy.to_dict() == plan.to_dict()
+    assert pickle.loads(pickle.dumps(plan)).to_dict() == plan.to_dict()
+
+    summary = dm.plan_summary(plan)
+    assert summary['fences'] == 5 and len(summary['distances']) == 4
+    assert dm.analyse_plans([plan, copy], workers=2) == [summary, summary]
+
+# Curves
+# -------------------------------------------------------------
+def test_bezier():
+    import math
+    from ..C4HDesign import design_curves as dc
+    from ..C4HDesign.design_helpers import binomial_coeffs
+
+    def slow_bezier(control_points, num_points):
+        order = len(control_points) - 1
+        coeffs = binomial_coeffs(order)
+        return [
+            sum(coeffs[k]*z*(1 - p/(num_points - 1))**(order - k)*(p/(num_points - 1))**k
+                for k, z in enumerate(control_points))
+            for p in range(num_points)
+            ]
+
+    curves = [[0, 100j, 100 + 100j, 100], [50, 0, -50j, 20 + 20j], [1, 2, 3, 4]]
+    sampled = dc.bezier_curves(curves, 8)
+    for curve, points in zip(curves, sampled):
+        assert points.tolist() == pytest.approx(slow_bezier(curve, 8))
+    assert dc.bezier([0, 1j, 2], 5) == pytest.approx(slow_bezier([0, 1j, 2], 5))
+    assert dc.bernstein(3, 8) is dc.bernstein(3, 8)
+    assert dc.bernstein(3, 8).sum(axis=1) == pytest.approx([1]*8)
+
+    # a straight curve is one piece, a hairpin is sampled densely at the turn
+    assert dc.adaptive_bezier([0, 100, 200, 300]) == [0, 300]
+    hairpin = dc.adaptive_bezier([0, 2000j, 500 + 2000j, 500], tolerance=5)
+    assert (hairpin[0], hairpin[-1]) == (0, 500)
+    from ..C4HDesign.design_index import distance
+    dense = slow_bezier([0, 2000j, 500 + 2000j, 500], 4001)
+    coords = [v for z in hairpin for v in (z.real, z.imag)]
+    assert max(distance(z.real, z.imag, coords) for z in dense[::20]) <= 5
+
+    def length(zs):
+        return sum(abs(b - a) for a, b in zip(zs, zs[1:]))
+    # more accurate than 8 points for fewer than 3 times as many
+    fixed = slow_bezier([0, 2000j, 500 + 2000j, 500], 8)
+    assert len(hairpin) < 24
+    assert abs(length(hairpin) - length(dense)) < abs(length(fixed) - length(dense))/10
@@ -1,6 +1,8 @@
 import pytest
 from ..C4HScore import score as c4h
 from ..C4HScore import score_helpers as sh
+from ..C4HScore import score_journal as sj
+import threading
 import time
 # import yaml
 
@@ -42,6 +44,35 @@ def test_C4HEvent_get_objects(mock_event):
     assert mock_event.get_objects(mock_event.arenas, id='99')
     assert not mock_event.get_objects(mock_event.arenas, id='42')
 
+def test_C4HEvent_get_objects_indexed(mock_event):
+    rider = mock_event.riders[0]
+    assert mock_event.get_objects(
+        mock_event.riders, surname='Gravity', forename='Andi')[0] is rider
+    mock_event.set_object(rider, surname='Gravitas')
+    assert not mock_event.get_objects(mock_event.riders, surname='Gravity', forename='Andi')
+    assert mock_event.get_objects(mock_event.riders, surname='Gravitas', forename='Andi')
+    horse = mock_event.new_horse(name='Topless', ea_number='12345678')
+    assert list(mock_event.get_objects(
+        mock_event.horses, name='Topless', ea_number='12345678')) == [horse]
+    assert len(mock_event.get_objects(mock_event.horses, name='Topless')) == 2
+
+def test_C4HEvent_index_rebuilt(mock_event):
+    mock_event.arenas = []
+    assert not mock_event.get_objects(mock_event.arenas, id='1')
+    assert not mock_event.exists_object(sh.C4HArena(event=mock_event), id='1')
+
+def test_C4HEvent_query(mock_event):
+    riders = mock_event.query('riders', forename='Bluey')
+    assert not riders
+    rider = mock_event.new_rider(forename='Bluey')
+    assert riders[0] is rider # views are live
+    with pytest.raises(IndexError):
+        riders[1]
+    copies = riders.snapshot()
+    assert copies[0] is not rider
+    assert copies[0].forename == 'Bluey'
+    assert mock_event.query('riders').first() is mock_event.riders[0]
+
 def test_C4HEvent_new_arena(mock_event):
     arena = mock_event.new_arena(id='2')
     assert isinstance(arena, sh.C4HArena)
@@ -109,4 +140,627 @@ def test_C4HEvent_new_official(mock_event):
     new_official = mock_event.new_official(forename='Mike', surname='Hunt')
     assert isinstance(new_official, sh.C4HOfficial)
 
-# TODO start here
\ No newline at end of file
+def test_C4HEvent_save_open(mock_event, tmp_path):
+    rider = mock_event.new_rider(surname='Zarzhoff', ea_number='1234567')
+    horse = mock_event.new_horse(name='Nadzoff', ea_number='12345678')
+    mock_event.new_combo(rider=rider, horse=horse, id='42')
+    fn = tmp_path / 'event.c4hs'
+    mock_event.event_save_as(fn)
+    with open(fn, 'rb') as in_file:
+        assert in_file.read(4) == b'C4HS'
+
+    opened = mock_event.event_open(fn)
+    assert opened.name == mock_event.name
+    assert opened.dates == mock_event.dates
+    assert [r.surname for r in opened.riders] == [r.surname for r in mock_event.riders]
+    assert opened.combos[0].rider is opened.riders[-1]
+    assert opened.combos[0].horse.ea_number == '12345678'
+    assert opened.arenas[0].event is opened
+    assert opened.get_objects(opened.combos, id='42')
+
+def test_C4HEvent_open_newer_snapshot(mock_event, tmp_path):
+    from ..C4HScore import score_snapshot
+    # a newer version with a new section and a new rider field
+    for rider in mock_event.riders:
+        rider.__dict__['nickname'] = 'Andi G'
+    data = score_snapshot.dumps(mock_event, mock_event._saved_fields())
+    data += score_snapshot._SECTION.pack(b'XTRA', 3) + b'new'
+    fn = tmp_path / 'event.c4hs'
+    fn.write_bytes(data)
+    for trusted in (True, False):
+        opened = mock_event.event_open(fn, trusted)
+        assert opened.riders[0].surname == 'Gravity'
+        assert 'nickname' not in vars(opened.riders[0])
+
+def test_C4HEvent_yaml_export(mock_event, tmp_path):
+    fn = tmp_path / 'event.yaml'
+    mock_event.event_export_yaml(fn)
+    opened = mock_event.event_open(fn)
+    assert opened.riders[0].surname == 'Gravity'
+    assert opened.riders[0].event is opened
+
+def test_C4HEvent_open_legacy(mock_event, tmp_path):
+    from pathlib import Path
+    # saved as python objects by the first version, before journaled, judged etc.
+    fn = Path(__file__).parent / 'data' / 'legacy_event.c4hs'
+    opened = mock_event.event_open(fn)
+    assert not opened.journaled
+    assert [r.surname for r in opened.riders] == ['Gravity', 'Dagg']
+    assert opened.riders[0].event is opened
+    assert opened.combos[0].rider is opened.riders[0]
+    assert opened.officials[0].ID # a field that wasn't written
+    # the riders were saved sharing one uuid
+    assert opened.riders[0].ID != opened.riders[1].ID
+    for rider in opened.riders:
+        assert opened.get_by_ID(rider.ID) is rider
+    opened.set_object(opened.horses[0], name='Topsy')
+    fn = tmp_path / 'event.c4hs'
+    opened.event_save_as(fn)
+    assert opened.event_open(fn).horses[0].name == 'Topsy'
+
+def test_C4HEvent_journal(mock_event, tmp_path):
+    fn = tmp_path / 'journaled.c4hs'
+    mock_event.journaled = True
+    mock_event.event_save_as(fn)
+    assert sj.journal_path(fn).exists()
+    rider = mock_event.riders[0]
+    horse = mock_event.horses[0]
+    mock_event.new_combo(rider=rider, horse=horse, id='7')
+    mock_event.set_object(rider, ea_number='1234567')
+    mock_event.name = 'Baccabuggry Cup'
+    mock_event.event_save()
+
+    opened = mock_event.event_open(fn)
+    assert opened.name == 'Baccabuggry Cup'
+    assert opened.riders[0].ea_number == '1234567'
+    assert opened.combos[0].rider is opened.riders[0]
+    assert opened.last_save == opened.last_change
+    opened.event_close()
+    mock_event.event_close()
+
+def test_C4HEvent_journal_compact(mock_event, tmp_path, monkeypatch):
+    monkeypatch.setattr(c4h, 'COMPACT_RECORDS', 3)
+    fn = tmp_path / 'compacted.c4hs'
+    mock_event.journaled = True
+    mock_event.event_save_as(fn)
+    for n in range(5):
+        mock_event.new_horse(name=f'Horse {n}')
+    mock_event.event_save()
+    mock_event.new_horse(name='Late Entry')
+    mock_event._journal.wait()
+    assert mock_event._journal.count == 1
+    # a record cut short by a crash is ignored
+    with open(sj.journal_path(fn), 'a') as journal:
+        journal.write('{"op":"set","collection"')
+
+    opened = mock_event.event_open(fn)
+    assert [h.name for h in opened.horses[-2:]] == ['Horse 4', 'Late Entry']
+    opened.event_close()
+    mock_event.event_close()
+
+def test_C4HEvent_journal_torn_tail(mock_event, tmp_path):
+    fn = tmp_path / 'torn.c4hs'
+    mock_event.journaled = True
+    mock_event.event_save_as(fn)
+    mock_event.new_horse(name='Horse A')
+    mock_event.event_close()
+    # a crash part way through writing the next record
+    with open(sj.journal_path(fn), 'a') as journal:
+        journal.write('{"op":"new","collection":"horses","posi')
+
+    opened = mock_event.event_open(fn)
+    opened.new_horse(name='Horse B')
+    opened.new_horse(name='Horse C')
+    opened.event_save()
+    opened.event_close()
+
+    reopened = mock_event.event_open(fn)
+    assert [h.name for h in reopened.horses[-3:]] == ['Horse A', 'Horse B', 'Horse C']
+    reopened.event_close()
+
+def test_C4HEvent_journal_compact_while_changing(mock_event, tmp_path, monkeypatch):
+    monkeypatch.setattr(c4h, 'COMPACT_RECORDS', 1)
+    fn = tmp_path / 'busy.c4hs'
+    mock_event.journaled = True
+    mock_event.event_save_as(fn)
+    mock_event.new_horse(name='Horse 0')
+    writing, changed = threading.Event(), threading.Event()
+    write = c4h.C4HEvent._write
+
+    def slow_write(fn, data):
+        writing.set()
+        changed.wait(5)
+        write(fn, data)
+
+    monkeypatch.setattr(c4h.C4HEvent, '_write', staticmethod(slow_write))
+    mock_event.event_save()
+    writing.wait(5)
+    # no snapshot is taken while the last one is still being written
+    dumps = c4h.score_snapshot.dumps
+    monkeypatch.setattr(c4h.score_snapshot, 'dumps', None)
+    mock_event.new_horse(name='Horse 1')
+    mock_event.event_save()
+    monkeypatch.setattr(c4h.score_snapshot, 'dumps', dumps)
+    rider = mock_event.new_rider(surname='Late', forename='Entry')
+    mock_event.new_combo(rider=rider, horse=mock_event.horses[0], id='99')
+    changed.set()
+    mock_event._journal.wait()
+    assert mock_event._journal.error is None
+
+    opened = mock_event.event_open(fn)
+    assert opened.combos[-1].rider is opened.riders[-1]
+    assert opened.riders[-1].surname == 'Late'
+    opened.event_close()
+    mock_event.event_close()
+
+def test_replay_damaged_journal(mock_event):
+    records = [{
+        'op': 'new', 'collection': 'horses',
+        'position': len(mock_event.horses) + 1, 'values': {'name': 'Lost'},
+        }]
+    with pytest.raises(ValueError):
+        sj.replay(mock_event, records)
+
+def test_C4HEvent_references_round_trip(mock_event, tmp_path):
+    arena = mock_event.arenas[0]
+    combo = mock_event.new_combo(
+        rider=mock_event.riders[0], horse=mock_event.horses[0], id='42'
+        )
+    jumpclass = mock_event.new_jumpclass(id='8c', arena=arena, height=110)
+    mock_event.new_round(jumpclass=jumpclass, combo=combo, faults='3r', time=61.2)
+    for fn in (tmp_path / 'event.c4hs', tmp_path / 'event.yaml'):
+        if fn.suffix == '.yaml':
+            mock_event.event_export_yaml(fn)
+        else:
+            mock_event.event_save_as(fn)
+        opened = mock_event.event_open(fn)
+        r = opened.get_rounds().first()
+        assert r.combo is opened.combos[0]
+        assert r.jumpclass is opened.get_jumpclasses(id='8c').first()
+        assert r.jumpclass.arena is opened.arenas[0]
+        assert r.combo.rider is opened.riders[0]
+        assert (r.faults, r.time, r.jumpclass.height) == ('3r', 61.2, 110)
+
+def test_C4HEvent_jumpclass_article(mock_event, tmp_path):
+    jumpclass = mock_event.new_jumpclass(id='1', article=' 238.2.2 ')
+    assert jumpclass.article == '238.2.2'
+    mock_event.set_object(jumpclass, article=239)
+    assert jumpclass.article == '239'
+    with pytest.raises(ValueError):
+        mock_event.set_object(jumpclass, article=sh.C4HArticle('238.2.2'))
+    assert jumpclass.article == '239'
+    for fn in (tmp_path / 'event.c4hs', tmp_path / 'event.yaml'):
+        if fn.suffix == '.yaml':
+            mock_event.event_export_yaml(fn)
+        else:
+            mock_event.event_save_as(fn)
+        assert mock_event.event_open(fn).jumpclasses[0].article == '239'
+
+def test_C4HEvent_yaml_tables(mock_event, tmp_path):
+    import yaml
+    mock_event.new_combo(rider=mock_event.riders[0], horse=mock_event.horses[0])
+    fn = tmp_path / 'event.yaml'
+    mock_event.event_export_yaml(fn)
+    with open(fn) as in_file:
+        tables = yaml.safe_load(in_file)
+    assert tables['event']['name'] == 'Baccabuggry World Cup'
+    assert tables['combos'][0]['rider'] == 0
+    assert 'event' not in tables['riders'][0]
+
+def test_C4HEvent_trusted_open(mock_event, tmp_path):
+    from pydantic import ValidationError
+    mock_event.new_combo(rider=mock_event.riders[0], horse=mock_event.horses[0])
+    fn = tmp_path / 'event.c4hs'
+    mock_event.event_save_as(fn)
+    trusted = mock_event.event_open(fn)
+    checked = mock_event.event_open(fn, trusted=False)
+    assert sj.object_values(trusted.riders[0]) == sj.object_values(checked.riders[0])
+    assert trusted.riders[0].event is trusted
+    assert trusted.combos[0].rider is trusted.riders[0]
+    assert trusted.get_objects(trusted.riders, surname='Gravity')
+    trusted.set_object(trusted.horses[0], name='Topsy')
+    assert trusted.get_objects(trusted.horses, name='Topsy')
+    trusted.event_validate()
+    # changes made behind the event's back are only caught by event_validate
+    trusted.riders[0].__dict__['ea_number'] = '12'
+    with pytest.raises(ValidationError):
+        trusted.event_validate()
+
+def test_C4HEvent_import_nominate(mock_event, tmp_path):
+    from pathlib import Path
+    fn = Path(__file__).parent.parent / '_dev' / 'test_event_nominate.csv'
+    counts = mock_event.event_import_nominate(fn)
+    assert counts == {
+        'riders': 15, 'horses': 14, 'combos': 15, 'jumpclasses': 2, 'rounds': 17
+        }
+    combo = mock_event.get_objects(mock_event.combos, id='4').first()
+    # Andy Gravity is a new rider but Topless is already in the event
+    assert combo.horse is mock_event.horses[0]
+    assert len(mock_event.get_rounds(combo=mock_event.combos[0])) == 2
+    assert mock_event.get_jumpclasses(id='2').first().arena is mock_event.arenas[0]
+    # importing again adds nothing
+    assert not any(mock_event.event_import_nominate(fn).values())
+
+def test_C4HEvent_import_nominate_ea_numbers(mock_event, tmp_path):
+    fn = tmp_path / 'entries.csv'
+    fn.write_text(
+        'ID,Class,Rider,Horse,Rider EA,Horse EA\n'
+        '1,1,John Smith,Passing Wind,1234567,12345678\n'
+        '2,1,John Smith,Feral Cheryl,7654321,\n'
+        '3,1,John Smith,Hoof Footer,,\n'
+        '4,1,Ann Other,Passing Wind,,12345678\n'
+        )
+    assert mock_event.event_import_nominate(fn)['riders'] == 3
+    combos = mock_event.combos
+    # the same name with different EA numbers are different riders
+    assert combos[0].rider is not combos[1].rider
+    assert combos[1].rider.ea_number == '7654321'
+    # without an EA number the rider is matched on name
+    assert combos[2].rider is combos[0].rider
+    assert combos[3].horse is combos[0].horse
+
+def test_C4HEvent_import_nominate_errors(mock_event, tmp_path):
+    fn = tmp_path / 'entries.csv'
+    fn.write_text(
+        'ID,Class,Rider,Horse,Rider EA,Horse EA\n'
+        '1,1,Hugh Mungus,Passing Wind,1234567,12345678\n'
+        '2,1,Fred Dagg,Feral Cheryl,123,12345678\n'
+        '1,2,Fred Dagg,Feral Cheryl,,\n'
+        )
+    with pytest.raises(c4h.C4HImportError) as e:
+        mock_event.event_import_nominate(fn)
+    assert [line for line, _ in e.value.errors] == [3, 4]
+    assert len(mock_event.riders) == 1
+
+def test_C4HEvent_new_riders(mock_event):
+    previous_update = mock_event.last_change
+    batch = mock_event.new_riders([
+        {'surname': 'Mungus', 'forename': 'Hugh', 'ea_number': '1234567'},
+        {'surname': 'Dagg', 'ea_number': '123'},
+        {'surname': 'Gator', 'forename': 'Ali'},
+        {'surname': 'Bath', 'nickname': 'Anita'},
+        ])
+    assert [r.surname for r in batch.objects] == ['Mungus', 'Gator']
+    assert [n for n, _ in batch.errors] == [1, 3]
+    assert mock_event.riders[-2:] == batch.objects
+    assert mock_event.get_objects(mock_event.riders, surname='Gator')
+    assert mock_event.last_change > previous_update
+
+def test_C4HEvent_new_combos(mock_event):
+    horses = mock_event.new_horses(
+        {'name': f'Horse {n}'} for n in range(3)
+        ).objects
+    rider = mock_event.riders[0]
+    mock_event.new_combo(rider=rider, horse=mock_event.horses[0], id='2')
+    batch = mock_event.new_combos([
+        {'rider': rider, 'horse': horses[0]},
+        {'rider': rider, 'horse': horses[1], 'id': '3'},
+        {'rider': rider, 'horse': horses[2]},
+        ])
+    assert not batch.errors
+    assert [c.id for c in batch.objects] == ['4', '3', '5']
+    # ids read from older files as ints
+    mock_event.combos[0].__dict__['id'] = 6
+    batch = mock_event.new_combos([{'rider': rider, 'horse': h} for h in horses[:2]])
+    assert [c.id for c in batch.objects] == ['7', '8']
+
+def test_C4HEvent_keys(mock_event, tmp_path):
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(3)).objects
+    assert [mock_event.key_of(h) for h in horses] == [1, 2, 3]
+    assert len({h.ID for h in mock_event.horses + mock_event.riders}) == 5
+    assert mock_event.get_by_ID(horses[1].ID) is horses[1]
+    with pytest.raises(ValueError):
+        mock_event.key_of(sh.C4HHorse(mock_event))
+    # uuids shared by every object in older files are replaced when opened
+    for horse in mock_event.horses:
+        horse.ID = horses[0].ID
+    fn = tmp_path / 'event.c4hs'
+    mock_event.event_save_as(fn)
+    opened = mock_event.event_open(fn)
+    assert len({h.ID for h in opened.horses}) == 4
+    assert opened.get_by_ID(horses[0].ID) is opened.horses[0]
+
+def test_C4HEvent_placings(mock_event):
+    jumpclass = mock_event.new_jumpclass(id='1', places=3)
+    other = mock_event.new_jumpclass(id='2')
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(5)).objects
+    combos = mock_event.new_combos(
+        {'rider': mock_event.riders[0], 'horse': h} for h in horses
+        ).objects
+    rounds = [mock_event.new_round(jumpclass=jumpclass, combo=c) for c in combos]
+    placings = mock_event.get_placings(jumpclass)
+    assert not placings.placings()
+    for r, pens, time in zip(rounds, [0, 4, 0, 0, 8], [61.2, 58.0, 63.4, 61.2, 70.1]):
+        mock_event.set_object(r, jump_pens=pens, time=time)
+    assert [(p, c.id) for p, c, _ in placings.placings()] == [
+        (1, '1'), (1, '4'), (3, '3'), (4, '2'), (5, '5')
+        ]
+    assert [c.id for c in placings.jumpoff_qualifiers()] == ['1', '4', '3']
+    # combos in the jump-off are placed ahead of the rest
+    mock_event.new_round(jumpclass=jumpclass, combo=combos[2], round_type='jo1',
+        time=40.5)
+    mock_event.new_round(jumpclass=jumpclass, combo=combos[0], round_type='jo1',
+        jump_pens=4, time=38.0)
+    assert [c.id for _, c, _ in placings.prize_winners()] == ['3', '1', '4']
+    # a correction moves the round
+    mock_event.set_object(rounds[3], jumpclass=other)
+    assert [c.id for _, c, _ in placings.placings()] == ['3', '1', '2', '5']
+    assert mock_event.get_placings(other).placings()[0][1] is combos[3]
+
+def test_C4HEvent_placings_two_rounds(mock_event):
+    jumpclass = mock_event.new_jumpclass(id='1')
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(3)).objects
+    combos = mock_event.new_combos(
+        {'rider': mock_event.riders[0], 'horse': h} for h in horses
+        ).objects
+    results = {'r1': [(12, 70.0), (0, 65.0), (4, 60.0)], 'r2': [(0, 40.0), (4, 42.0), (0, 45.0)]}
+    for round_type, scores in results.items():
+        for combo, (pens, time) in zip(combos, scores):
+            mock_event.new_round(jumpclass=jumpclass, combo=combo,
+                round_type=round_type, jump_pens=pens, time=time)
+    placings = mock_event.get_placings(jumpclass)
+    # penalties are added up over both rounds, the second round time breaks ties
+    assert [(p, c.id) for p, c, _ in placings.placings()] == [(1, '2'), (2, '3'), (3, '1')]
+    assert [c.id for c in placings.jumpoff_qualifiers()] == ['2', '3']
+
+def test_C4HEvent_placings_clear_without_time(mock_event):
+    jumpclass = mock_event.new_jumpclass(id='1')
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(3)).objects
+    combos = mock_event.new_combos(
+        {'rider': mock_event.riders[0], 'horse': h} for h in horses
+        ).objects
+    rounds = [mock_event.new_round(jumpclass=jumpclass, combo=c) for c in combos]
+    placings = mock_event.get_placings(jumpclass)
+    assert not placings.placings()
+    # judged clear, not against the clock
+    mock_event.set_object(rounds[0], faults='')
+    mock_event.set_object(rounds[1], faults='4r')
+    assert rounds[0].judged and not rounds[2].judged
+    assert [(p, c.id) for p, c, _ in placings.placings()] == [(1, '1'), (2, '2')]
+
+def test_C4HEvent_jumpoff_qualifiers(mock_event):
+    from ..C4HScore.score_placings import C4HPlacings
+    from ..C4HScore.score_rules import compile_article
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(4)).objects
+    combos = mock_event.new_combos(
+        {'rider': mock_event.riders[0], 'horse': h} for h in horses
+        ).objects
+    # 238.2.1 has no jump-off however many are clear
+    jumpclass = mock_event.new_jumpclass(id='1', article='238.2.1')
+    for c in combos[:2]:
+        mock_event.new_round(jumpclass=jumpclass, combo=c, faults='', time=60.0)
+    assert len(mock_event.get_placings(jumpclass)) == 2
+    assert not mock_event.get_placings(jumpclass).jumpoff_qualifiers()
+
+    # everyone eliminated, nobody goes through
+    jumpclass = mock_event.new_jumpclass(id='2', article='238.2.2')
+    for c in combos[:2]:
+        mock_event.new_round(jumpclass=jumpclass, combo=c, faults='3e')
+    assert not mock_event.get_placings(jumpclass).jumpoff_qualifiers()
+
+    # Table C with a jump-off: equal on the time with the rails in it
+    rules = compile_article({'_id': '999', 'rounds': [{'table': 'C'}], 'jumpoffs': [{'num': 1}]})['999']
+    jumpclass = mock_event.new_jumpclass(id='3')
+    placings = C4HPlacings(jumpclass, mock_event.key_of, key=rules.key,
+        penalties=rules.penalties, jumpoffs=bool(rules.jumpoffs))
+    for c, faults, time in zip(combos, ['', '1r', '', '2e'], [60.0, 56.0, 61.0, 0]):
+        placings.update(mock_event.new_round(jumpclass=jumpclass, combo=c,
+            faults=faults, time=time))
+    assert [c.id for c in placings.jumpoff_qualifiers()] == ['1', '2']
+
+def test_C4HEvent_placings_correction_time(mock_event):
+    jumpclass = mock_event.new_jumpclass(id='1')
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(2)).objects
+    combos = mock_event.new_combos(
+        {'rider': mock_event.riders[0], 'horse': h} for h in horses
+        ).objects
+    knocked = mock_event.new_round(jumpclass=jumpclass, combo=combos[0], faults='3d', time=60.0)
+    mock_event.new_round(jumpclass=jumpclass, combo=combos[1], faults='5d', time=64.0)
+    placings = mock_event.get_placings(jumpclass)
+    assert [c.id for _, c, _ in placings.placings()] == ['1', '2']
+    # knocking the fence down while refusing adds 6 seconds correction time
+    mock_event.set_object(knocked, faults='3dk')
+    assert (knocked.jump_pens, knocked.time_added) == (4, 6.0)
+    assert [c.id for _, c, _ in placings.placings()] == ['2', '1']
+
+def test_C4HSortedList():
+    from ..C4HScore.score_placings import C4HSortedList
+    import random
+    values = list(range(1000))
+    random.shuffle(values)
+    sorted_list = C4HSortedList()
+    for v in values:
+        sorted_list.add(v)
+    for v in values[:500]:
+        sorted_list.remove(v)
+    assert list(sorted_list) == sorted(values[500:])
+    assert sorted_list[10] == sorted(values[500:])[10]
+    with pytest.raises(ValueError):
+        sorted_list.remove(values[0])
+
+def test_C4HEvent_round_faults(mock_event):
+    jumpclass = mock_event.new_jumpclass(id='1', fences=12)
+    combo = mock_event.new_combo(rider=mock_event.riders[0], horse=mock_event.horses[0])
+    r = mock_event.new_round(jumpclass=jumpclass, combo=combo, faults='3r 7dr')
+    assert (r.jump_pens, r.eliminated) == (12, False)
+    assert mock_event.round_faults(r).jumps == ('3', '7')
+    mock_event.set_object(r, faults='3r 7d 9d')
+    assert r.eliminated
+    with pytest.raises(ValueError):
+        mock_event.set_object(r, faults='13r')
+    assert r.faults == '3r 7d 9d'
+
+def test_faults_corpus():
+    import random
+    from pathlib import Path
+    from ..C4HScore.score_faults import C4HFaultParser, C4HFaultsError
+    corpus = Path(__file__).parent / 'data' / 'faults_corpus.txt'
+    cases = [
+        [field.strip() for field in line.split('|')]
+        for line in corpus.read_text().splitlines() if not line.startswith('#')
+        ]
+    parse = C4HFaultParser().parse
+    for faults, fences, jump_pens, eliminated in cases:
+        if jump_pens == 'ERROR':
+            with pytest.raises(C4HFaultsError):
+                parse(faults, int(fences))
+        else:
+            result = parse(faults, int(fences))
+            assert (result.jump_pens, str(result.eliminated)) == (int(jump_pens), eliminated)
+
+    # mutations of the corpus either parse consistently or raise C4HFaultsError
+    rng = random.Random(42)
+    alphabet = '0123456789abcdefkrRD ,;x\t'
+    for _ in range(5000):
+        faults = list(rng.choice(cases)[0])
+        for _ in range(rng.randint(1, 3)):
+            i = rng.randint(0, len(faults))
+            action = rng.random()
+            if action < 0.4:
+                faults.insert(i, rng.choice(alphabet))
+            elif faults and action < 0.7:
+                del faults[min(i, len(faults) - 1)]
+            elif faults:
+                faults[min(i, len(faults) - 1)] = rng.choice(alphabet)
+        faults = ''.join(faults)
+        try:
+            result = parse(faults, 12)
+        except C4HFaultsError as e:
+            assert 0 <= e.position < len(faults)
+            continue
+        assert result.jump_pens == 4*(result.rails + result.disobediences)
+        assert result.eliminated == bool(result.falls or result.disobediences >= 2
+            or 'e' in faults.lower())
+        assert all(1 <= int(j.rstrip('abc')) <= 12 for j in result.jumps)
+        assert parse(faults, 12) is result
+
+def test_C4HEvent_article_placings(mock_event):
+    jumpclass = mock_event.new_jumpclass(id='1', article='239')
+    horses = mock_event.new_horses({'name': f'Horse {n}'} for n in range(3)).objects
+    combos = mock_event.new_combos(
+        {'rider': mock_event.riders[0], 'horse': h} for h in horses
+        ).objects
+    for c, faults, time in zip(combos, ['', '2r', '5d'], [61.0, 52.0, 60.0]):
+        mock_event.new_round(jumpclass=jumpclass, combo=c, faults=faults, time=time)
+    # Table C, a rail is 4 seconds and a disobedience only costs time
+    assert [c.id for _, c, _ in mock_event.get_placings(jumpclass).placings()] == [
+        '2', '3', '1'
+        ]
+    # Power & Skill isn't against the clock so clear rounds are equal
+    mock_event.set_object(jumpclass, article='262')
+    assert [(p, c.id) for p, c, _ in mock_event.get_placings(jumpclass).placings()] == [
+        (1, '1'), (2, '2'), (2, '3')
+        ]
+    mock_event.set_object(jumpclass, article='999')
+    with pytest.raises(c4h.C4HRulesError):
+        mock_event.get_placings(jumpclass)
+
+def test_article_library(tmp_path):
+    import os
+    from ..C4HScore import score_rules
+    library = score_rules.article_library()
+    assert library['261.5.3'].rounds == (
+        score_rules.C4HStage('A', False), score_rules.C4HStage('A', True)
+        )
+    assert library['245.3'].stage('jo1') == score_rules.C4HStage('A', True)
+    assert library['274.1.5.4'].stage('jo1').table == 'C'
+    assert score_rules.article_library() is library
+
+    fn = tmp_path / 'articles.yaml'
+    fn.write_text('EA:\n- _id: 1\n  rounds:\n  - table: A\n    against_clock: False\n')
+    assert not score_rules.article_rules('1', fn).rounds[0].against_clock
+    fn.write_text('EA:\n- _id: 1\n  rounds:\n  - table: C\n')
+    os.utime(fn, ns=(0, os.stat(fn).st_mtime_ns + 10**9))
+    assert score_rules.article_rules('1', fn).rounds[0].table == 'C'
+
+def test_latency_histogram(tmp_path):
+    import json
+    from ..C4HScore.score_latency import C4HHistogram, C4HLatency
+    histogram = C4HHistogram()
+    for n in range(1, 1001):
+        histogram.record(n/1000) # 1 ms to 1 s
+    summary = histogram.summary()
+    assert summary['count'] == 1000 and summary['max'] == 1.0
+    # each bucket is within an eighth of the last
+    for percent in (50, 90, 99):
+        assert percent/100 <= histogram.percentile(percent) <= percent/100*1.125
+    assert C4HHistogram().percentile(50) is None
+
+    latency = C4HLatency()
+    latency.mark('parsed', 10.0, now=10.002)
+    latency.export(tmp_path / 'latency.json')
+    data = json.loads((tmp_path / 'latency.json').read_text())
+    assert data['parsed']['count'] == 1 and data['repaint'] == {'count': 0, 'buckets': []}
+    assert 'parsed' in latency.report()
+
+def test_latency_threads():
+    from ..C4HScore.score_latency import C4HLatency
+    latency = C4HLatency()
+
+    def parse():
+        for n in range(5000):
+            latency.mark('parsed', 0.0, now=0.001)
+
+    timing = threading.Thread(target=parse)
+    timing.start()
+    while timing.is_alive():
+        summaries = latency.summaries()
+        if summaries['parsed']['count']:
+            assert summaries['parsed']['max'] == pytest.approx(0.001)
+        latency.report()
+    timing.join()
+    assert latency.histograms['parsed'].count == 5000
+
+def test_C4HEvent_timer_latency(mock_event):
+    import time
+    from collections import namedtuple
+    from ..C4HScore.score_latency import C4HLatency
+    TimerEvent = namedtuple('TimerEvent', 'kind value received')
+    jumpclass = mock_event.new_jumpclass(id='1')
+    combo = mock_event.new_combo(rider=mock_event.riders[0], horse=mock_event.horses[0])
+    round_ = mock_event.new_round(jumpclass=jumpclass, combo=combo)
+    latency = C4HLatency()
+    mock_event.set_latency(latency)
+    mock_event.timer_event(round_, TimerEvent('time', 61.27, time.monotonic()))
+    mock_event.get_placings(jumpclass)
+    mock_event.timer_event(round_, TimerEvent('faults', 1.0, time.monotonic()))
+    assert (round_.time, round_.time_pens) == (61.27, 1)
+    assert latency.histograms['round'].count == 2
+    assert latency.histograms['placings'].count == 1
+    # changes that aren't from the timer aren't counted
+    mock_event.set_object(round_, time=62.0)
+    assert latency.histograms['round'].count == 2
+
+def test_running_clock():
+    from collections import namedtuple
+    from ..C4HScore import score_clock as sc
+    TimerEvent = namedtuple('TimerEvent', 'kind value received')
+    clock = sc.C4HRunningClock()
+    assert clock.text(0.0) == ''
+
+    # packets every 10 ms read up to 4 ms late, shown at 25 frames a second
+    assert clock.feed(TimerEvent('running', 0.0, 100.004))
+    shown = []
+    for n in range(1, 500):
+        clock.feed(TimerEvent('running', n/100, 100 + n/100 + (n*7 % 5)/1000))
+        if n % 4 == 0:
+            shown.append(clock.reading(100 + n/100 + 0.005))
+    assert clock.snaps == 1
+    assert shown == sorted(shown)
+    assert all(abs(s - (n + 1)*0.04 - 0.005) < 0.005 for n, s in enumerate(shown))
+    # carried on for only HOLD after the packets stop
+    assert clock.reading(200.0) == pytest.approx(4.99 + sc.HOLD, abs=0.005)
+
+    # stops on the final time exactly, a late running time doesn't restart it
+    assert clock.feed(TimerEvent('time', 61.27, 161.3))
+    assert not clock.feed(TimerEvent('running', 61.265, 161.31))
+    assert (clock.state, clock.text(170.0)) == (sc.FINAL, '61.27')
+    # the next round does
+    assert clock.feed(TimerEvent('running', 0.0, 200.0))
+    assert clock.text(200.15) == '0.1'
+    # the console sending the same time again has stopped
+    clock.feed(TimerEvent('running', 0.5, 200.5))
+    assert clock.feed(TimerEvent('running', 0.5, 200.6))
+    assert (clock.state, clock.reading(300.0)) == (sc.HELD, 0.5)
+
+# TODO start here
@@ -0,0 +1,336 @@
+import asyncio
+import os
+import pytest
+from ..C4HScore import score as c4h
+from ..C4HScore.score_latency import C4HLatency
+from ..C4HTiming import timing_farmtek as farmtek
+
+
+@pytest.fixture
+def fake_console():
+    """A pty standing in for the console, returns (master fd, port name)."""
+    master, slave = os.openpty()
+    port = os.ttyname(slave)
+    yield master, port
+    os.close(master)
+    os.close(slave)
+
+# Farmtek
+# -------------------------------------------------------------
+def test_farmtek_framer_normal():
+    framer = farmtek.C4HFarmtekFramer()
+    packets = b'  11.53 (M)Round 1 Faults    4.00'
+    # noise is skipped and however the bytes are split the same events come out
+    events = framer.feed(b'\x00\xff')
+    for i in range(0, len(packets), 3):
+        events += framer.feed(packets[i:i + 3])
+    assert [(e.kind, e.value, e.round_num, e.flag) for e in events] == [
+        ('time', 11.53, None, 'M'), ('faults', 4.0, 1, '')
+        ]
+
+def test_farmtek_framer_continuous():
+    framer = farmtek.C4HFarmtekFramer(farmtek.CONTINUOUS)
+    assert framer.feed(b' 14.40') == []
+    assert [e.value for e in framer.feed(b'9 14.410100.001  1.5')] == [14.409, 14.41, 100.001]
+    assert [e.value for e in framer.feed(b'00')] == [1.5]
+    with pytest.raises(ValueError):
+        farmtek.C4HFarmtekFramer('fast')
+
+def test_farmtek_reader(fake_console):
+    master, port = fake_console
+    event = c4h.C4HEvent(name='Timed')
+    combo = event.new_combo(
+        rider=event.new_rider(forename='Andi', surname='Gravity'),
+        horse=event.new_horse(name='Topless')
+        )
+    round_ = event.new_round(jumpclass=event.new_jumpclass(id='1'), combo=combo)
+
+    async def run():
+        async with farmtek.C4HFarmtekReader(port) as reader:
+            consumer = asyncio.create_task(
+                farmtek.consume_timer(event, reader.queue, lambda: round_)
+                )
+            os.write(master, b'  61.')
+            await asyncio.sleep(0.01)
+            os.write(master, b'27 (M)Round 1 Faults    1.00')
+            await asyncio.wait_for(_until(lambda: round_.time_pens), 2)
+            consumer.cancel()
+            return reader.bytes_read
+
+    assert asyncio.run(run()) == 33
+    assert (round_.time, round_.time_pens) == (61.27, 1)
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+def test_farmtek_reader_no_port(tmp_path):
+    async def run():
+        await farmtek.C4HFarmtekReader(str(tmp_path / 'ttyNone')).open()
+    with pytest.raises(farmtek.C4HFarmtekError):
+        asyncio.run(run())
+
+# Timy
+# -------------------------------------------------------------
+def test_timy_parse():
+    from ..C4HTiming.timing_timy import parse_timy
+    start = parse_timy(' 0012 C0  12:34:56.7890 00')
+    assert (start.kind, start.flag, start.value) == ('impulse', 'C0', 45296.789)
+    assert parse_timy(' 0012 RT     00:11.3344 00')[:2] == ('time', 11.3344)
+    assert parse_timy('ALGE TIMY') is None
+
+def test_ring_buffer():
+    import threading
+    import time
+    from ..C4HTiming.timing_timy import C4HRingBuffer
+    ring = C4HRingBuffer(4)
+    assert [ring.put(n) for n in range(5)] == [True]*4 + [False]
+    assert (ring.dropped, ring.drain(), ring.get()) == (1, [0, 1, 2, 3], None)
+
+    # one thread writing while this one reads loses and repeats nothing
+    ring = C4HRingBuffer(64)
+    def write():
+        for n in range(20000):
+            while not ring.put(n):
+                time.sleep(0)
+    writer = threading.Thread(target=write)
+    writer.start()
+    values = []
+    while len(values) < 20000:
+        values += ring.drain()
+        time.sleep(0)
+    writer.join()
+    assert values == list(range(20000))
+
+def test_timy_replay(tmp_path):
+    import time
+    from ..C4HTiming.timing_timy import C4HTimyReader, C4HTimyReplay
+    fn = tmp_path / 'timy.txt'
+    fn.write_text(
+        '0.0\tALGE TIMY\n'
+        '0.0\t 0012 C0  12:34:56.7890 00\n'
+        '0.05\t 0012 C1  12:35:08.1234 00\n'
+        ' 0012 RT     00:11.3344 00\n'
+        )
+
+    async def stream(speed):
+        async with C4HTimyReader(C4HTimyReplay.from_file(fn, speed)) as timy:
+            return [event async for event in timy]
+
+    start = time.monotonic()
+    events = asyncio.run(stream(1))
+    assert time.monotonic() - start >= 0.05
+    assert [(e.kind, e.flag) for e in events] == [
+        ('impulse', 'C0'), ('impulse', 'C1'), ('time', 'RT')
+        ]
+    assert events[1].received - events[0].received >= 0.04
+    assert len(asyncio.run(stream(0))) == 3
+
+# Drivers
+# -------------------------------------------------------------
+def test_timing_registry(tmp_path):
+    from ..C4HTiming import timing_drivers as td
+    event = c4h.C4HEvent(name='Two arenas')
+    arenas = [event.new_arena(id=str(n)) for n in range(3)]
+    recording = tmp_path / 'farmtek.txt'
+    recording.write_text('0.0\t  61.27 (M)\n0.01\tRound 1 Faults    0.00\n')
+    timy = [(0.0, b' 0001 C0  10:00:00.0000 00\r'), (0.02, b' 0001 RT     01:02.0000 00\r')]
+
+    latency = C4HLatency()
+    registry = td.C4HTimingRegistry(latency)
+    registry.bind(arenas[0], td.new_driver('replay', recording))
+    registry.bind(arenas[1], td.C4HReplayDriver(timy, 'timy'))
+    registry.bind(arenas[2], td.new_driver('farmtek', str(tmp_path / 'ttyNone')))
+    with pytest.raises(ValueError):
+        registry.bind(arenas[0], registry.driver_for(arenas[1]))
+
+    received = []
+    asyncio.run(registry.run(lambda arena, e: received.append((arena.id, e.kind))))
+    assert sorted(received) == [('0', 'faults'), ('0', 'time'), ('1', 'impulse'), ('1', 'time')]
+    assert latency.histograms['parsed'].count == 4
+    health = registry.health()
+    assert (health['0'].state, health['0'].events) == (td.CLOSED, 2)
+    assert health['2'].state == td.FAILED and 'ttyNone' in health['2'].error
+
+def test_timing_thread():
+    import threading
+    import time
+    from ..C4HTiming import timing_drivers as td
+    event = c4h.C4HEvent(name='Threaded')
+    registry = td.C4HTimingRegistry()
+    registry.bind(event.new_arena(id='1'), td.C4HReplayDriver(
+        [(0.0, b'  12.00 (M)'), (10.0, b'  13.00 (M)')]
+        ))
+    notified = threading.Event()
+    timing = td.C4HTimingThread(registry, notified.set)
+    timing.start()
+    assert notified.wait(2)
+    timing.stop()
+    assert not timing.running
+    assert [e.value for _, e in timing.drain()] == [12.0]
+
+    # told to stop without waiting, it finishes on its own
+    timing = td.C4HTimingThread(registry)
+    timing.start()
+    timing.stop(timeout=0)
+    for _ in range(200):
+        if not timing.running:
+            break
+        time.sleep(0.01)
+    assert not timing.running
+
+# Recording
+# -------------------------------------------------------------
+def test_timing_logs():
+    from pathlib import Path
+    from ..C4HTiming.timing_record import log_events, read_log
+    logs = sorted((Path(__file__).parent / 'data').glob('*.c4ht'))
+    assert logs
+    for fn in logs:
+        expected = [
+            [field.strip() for field in line.split('|')]
+            for line in fn.with_suffix('.events').read_text().splitlines()
+            if not line.startswith('#')
+            ]
+        events = log_events(read_log(fn))
+        assert [
+            [e.kind, str(e.value), '' if e.round_num is None else str(e.round_num),
+                e.flag, f'{e.received:.6f}']
+            for e in events
+            ] == expected
+
+def test_timing_record_replay(fake_console, tmp_path):
+    from ..C4HTiming import timing_drivers as td
+    from ..C4HTiming.timing_record import C4HLogError, C4HRecorder, read_log
+    master, port = fake_console
+    fn = tmp_path / 'session.c4ht'
+
+    async def record():
+        with C4HRecorder(fn, 'farmtek', farmtek.NORMAL) as recorder:
+            async with farmtek.C4HFarmtekReader(port, recorder=recorder) as reader:
+                for packet in (b'  61.27 (M)', b'Round 1 ', b'Faults    4.00'):
+                    os.write(master, packet)
+                    await asyncio.sleep(0.02)
+                return [await reader.queue.get() for _ in range(2)]
+    recorded = asyncio.run(record())
+
+    log = read_log(fn)
+    assert (log.device, log.mode, log.size) == ('farmtek', 'normal', 33)
+    assert log.chunks[-1][0] >= 0.03
+
+    async def replay(speed):
+        driver = td.new_driver('replay', fn, speed=speed)
+        await driver.open()
+        return [e async for e in driver]
+    replayed = asyncio.run(replay(0))
+    assert [e[:4] for e in replayed] == [e[:4] for e in recorded]
+
+    # hours between chunks are kept
+    with C4HRecorder(fn, 'timy') as recorder:
+        recorder.write(b' 0001 C0  10:00:00.0000 00\r', 10.0)
+        recorder.write(b' 0001 C1  12:00:00.0000 00\r', 7210.0)
+    assert [offset for offset, _ in read_log(fn).chunks] == [0.0, 7200.0]
+
+    fn.write_bytes(b'not a log')
+    with pytest.raises(C4HLogError):
+        read_log(fn)
+
+# Clock sync
+# -------------------------------------------------------------
+def test_clock_sync():
+    import random
+    from ..C4HTiming.timing_sync import C4HClockSync
+    random.seed(18)
+    clock = C4HClockSync()
+    assert clock.host_time(1.0) is None and clock.skew == 0.0
+
+    # a Timy 40 ppm slow, read over serial with up to 2 ms of delay
+    skew, offset = 40e-6, 5000.0 - 36000.0
+    for n in range(20000):
+        device = 36000.0 + n*0.5
+        clock.add(device, offset + (1 + skew)*device + random.uniform(0, 0.002))
+    assert not clock.add(46000.0, offset + (1 + skew)*46000.0 + 0.5) # a stall
+    assert clock.rejected == 1
+    assert abs(clock.skew - skew) < 2e-6
+    assert abs(clock.host_time(46000.0) - (offset + (1 + skew)*46000.0 + 0.001)) < 0.0005
+    assert clock.wall_time(46000.0).tzinfo is not None
+
+    # a new round starts the device clock from 0, the skew is kept
+    clock.add(0.0, 10000.0)
+    assert (clock.resets, clock.samples) == (1, 1)
+    assert abs(clock.skew - skew) < 2e-6
+    assert clock.host_time(10.0) == pytest.approx(10000.0 + 10*(1 + clock.skew))
+
+def test_clock_sync_reset_noisy():
+    import random
+    from ..C4HTiming.timing_sync import C4HClockSync
+    random.seed(52)
+    clock = C4HClockSync()
+    skew = 52e-6
+    for n in range(600):
+        device = n*0.1
+        clock.add(device, 100.0 + (1 + skew)*device + random.uniform(0, 0.002))
+    before = clock.skew
+    assert abs(before - skew) < 20e-6
+
+    # a new round with a few noisy samples close together
+    for device, delay in ((0.0, 0.002), (0.1, 0.0), (0.2, 0.0)):
+        clock.add(device, 500.0 + (1 + skew)*device + delay)
+    assert clock.resets == 1
+    assert abs(clock.skew - before) < 5e-6
+    assert clock.host_time(0.2) == pytest.approx(500.0 + 0.2, abs=0.002)
+
+def test_driver_clock():
+    from pathlib import Path
+    from ..C4HTiming import timing_drivers as td
+
+    async def replay():
+        driver = td.new_driver('replay', Path(__file__).parent / 'data' / 'farmtek_continuous.c4ht', speed=0)
+        await driver.open()
+        events = [e async for e in driver]
+        return driver, events
+    driver, events = asyncio.run(replay())
+    running = [e for e in events if e.kind == 'running']
+    assert running
+    assert driver.clock.samples + driver.clock.rejected > 0
+    assert driver.health().skew == driver.clock.skew
+
+# JJD bridge
+# -------------------------------------------------------------
+@pytest.fixture
+def fake_jjd():
+    """A pty standing in for JJD's port, returns (master fd, port name)."""
+    master, slave = os.openpty()
+    port = os.ttyname(slave)
+    yield master, port
+    os.close(master)
+    os.close(slave)
+
+def test_jjd_frames():
+    from ..C4HTiming.timing_bridge import jjd_frame
+    framer = farmtek.C4HFarmtekFramer(farmtek.NORMAL)
+    packets = b'  11.53 (M)Round 1 Faults    0.00 123.45 (M)Round 12 Faults   12.00'
+    assert b''.join(jjd_frame(e) for e in framer.feed(packets)) == packets
+    framer = farmtek.C4HFarmtekFramer(farmtek.CONTINUOUS)
+    packets = b' 14.409 14.419100.001'
+    assert b''.join(jjd_frame(e) for e in framer.feed(packets)) == packets
+
+def test_jjd_bridge(fake_console, fake_jjd):
+    from ..C4HTiming.timing_bridge import C4HJJDBridge
+    console, console_port = fake_console
+    jjd, jjd_port = fake_jjd
+
+    async def bridge():
+        async with C4HJJDBridge(console_port, jjd_port) as bridge:
+            # noise and a packet split across reads are cleaned up
+            for data in (b'\x00\xff', b'  61.27 (M)Rou', b'nd 1 Faults    4.00'):
+                os.write(console, data)
+                await asyncio.sleep(0.02)
+            return bridge.frames
+    assert asyncio.run(bridge()) == 2
+    assert os.read(jjd, 100) == b'  61.27 (M)Round 1 Faults    4.00'
+
+    async def no_console():
+        with pytest.raises(farmtek.C4HFarmtekError):
+            await C4HJJDBridge('/dev/ttyNone', jjd_port).open()
+    asyncio.run(no_console())